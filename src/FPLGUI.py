@@ -20,7 +20,6 @@
 
 #TODO: Insert tab for open validation tool (http://validation.eurofpl.eu)
 #TODO: Implement info for SID/STAR
-#TODO: Fix reading of navdata (airways)
 
 
 import time
@@ -28,19 +27,29 @@ import datetime
 import os
 import re
 
-from math import radians, copysign
+from math import radians
 from warnings import warn
-from urllib.request import urlopen
 import webbrowser
 import configparser as ConfigParser
-from tkinter import Tk, Menu, Label, Entry, StringVar, OptionMenu, W, END, Toplevel, Button, Listbox, messagebox
+from tkinter import Tk, Menu, Label, Entry, StringVar, OptionMenu, W, END, INSERT, Toplevel, Button, Listbox, messagebox
 from tkinter.filedialog import askopenfilename, asksaveasfilename#, askdirectory
 # from tkinter.simpledialog import askstring
 from tkinter.messagebox import showwarning, showinfo
 from tkinter.scrolledtext import ScrolledText
 from Fpl import Fpl
 import avFormula
+import Instrumentation
 from OptionsWindow import OptionsWindow
+from NavdataCache import getNavdataDir
+from NavdataLoader import NavdataLoader
+from RouteDatabase import RouteDatabase
+from RouteDownloader import RouteDownloader, isUpdateDue
+from RouteFinder import RouteSearch
+from RouteCompleter import RouteCompleter
+from RouteExpander import RouteError, formatFms
+from RouteTimes import formatEet
+from RouteValidator import ValidationWorker, describeIssue
+from WindField import WindField, WIND_FILENAME
 
 
 # chapter
@@ -48,8 +57,18 @@ class FPLGUI:
     
     SPLASH_WIDTH = 350
     SPLASH_HEIGHT = 250
+    POLL_INTERVAL = 100 # ms
+    COMPLETION_DELAY = 50 # ms
+    ROUTE_TIMES_DELAY = 200 # ms
+    VALIDATION_DELAY = 150 # ms
+    VALIDATION_POLL = 16 # ms, one frame
+    VALIDATION_SHOWN = 3 # issues
+    FIND_ROUTE_BUDGET = 2.0 # s
     
     def __init__(self):
+        Instrumentation.enableFromEnvironment()
+        self.startTime = Instrumentation.now()
+        
         # Get database folder.
         self.srcDir = os.path.dirname(os.path.abspath(__file__))
         self.databaseDir = os.path.join(os.path.dirname(self.srcDir),'database')
@@ -70,6 +89,8 @@ class FPLGUI:
         splashWindow.resizable(0, 0)
         splashWindow.iconbitmap(os.path.join(self.supportFilesDir,'FPLGUI.ico'))
         Label(splashWindow,text="Loading Navdata, Please wait.",justify='left',font=("Helvetica", 14)).place(relx=0.1,rely=0.1,anchor='nw')
+        splashStatus = StringVar(splashWindow)
+        Label(splashWindow,textvariable=splashStatus,justify='left',font=("Helvetica", 8)).place(relx=0.1,rely=0.25,anchor='nw')
         with open(os.path.join(self.supportFilesDir,'startupMessage.txt')) as startupFile:
             Label(splashWindow, text=startupFile.read(),justify='left',font=("Helvetica", 8)).place(relx=0.1, rely=0.4, anchor='nw')
         splashWindow.update()
@@ -88,29 +109,26 @@ class FPLGUI:
             self.getOptions()
         
         # Get navdata folder.
-        if os.path.exists(os.path.join(self.xPlaneDir,'Custom Data','earth_fix.dat')) and \
-           os.path.exists(os.path.join(self.xPlaneDir,'Custom Data','earth_nav.dat')) and \
-           os.path.exists(os.path.join(self.xPlaneDir,'Custom Data','earth_awy.dat')) and \
-           os.path.exists(os.path.join(self.xPlaneDir,'Custom Data','apt.csv')):
-            self.navdataDir = os.path.join(self.xPlaneDir,'Custom Data')
-        else:
-            self.navdataDir = os.path.join(self.xPlaneDir,'Resources','default data')
+        self.navdataDir = getNavdataDir(self.xPlaneDir)
         
         #inititalize Fpl-object
         self.fplPath = os.path.join(self.xPlaneDir,'Resources\\plugins\\X-IvAp Resources\\Flightplans')
         self.fpl = Fpl(self.fplPath)
         
-        # Load Fixes
-        self.fpl.getFixes(os.path.join(self.navdataDir,'earth_fix.dat'))
-        self.fpl.getNavaids(os.path.join(self.navdataDir,'earth_nav.dat'))
-        self.fpl.getAirports(os.path.join(self.navdataDir,'apt.csv'))
-#         self.fpl.getAirways(os.path.join(self.navdataDir,'earth_awy.dat'))
+        # Load navdata in background (from the navdata cache if it is up to date).
+        self.navdataLoader = NavdataLoader(self.fpl,self.navdataDir,self.databaseDir,self.navdataWorkers)
+        self.navdataLoader.start()
         
         # Load SID/STAR info.
         self.readSidStarInfo()
         
+        # Keep the splash responsive until the airports are loaded. Fixes and airways follow in background.
+        splashWindow.after(self.POLL_INTERVAL,self.splashCB,splashWindow,splashStatus)
+        splashWindow.mainloop()
+        
         # Remove Splash.
         splashWindow.destroy()
+        Instrumentation.addSpan('gui.splash',self.startTime)
         
         # Create main window
         self.master = Tk()
@@ -140,6 +158,8 @@ class FPLGUI:
         #Extas
         utilmenu = Menu(menubar,tearoff=0)
         utilmenu.add_command(label="Import Route",command=self.importRoute)
+        utilmenu.add_command(label="Find Route",command=self.findRoute)
+        utilmenu.add_command(label="Update Route Database",command=self.updateRouteDbButtonCB)
         utilmenu.add_separator()
         utilmenu.add_command(label="Open Simbrief",command=self.simbriefOpen)
         utilmenu.add_command(label="Simbrief process",command=self.simbriefProcess)
@@ -300,6 +320,25 @@ class FPLGUI:
         self.e_route.grid(row=9, column=0, columnspan=5)
         self.route.trace_add('write', self.e_routeCB)
         
+        # Route completion, shown below the cursor while typing.
+        self.routeCompleter = None
+        self.routeCompletionJob = None
+        self.routeCandidates = []
+        self.lb_route = Listbox(self.master, height=6, width=30, font=('Courier', 9))
+        self.lb_route.bind('<ButtonRelease-1>', self.routeCompletionAccept)
+        self.e_route.bind('<Down>', lambda event: self.routeCompletionMove(1))
+        self.e_route.bind('<Up>', lambda event: self.routeCompletionMove(-1))
+        self.e_route.bind('<Tab>', self.routeCompletionAccept)
+        self.e_route.bind('<Return>', self.routeCompletionAccept)
+        self.e_route.bind('<Escape>', lambda event: self.hideRouteCompletion())
+        
+        # Route validation, unknown idents and airway gaps are shown next to the label.
+        self.l_routeIssues = Label(self.master, text="", fg='red')
+        self.l_routeIssues.grid(row=8, column=1, columnspan=4, sticky=W)
+        self.validationWorker = None
+        self.routeValidationJob = None
+        self.e_route.bind('<FocusOut>', lambda event: self.routeValidationSchedule())
+        
         ## row 10-11 ##
         ## destinationAP
         self.l_desticao = Label(self.master, text="13 destination aerodrome")
@@ -319,6 +358,16 @@ class FPLGUI:
         self.e_eet.grid(row=11, column=1)
         self.eet.trace_add('write', self.e_eetCB)
         
+        # Distance and EET of the route, computed when the route, speed or level pause changing.
+        self.l_routeTimes = Label(self.master, text="")
+        self.l_routeTimes.grid(row=12, column=1, columnspan=2)
+        self.routeTimesJob = None
+        self.computedEet = None
+        self.windField = None
+        self.windFieldMtime = None
+        for variable in (self.depicao,self.speedtype,self.speed,self.level,self.route,self.desticao):
+            variable.trace_add('write', self.routeTimesSchedule)
+        
         ## alternates
         self.l_alticao = Label(self.master, text="alternate")
         self.l_alticao.grid(row=10, column=2)
@@ -394,6 +443,16 @@ class FPLGUI:
         self.master.resizable(0, 0)
         self.master.iconbitmap(os.path.join(self.supportFilesDir,'FPLGUI.ico'))
         
+        # Show navdata progress until loaded completely, then the airway graph is prepared.
+        self.routeSearch = None
+        self.navdataCB()
+        
+        # Check for a new route database in background.
+        self.routeDownloader = None
+        if isUpdateDue(self.databaseDir):
+            self.updateRouteDbButtonCB(showResult=False)
+        Instrumentation.addSpan('gui.startup',self.startTime)
+        
         # Start master mainloop.
         self.master.mainloop()
         
@@ -582,13 +641,24 @@ class FPLGUI:
         self.e_pic.delete(0, END)
     
     def getOptions(self):
-        # Init options with None
+        # Init options with None, the navdata is parsed serially unless the option is set.
         self.xPlaneDir = None
+        self.navdataWorkers = 1
         
         # Get options
         if os.path.isfile(os.path.join(self.databaseDir,'FPLGUI.cfg')):
             self.config = ConfigParser.RawConfigParser()
             self.config.read(os.path.join(self.databaseDir,'FPLGUI.cfg'))
+            # navdataWorkers (1: serial, 0: all cores)
+            try:
+                self.navdataWorkers = self.config.getint('NAVDATA','WORKERS') or None
+            except (ConfigParser.NoSectionError,ConfigParser.NoOptionError,ValueError):
+                pass
+            # Trace file (see Instrumentation), the environment variable FPLGUI_TRACE has priority.
+            traceFile = self.config.get('DEBUG','TRACEFILE',fallback='')
+            if traceFile and not Instrumentation.enabled:
+                traceFormat = self.config.get('DEBUG','TRACEFORMAT',fallback='chrome')
+                Instrumentation.enable(traceFile,traceFormat if traceFormat in Instrumentation.TRACE_FORMATS else 'chrome')
             # xPlaneDir
             try:
                 self.xPlaneDir = self.config.get('FPLGUI','XPLANEDIR')
@@ -599,23 +669,13 @@ class FPLGUI:
             if self.xPlaneDir is not None and not re.match(r'[A-Za-z]:\\',self.xPlaneDir):
                 self.xPlaneDir = None
         
-    def updateRouteDbButtonCB(self):
-#         dbUpdated = False
-        downloadUrl = "https://www.ivao.de/scripts/php/cms/pfpx"
-#         curDate = int(time.time())
-#         lastUpdate = 0 #TODO: replace, when options implemented
-#         timeDiff = curDate - lastUpdate
-        timeDiff = 0
-
-        if timeDiff > 864000:
-            ivaoDatabase = urlopen(downloadUrl)
-            database = ivaoDatabase.read()
-#             lastUpdate = int(time.time())
-#             dbUpdated = True
-            
-            DataFile = open(self.srcDir + r"\routeDatabase.txt",'w')
-            DataFile.write(database)
-            DataFile.close()
+    ## Downloads the route database in background if it changed (see RouteDownloader).
+    def updateRouteDbButtonCB(self,showResult=True):
+        if self.routeDownloader is not None and not self.routeDownloader.finished.is_set():
+            return
+        self.routeDownloader = RouteDownloader(self.databaseDir)
+        self.routeDownloader.start()
+        self.routeDownloadCB(showResult)
     
     def optionsButtonOkCB(self):
         self.top.destroy()
@@ -773,17 +833,14 @@ class FPLGUI:
         webbrowser.open(url,new=2)
     
     
+    @Instrumentation.traced('gui.importRoute')
     def importRoute(self):
         self.updateFpl()
         
-        with open(self.databaseDir + r"\routeDatabase.txt") as dataFile:
-            database = dataFile.read()
-            
         self.fpl.desticao = self.fpl.desticao.upper()
         self.fpl.depicao = self.fpl.depicao.upper()
         
-        patRte = re.compile(self.fpl.depicao + self.fpl.desticao + r"\d{2};.+\n")
-        routes = patRte.findall(database)
+        routes = RouteDatabase(self.databaseDir).getRoutes(self.fpl.depicao,self.fpl.desticao)
         
         ## parse routes
         self.routing = []
@@ -836,6 +893,63 @@ class FPLGUI:
             self.tlOkButton = Button(self.importRouteTop,text="OK",command=self.importRouteTop.destroy,width=10)
             self.tlOkButton.pack()
 
+    ## Finds routes along the airways in background (RouteSearch), they are shown to choose one when found.
+    @Instrumentation.traced('gui.findRoute')
+    def findRoute(self):
+        if not self.navdataReady():
+            return
+        self.updateFpl()
+        
+        self.fpl.desticao = self.fpl.desticao.upper()
+        self.fpl.depicao = self.fpl.depicao.upper()
+        self.findRouteStart(self.fpl.depicao,self.fpl.desticao)
+    
+    ## Starts the search as soon as the airway graph is prepared (and an earlier search is done).
+    def findRouteStart(self,depicao,desticao):
+        if self.routeSearch is not None and not self.routeSearch.finished.is_set():
+            self.master.title('FPLGUI - {}'.format(self.routeSearch.getStatus()))
+            self.master.after(self.POLL_INTERVAL,self.findRouteStart,depicao,desticao)
+            return
+        self.routeSearch = RouteSearch(self.fpl.getRouteFinder(),depicao,desticao,timeBudget=self.FIND_ROUTE_BUDGET)
+        self.routeSearch.start()
+        self.findRouteResultCB(self.routeSearch)
+    
+    def findRouteResultCB(self,routeSearch):
+        if not routeSearch.finished.is_set():
+            self.master.title('FPLGUI - {}'.format(routeSearch.getStatus()))
+            self.master.after(self.POLL_INTERVAL,self.findRouteResultCB,routeSearch)
+            return
+        self.master.title('FPLGUI')
+        if routeSearch.error is not None:
+            showwarning('Find route',str(routeSearch.error))
+            return
+        routes = routeSearch.routes
+        
+        # Same format as the route database, see routeListCB.
+        self.routing = ['{} {} {}'.format(routeSearch.depicao,ro.route,routeSearch.desticao) for ro in routes]
+        
+        ## show window
+        self.importRouteTop = Toplevel(self.master)
+        
+        if len(self.routing) > 0:
+            Label(self.importRouteTop, text="Choose a Route").pack()
+            
+            self.importRouteListboxTl = Listbox(self.importRouteTop,width=180)
+            self.importRouteListboxTl.pack()
+            for ro in routes:
+                self.importRouteListboxTl.insert(END, "{:7.0f} nm  {}".format(ro.distanceNm,ro.route))
+            self.importRouteListboxTl.selection_set(0)
+            
+            self.tlOkButton = Button(self.importRouteTop,text="OK",command=self.routeListCB,width=80)
+            self.tlOkButton.pack()
+            
+            self.master.wait_window(self.importRouteTop)
+        else:
+            Label(self.importRouteTop, text="No Routes found!").pack()
+            self.tlOkButton = Button(self.importRouteTop,text="OK",command=self.importRouteTop.destroy,width=10)
+            self.tlOkButton.pack()
+    
+    @Instrumentation.traced('gui.export2FFA320')
     def export2FFA320(self):
         """
         Write the route to Flight Factor A320 Company Routes Database.
@@ -886,7 +1000,10 @@ class FPLGUI:
         # print success message
         print('exported (FF A320)!')
         
+    @Instrumentation.traced('gui.export2xp')
     def export2xp(self):
+        if not self.navdataReady():
+            return
         self.updateFpl()
         
         # Get file path for export.
@@ -896,109 +1013,14 @@ class FPLGUI:
             fileCount += 1
             fmsFilePath = os.path.join(self.xPlaneDir,'Output','FMS plans','{}{}{:02}.fms'.format(self.fpl.depicao,self.fpl.desticao,fileCount))
 
-        # Get coordinates of dep.
-        curCoordinates = self.fpl.airports[self.fpl.depicao]
-        
-        # Get start altitude.
-        curAltitude = int(self.fpl.level) * 100
-        newAltitude = curAltitude
-        
-        # Remove SID/STAR from route and split in parts
-        route = re.sub('[A-Z]{5}\d[A-Z]','',self.fpl.route).strip()
-        route = route.split()
-        
-#         with open(fmsFilePath,'w') as fmsFile:
-        # Write header and departure.
-        fmsStr = ''
-        
-        # Process route.
-        nWaypoints = 1
-        curWaypoint = None
-        curWaypointName = None
-        lastWaypointName = None
-        curAirway = None
-        for rpId,rp in enumerate(route):
-            if not(rpId % 2):
-                # Waypoint
-                
-                # Split altitude from wp
-                if '/' in rp:
-                    wpSplit = rp.split('/')
-                    curWaypointName = wpSplit[0]
-                    altMatch = re.search('F\d+', wpSplit[1])
-                    if altMatch is not None:
-                        newAltitude = int(wpSplit[1][altMatch.start()+1:altMatch.end()]) * 100
-                else:
-                    curWaypointName = rp
-                
-                if curAirway is None:
-                    # After DCT
-                    curAltitude = newAltitude
-                    
-                    curWaypoint = self.fpl.waypoints[curWaypointName]
-                    minDistance = 3.2 # slightly greater than pi
-                    for wp in curWaypoint:
-                        distance = avFormula.gcDistance(curCoordinates[0],curCoordinates[1],wp[0],wp[1])
-                        if distance < minDistance:
-                            minDistance = distance
-                            nearWp = wp
-                    fmsStr = '{}{} {} DRCT {} {} {}\n'.format(fmsStr,nearWp[2],curWaypointName,curAltitude,nearWp[0],nearWp[1])
-                    nWaypoints += 1
-                    
-                else:
-                    # After Airway
-                    curAirwayParts = self.fpl.airways[curAirway].parts
-                    curAirwayName = curAirway
-                    curAirway = None
-                    # Get part with both waypoints.
-                    for pa in curAirwayParts:
-                        if lastWaypointName in [k for m in pa for k in m] and curWaypointName in [n for o in pa for n in o]:
-                            curAirway = pa
-                            break
-                    if curAirway is None:
-                        print('One or both waypoints are no part of airway {}!'.format(curAirwayName))
-                        raise(Exception,'Airway Error!')
-                    
-                    curWaypointId = None
-                    lastWaypointId = None
-                    for wpId,wp in enumerate(curAirway):
-                        if curWaypointName in wp:
-                            curWaypointId = wpId
-                        elif lastWaypointName in wp:
-                            lastWaypointId = wpId
-                        if curWaypointId is not None and lastWaypointId is not None:
-                            step = int(copysign(1,curWaypointId - lastWaypointId))
-                            break
-                    for wp in range(lastWaypointId+step,curWaypointId+step,step):
-                        if curAirway[wp][0] == curWaypointName:
-                            curAltitude = newAltitude
-                        
-                        fmsStr = '{}{} {} {} {} {} {}\n'.format(fmsStr,curAirway[wp][3],curAirway[wp][0],curAirwayName,curAltitude,curAirway[wp][1],curAirway[wp][2])
-                        nWaypoints += 1
-                        
-                    curAirway = None
-            elif rp != 'DCT':
-                # Airway
-                curAirway = rp
-                lastWaypointName = curWaypointName
-                
-        curCoordinates = self.fpl.airports[self.fpl.desticao]
-        fmsStr = '{}1 {} ADES 0.000000 {} {}'.format(fmsStr,self.fpl.desticao,curCoordinates[0],curCoordinates[1])
-        nWaypoints += 1
-        
-        curCoordinates = self.fpl.airports[self.fpl.depicao]
-        fmsStr = 'I\n1100 Version\nCYCLE {}\nADEP {}\nADES {}\nNUMENR {}\n1 {} ADEP 0.000000 {} {}\n{}'.format(self.fpl.cycleNumber,
-                                                                                                               self.fpl.depicao,
-                                                                                                               self.fpl.desticao,
-                                                                                                               nWaypoints,
-                                                                                                               self.fpl.depicao,
-                                                                                                               curCoordinates[0],curCoordinates[1],
-                                                                                                               fmsStr)
-        
-#         print(fmsStr)
+        try:
+            legs = self.fpl.expandRoute()
+        except RouteError as e:
+            showwarning('Export to X-Plane',str(e))
+            return
         
         with open(fmsFilePath,'w') as fmsFile:
-            fmsFile.write(fmsStr)
+            fmsFile.write(formatFms(legs,self.fpl.cycleNumber))
             
         print('fms file exported to XP!')
         
@@ -1080,16 +1102,25 @@ class FPLGUI:
     
     
     
+    @Instrumentation.traced('gui.showSkyvector')
     def showSkyvector(self):
         # Calculate middle point.
         depCoordinates = self.fpl.airports[self.fpl.depicao]
         destCoordinates = self.fpl.airports[self.fpl.desticao]
-        intermediatePoint = avFormula.gcIntermediatePoint(depCoordinates[0], depCoordinates[1], destCoordinates[0], destCoordinates[1])
+        intermediatePoint = avFormula.gcIntermediatePoint(depCoordinates[0], destCoordinates[0], depCoordinates[1], destCoordinates[1])
+        
+        # Expanded waypoints if the route can be resolved, otherwise the route as entered.
+        route = self.fpl.route
+        if self.navdataLoader.finished.is_set():
+            try:
+                route = ' '.join(leg.ident for leg in self.fpl.expandRoute()[1:-1])
+            except (RouteError,ValueError):
+                pass
         
         skyvectorUrl = 'http://skyvector.com/?ll={:9.6f},{:9.6f}&chart=304&zoom=6&fpl=%20{}%20{}%20{}'.format(intermediatePoint[0],
                                                                                                      intermediatePoint[1],
                                                                                                      self.fpl.depicao,
-                                                                                                     self.fpl.route.replace(' ','%20'),
+                                                                                                     route.replace(' ','%20'),
                                                                                                      self.fpl.desticao)
         webbrowser.open(skyvectorUrl,new=2)
     
@@ -1098,35 +1129,7 @@ class FPLGUI:
         # Get Field contents.
         self.updateFpl()
         
-        # Init string.
-        fplString = '(FPL\n'
-        
-        # Complete string.
-        fplString = '{}-{}-{}{}\n'.format(fplString,
-                                          self.fpl.callsign,
-                                          self.fpl.rules,
-                                          self.fpl.flighttype)
-        fplString = '{}-{}{}/{}-{}/{}\n'.format(fplString,
-                                                self.fpl.number,
-                                                self.fpl.actype,
-                                                self.fpl.wakecat,
-                                                self.fpl.equipment,
-                                                self.fpl.transponder)
-        fplString = '{}-{}{}\n'.format(fplString,
-                                       self.fpl.depicao,
-                                       self.fpl.deptime)
-        fplString = '{}-N{:04}F{:03} {}\n'.format(fplString,
-                                                  int(self.fpl.speed),
-                                                  int(self.fpl.level),
-                                                  self.fpl.route)
-        fplString = '{}-{}{} {} {}\n'.format(fplString,
-                                             self.fpl.desticao,
-                                             self.fpl.eet,
-                                             self.fpl.alticao,
-                                             self.fpl.alt2icao)
-        fplString = '{}-{})'.format(fplString,self.fpl.other)
-        
-        return fplString
+        return self.fpl.getFplText()
         
     def showFplText(self):
         # Get fpl string.
@@ -1216,7 +1219,191 @@ class FPLGUI:
         showinfo("Info Filing SID/STAR", infoString)
     
     
+    ## Returns True if all navdata is loaded, otherwise informs the user.
+    def navdataReady(self):
+        if self.navdataLoader.finished.is_set():
+            return True
+        showinfo('Navdata','Navdata is still loading, please try again in a moment.\n{}'.format(self.navdataLoader.getStatus()))
+        return False
+    
     # Callbacks
+    def splashCB(self,splashWindow,splashStatus):
+        splashStatus.set(self.navdataLoader.getStatus())
+        if self.navdataLoader.airportsLoaded.is_set():
+            splashWindow.quit()
+        else:
+            splashWindow.after(self.POLL_INTERVAL,self.splashCB,splashWindow,splashStatus)
+    
+    def navdataCB(self):
+        if self.navdataLoader.finished.is_set():
+            self.master.title('FPLGUI')
+            Instrumentation.addSpan('gui.navdataReady',self.startTime,fromCache=self.navdataLoader.fromCache)
+            if self.navdataLoader.error is not None:
+                showwarning('Navdata',self.navdataLoader.getStatus())
+            else:
+                self.routeSearch = RouteSearch(self.fpl.getRouteFinder())
+                self.routeSearch.start()
+            self.routeTimesSchedule()
+            self.routeValidationSchedule()
+        else:
+            self.master.title('FPLGUI - {}'.format(self.navdataLoader.getStatus()))
+            self.master.after(self.POLL_INTERVAL,self.navdataCB)
+    
+    def routeDownloadCB(self,showResult):
+        # The navdata progress has priority in the title.
+        navdataLoaded = self.navdataLoader.finished.is_set()
+        if self.routeDownloader.finished.is_set():
+            if navdataLoaded:
+                self.master.title('FPLGUI')
+            if self.routeDownloader.error is not None:
+                if showResult:
+                    showwarning('Route database',self.routeDownloader.getStatus())
+                else:
+                    print(self.routeDownloader.getStatus())
+            elif showResult:
+                showinfo('Route database',self.routeDownloader.getStatus())
+        else:
+            if navdataLoaded:
+                self.master.title('FPLGUI - {}'.format(self.routeDownloader.getStatus()))
+            self.master.after(self.POLL_INTERVAL,self.routeDownloadCB,showResult)
+    
+    @Instrumentation.traced('gui.routeCompletion')
+    def routeCompletionCB(self):
+        self.routeCompletionJob = None
+        if not self.navdataLoader.finished.is_set() or self.master.focus_get() is not self.e_route:
+            self.hideRouteCompletion()
+            return
+        
+        if self.routeCompleter is None:
+            self.routeCompleter = RouteCompleter(self.fpl)
+        self.routeCandidates = self.routeCompleter.complete(self.e_route.get()[:self.e_route.index(INSERT)],
+                                                            self.depicao.get().upper())
+        if not self.routeCandidates:
+            self.hideRouteCompletion()
+            return
+        
+        self.lb_route.delete(0, END)
+        for ident,kind,distance in self.routeCandidates:
+            self.lb_route.insert(END, '{:7} {:8} {}'.format(ident,kind,'' if distance is None else '{:.0f} nm'.format(distance)))
+        self.lb_route.selection_set(0)
+        cursorBox = self.e_route.bbox(INSERT)
+        self.lb_route.place(in_=self.e_route, x=cursorBox[0] if cursorBox else 0, rely=1)
+        self.lb_route.lift()
+    
+    ## Moves the selection of the route completion, keeps the key event if it is not shown.
+    def routeCompletionMove(self,step):
+        if not self.lb_route.winfo_ismapped():
+            return None
+        selection = self.lb_route.curselection()
+        index = min(max((selection[0] if selection else -1) + step,0),self.lb_route.size() - 1)
+        self.lb_route.selection_clear(0, END)
+        self.lb_route.selection_set(index)
+        self.lb_route.see(index)
+        return 'break'
+    
+    ## Replaces the route element at the cursor by the selected candidate.
+    def routeCompletionAccept(self,*args):  #@UnusedVariable
+        if not self.lb_route.winfo_ismapped():
+            return None
+        selection = self.lb_route.curselection()
+        ident = self.routeCandidates[selection[0] if selection else 0][0]
+        
+        cursor = self.e_route.index(INSERT)
+        start = self.e_route.get().rfind(' ',0,cursor) + 1
+        self.e_route.delete(start, cursor)
+        self.e_route.insert(start, ident + ' ')
+        self.e_route.icursor(start + len(ident) + 1)
+        self.e_route.focus_set()
+        return 'break'
+    
+    def hideRouteCompletion(self):
+        self.lb_route.place_forget()
+    
+    ## Returns the WindField of the database folder (mapped again if the file changed) or None without wind file.
+    def getWindField(self):
+        windPath = os.path.join(self.databaseDir,WIND_FILENAME)
+        try:
+            mtime = os.stat(windPath).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime != self.windFieldMtime:
+            if self.windField is not None:
+                self.windField.close()
+            self.windField = None
+            self.windFieldMtime = mtime
+            if mtime is not None:
+                try:
+                    self.windField = WindField.load(windPath)
+                except (OSError,ValueError) as e:
+                    print('Wind file not used: {}'.format(e))
+        return self.windField
+    
+    def routeTimesSchedule(self,*args):  #@UnusedVariable
+        if self.routeTimesJob is not None:
+            self.master.after_cancel(self.routeTimesJob)
+        self.routeTimesJob = self.master.after(self.ROUTE_TIMES_DELAY,self.routeTimesCB)
+    
+    @Instrumentation.traced('gui.routeTimes')
+    def routeTimesCB(self):
+        self.routeTimesJob = None
+        if not self.navdataLoader.finished.is_set():
+            return
+        self.updateFpl()
+        windField = self.getWindField()
+        try:
+            routeTimes = self.fpl.getRouteTimes(windField)
+        except (RouteError,ValueError):
+            self.l_routeTimes.config(text='')
+            return
+        
+        eet = formatEet(routeTimes.eet)
+        self.l_routeTimes.config(text='{:.0f} nm, EET {}{}'.format(routeTimes.distance,eet,'' if windField is None else ' (wind)'))
+        # The computed EET is filled in, unless one was typed.
+        if self.eet.get() in ('',self.computedEet):
+            self.eet.set(eet)
+        self.computedEet = eet
+    
+    def routeValidationSchedule(self):
+        if self.routeValidationJob is not None:
+            self.master.after_cancel(self.routeValidationJob)
+        self.routeValidationJob = self.master.after(self.VALIDATION_DELAY,self.routeValidationCB)
+    
+    ## Passes the route to the ValidationWorker, the last token is not checked while it is typed.
+    def routeValidationCB(self):
+        self.routeValidationJob = None
+        if not self.navdataLoader.finished.is_set():
+            return
+        if self.validationWorker is None:
+            self.validationWorker = ValidationWorker(self.fpl)
+            self.validationWorker.start()
+        route = self.e_route.get()
+        typing = self.master.focus_get() is self.e_route and self.e_route.index(INSERT) == len(route)
+        self.validationWorker.submit(route,typing)
+        self.routeValidationResultCB((route,typing))
+    
+    ## Shows the issues of request when the worker has validated it, polled every frame.
+    def routeValidationResultCB(self,request):
+        # A newer route is validated instead.
+        if self.e_route.get() != request[0]:
+            return
+        result = self.validationWorker.result
+        if result is None or result[0] != request:
+            if self.validationWorker.is_alive():
+                self.master.after(self.VALIDATION_POLL,self.routeValidationResultCB,request)
+            else:
+                # The worker failed, the next change of the route starts a new one.
+                self.l_routeIssues.config(text='Route validation failed: {}'.format(self.validationWorker.error))
+                self.e_route.config(fg='black')
+                self.validationWorker = None
+            return
+        
+        issues = result[1]
+        text = '; '.join(describeIssue(issue) for issue in issues[:self.VALIDATION_SHOWN])
+        if len(issues) > self.VALIDATION_SHOWN:
+            text = '{} (+{} more)'.format(text,len(issues) - self.VALIDATION_SHOWN)
+        self.l_routeIssues.config(text=text)
+        self.e_route.config(fg='red' if issues else 'black')
+    
     def routeListCB(self):
         selectedRoute = self.importRouteListboxTl.curselection()
         selectedRoute = selectedRoute[0]
@@ -1307,6 +1494,12 @@ class FPLGUI:
             else:
                 self.route.set(self.route.get().upper())
         
+        # Complete and validate when the typing pauses.
+        if self.routeCompletionJob is not None:
+            self.master.after_cancel(self.routeCompletionJob)
+        self.routeCompletionJob = self.master.after(self.COMPLETION_DELAY,self.routeCompletionCB)
+        self.routeValidationSchedule()
+        
     def e_desticaoCB(self,*args):  #@UnusedVariable
         string = self.desticao.get()
         if len(string):
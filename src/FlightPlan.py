@@ -0,0 +1,198 @@
+#!/usr/bin/python
+# -*- coding: iso-8859-15 -*-
+#==============================================================================
+# FlightPlan - Fields of a flightplan and the .fpl file format
+# Copyright (C) 2019  Oliver Clemens
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <https://www.gnu.org/licenses/>.
+#==============================================================================
+# A FlightPlan holds only the 23 string fields (slots, no navdata), so many
+# of them can be kept in memory. A .fpl file is an ini file with the section
+# [FLIGHTPLAN]. It is read into one string and parsed in one pass, and written
+# from one template with CRLF line ends. loadDirectory and saveDirectory read
+# or write all plans of a directory.
+#==============================================================================
+
+import os
+import re
+
+FPL_SECTION = '[FLIGHTPLAN]'
+FPL_EXTENSION = '.fpl'
+
+FIELDS = ['callsign','pic','speedtype','pob','endurance','other','alt2icao','alticao','eet','desticao','route',
+          'level','leveltype','speed','deptime','depicao','transponder','equipment','wakecat','actype','number',
+          'flighttype','rules']
+DEFAULTS = {'speedtype':'N','leveltype':'F','wakecat':'M','number':'1','flighttype':'G','rules':'I'}
+
+# Lines of a .fpl file. FMCROUTE, LIVERY and AIRLINE are written for X-Plane but not read.
+FPL_TEMPLATE = '\r\n'.join([FPL_SECTION,
+                            'CALLSIGN={callsign}',
+                            'PIC={pic}',
+                            'FMCROUTE={route}',
+                            'LIVERY=',
+                            'AIRLINE={airline}',
+                            'SPEEDTYPE={speedtype}',
+                            'POB={pob}',
+                            'ENDURANCE={endurance}',
+                            'OTHER={other}',
+                            'ALT2ICAO={alt2icao}',
+                            'ALTICAO={alticao}',
+                            'EET={eet}',
+                            'DESTICAO={desticao}',
+                            'ROUTE={route}',
+                            'LEVEL={level}',
+                            'LEVELTYPE={leveltype}',
+                            'SPEED={speed}',
+                            'DEPTIME={deptime}',
+                            'DEPICAO={depicao}',
+                            'TRANSPONDER={transponder}',
+                            'EQUIPMENT={equipment}',
+                            'WAKECAT={wakecat}',
+                            'ACTYPE={actype}',
+                            'NUMBER={number}',
+                            'FLIGHTTYPE={flighttype}',
+                            'RULES={rules}',
+                            ''])
+
+
+class FlightPlan(object):
+    """
+    Fields of one flightplan. Fields not given are empty or their default.
+    """
+    
+    __slots__ = FIELDS
+    
+    def __init__(self,**fields):
+        for field in FIELDS:
+            setattr(self,field,fields.pop(field,DEFAULTS.get(field,'')))
+        if fields:
+            raise TypeError('Unknown flightplan fields: {}'.format(', '.join(sorted(fields))))
+    
+    def __eq__(self,other):
+        if not isinstance(other,FlightPlan):
+            return NotImplemented
+        return all(getattr(self,fi) == getattr(other,fi) for fi in FIELDS)
+    
+    __hash__ = None
+    
+    def __repr__(self):
+        return 'FlightPlan({} {} {})'.format(self.depicao,self.route,self.desticao)
+    
+    def copy(self):
+        return FlightPlan(**self.asDict())
+    
+    def asDict(self):
+        return {fi:getattr(self,fi) for fi in FIELDS}
+    
+    ## Returns the FlightPlan of the text of a .fpl file. Raises ValueError if the section or a field is missing.
+    @classmethod
+    def fromText(cls,text):
+        values = {}
+        inSection = False
+        for line in text.splitlines():
+            # Indented lines are continuations in ini files, they are not used in .fpl files.
+            if not line or line[0] in ' \t':
+                continue
+            line = line.rstrip()
+            if not line or line[0] in '#;':
+                continue
+            if line[0] == '[':
+                inSection = line == FPL_SECTION
+            elif inSection:
+                key,sep,value = line.partition('=')
+                if sep:
+                    values[key.strip().lower()] = value.strip()
+        
+        missing = [fi.upper() for fi in FIELDS if fi not in values]
+        if len(missing) == len(FIELDS):
+            raise ValueError('No {} section'.format(FPL_SECTION))
+        if missing:
+            raise ValueError('Missing {}'.format(', '.join(missing)))
+        return cls(**{fi:values[fi] for fi in FIELDS})
+    
+    ## Returns the text of the .fpl file.
+    def toText(self):
+        return FPL_TEMPLATE.format(airline=self.getAirline(),**self.asDict())
+    
+    @classmethod
+    def load(cls,path):
+        with open(path) as fplFile:
+            return cls.fromText(fplFile.read())
+    
+    def save(self,path):
+        with open(path,'w',newline='') as fplFile:
+            fplFile.write(self.toText())
+    
+    ## Returns the airline of the callsign or ''.
+    def getAirline(self):
+        if re.match(r'[A-Z]{3}\d\w*',self.callsign):
+            return self.callsign[0:3]
+        return ''
+    
+    ## Returns the ICAO flightplan text.
+    def getFplText(self):
+        # Init string.
+        fplString = '(FPL\n'
+        
+        # Complete string.
+        fplString = '{}-{}-{}{}\n'.format(fplString,
+                                          self.callsign,
+                                          self.rules,
+                                          self.flighttype)
+        fplString = '{}-{}{}/{}-{}/{}\n'.format(fplString,
+                                                self.number,
+                                                self.actype,
+                                                self.wakecat,
+                                                self.equipment,
+                                                self.transponder)
+        fplString = '{}-{}{}\n'.format(fplString,
+                                       self.depicao,
+                                       self.deptime)
+        fplString = '{}-N{:04}F{:03} {}\n'.format(fplString,
+                                                  int(self.speed),
+                                                  int(self.level),
+                                                  self.route)
+        fplString = '{}-{}{} {} {}\n'.format(fplString,
+                                             self.desticao,
+                                             self.eet,
+                                             self.alticao,
+                                             self.alt2icao)
+        fplString = '{}-{})'.format(fplString,self.other)
+        
+        return fplString
+
+
+## Loads all .fpl files of directory. Returns {filename:FlightPlan} and {filename:error} of unreadable files.
+def loadDirectory(directory):
+    plans = {}
+    errors = {}
+    with os.scandir(directory) as entries:
+        for entry in sorted(entries,key=lambda en: en.name):
+            if not entry.name.lower().endswith(FPL_EXTENSION) or not entry.is_file():
+                continue
+            try:
+                plans[entry.name] = FlightPlan.load(entry.path)
+            except (OSError,ValueError,UnicodeDecodeError) as e:
+                errors[entry.name] = str(e)
+    return plans,errors
+
+
+## Writes plans {name:FlightPlan} to directory as <name>.fpl (the extension is added if missing).
+def saveDirectory(plans,directory):
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    for name,plan in plans.items():
+        if not name.lower().endswith(FPL_EXTENSION):
+            name += FPL_EXTENSION
+        plan.save(os.path.join(directory,name))
@@ -18,256 +18,351 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 #==============================================================================
 
-import re
 import os
-import configparser
 import avFormula
-from copy import deepcopy
+import Instrumentation
+from collections import deque
+from FlightPlan import FlightPlan, FIELDS
+from NavdataCache import NavdataCache
+from NavdataParser import readLines, parseFixes, parseNavaids, parseAirports, parseAirways, parseNavdata, MERGE_METHODS
+from NavdataUpdate import updateNavdata
+from RouteExpander import RouteExpander
+from RouteFinder import RouteFinder, MAX_ROUTES, TIME_BUDGET
+from RouteTimes import computeRouteTimes
+from SpatialIndex import SpatialIndex
+from WaypointStore import WaypointStore
+
+
+## Returns a property of Fpl forwarding the flightplan field name to Fpl.plan.
+def planField(name):
+    return property(lambda self: getattr(self.plan,name),
+                    lambda self,value: setattr(self.plan,name,value))
+
+
+## Returns a Fpl with the navdata of navdataDir for a worker process: attached to the cache file cachePath the
+# main process loaded (see Fpl.navdataCache) or, if that is not usable, loaded itself.
+def loadWorkerFpl(navdataDir,cacheDir,cachePath=None):
+    fpl = Fpl(cacheDir)
+    if cachePath is None or not fpl.attachNavdata(cachePath,navdataDir):
+        fpl.loadNavdata(navdataDir,cacheDir)
+    return fpl
 
 
 class Fpl(object):
+    """
+    Flightplan (the fields are those of self.plan, see FlightPlan) and the
+    navdata to expand its route.
+    """
     
-    def __init__(self,fplPath):
+    def __init__(self,fplPath,plan=None):
         self.path = fplPath
-        if os.path.isfile(os.path.join(self.path,"Default.fpl")):
-            self.load(os.path.join(self.path,"Default.fpl"))
+        if plan is not None:
+            self.plan = plan
+        elif os.path.isfile(os.path.join(self.path,"Default.fpl")):
+            self.plan = FlightPlan.load(os.path.join(self.path,"Default.fpl"))
         else:
-            self.callsign = ''
-            self.pic = ''
-            self.speedtype = 'N'
-            self.pob = ''
-            self.endurance = ''
-            self.other = ''
-            self.alt2icao = ''
-            self.alticao = ''
-            self.eet = ''
-            self.desticao = ''
-            self.route = ''
-            self.level = ''
-            self.leveltype = 'F'
-            self.speed = ''
-            self.deptime = ''
-            self.depicao = ''
-            self.transponder = ''
-            self.equipment = ''
-            self.wakecat = 'M'
-            self.actype = ''
-            self.number = '1'
-            self.flighttype = 'G'
-            self.rules = 'I'
-        self.waypoints = {}
+            self.plan = FlightPlan()
+        self.waypoints = WaypointStore()
         self.airways = {}
         self.airports = {}
-    
+        self.spatialIndexes = {}
+        self.routeExpander = None
+        self.routeFinder = None
+        self.navdataCache = None
+        self.navdataUpdate = None
     
     def load(self,path):
+        self.plan = FlightPlan.load(path)
+    
+    def save(self,filepath):
+        self.plan.save(filepath)
+    
+    ## Returns the ICAO flightplan text.
+    def getFplText(self):
+        return self.plan.getFplText()
+    
+    ## Loads fixes, navaids, airports and airways from the cache or parses them if the cache is outdated.
+    # An outdated cache is updated to the new navdata, the changes are in self.navdataUpdate (see NavdataUpdate).
+    # While parsing progress(stage,bytes,lines) is called at the start of every stage and periodically.
+    # With more than one worker the files are parsed in parallel by that many processes (None: all cores).
+    @Instrumentation.traced('navdata.load')
+    def loadNavdata(self,navdataDir,cacheDir,progress=None,workers=1):
+        self.routeExpander = None
+        self.routeFinder = None
+        cache = NavdataCache(cacheDir,navdataDir)
+        self.navdataCache = cache
+        with Instrumentation.span('navdata.cache.load'):
+            fromCache = cache.load(self)
+        if fromCache:
+            Instrumentation.count('navdata.cacheHits')
+            return True
+        Instrumentation.count('navdata.cacheMisses')
+        
+        self.waypoints = WaypointStore()
+        self.airways = {}
+        self.airports = {}
+        self.spatialIndexes = {}
         
-        config = configparser.RawConfigParser()
-        config.read(path)
+        self.navdataUpdate = updateNavdata(self,navdataDir,cacheDir,progress,workers)
+        if self.navdataUpdate is not None:
+            return False
         
-        self.callsign = config.get('FLIGHTPLAN', 'CALLSIGN')
-        self.pic = config.get('FLIGHTPLAN', 'PIC')
-        self.speedtype = config.get('FLIGHTPLAN', 'SPEEDTYPE')
-        self.pob = config.get('FLIGHTPLAN', 'POB')
-        self.endurance = config.get('FLIGHTPLAN', 'ENDURANCE')
-        self.other = config.get('FLIGHTPLAN', 'OTHER')
-        self.alt2icao = config.get('FLIGHTPLAN', 'ALT2ICAO')
-        self.alticao = config.get('FLIGHTPLAN', 'ALTICAO')
-        self.eet = config.get('FLIGHTPLAN', 'EET')
-        self.desticao = config.get('FLIGHTPLAN', 'DESTICAO')
-        self.route = config.get('FLIGHTPLAN', 'ROUTE')
-        self.level = config.get('FLIGHTPLAN', 'LEVEL')
-        self.leveltype = config.get('FLIGHTPLAN', 'LEVELTYPE')
-        self.speed = config.get('FLIGHTPLAN', 'SPEED')
-        self.deptime = config.get('FLIGHTPLAN', 'DEPTIME')
-        self.depicao = config.get('FLIGHTPLAN', 'DEPICAO')
-        self.transponder = config.get('FLIGHTPLAN', 'TRANSPONDER')
-        self.equipment = config.get('FLIGHTPLAN', 'EQUIPMENT')
-        self.wakecat = config.get('FLIGHTPLAN', 'WAKECAT')
-        self.actype = config.get('FLIGHTPLAN', 'ACTYPE')
-        self.number = config.get('FLIGHTPLAN', 'NUMBER')
-        self.flighttype = config.get('FLIGHTPLAN', 'FLIGHTTYPE')
-        self.rules = config.get('FLIGHTPLAN', 'RULES')
+        parseNavdata(navdataDir,self.mergeParsed,workers,progress)
+        self.finalizeAirways()
+        with Instrumentation.span('navdata.cache.save'):
+            cache.save(self)
+        
+        return False
     
+    @Instrumentation.traced('navdata.getFixes')
+    def getFixes(self,fixesFilePath,progress=None):
+        self.addFixes(parseFixes(readLines(fixesFilePath,progress)))
     
-    def save(self,filepath):
-        # Get airline if in callsign.
-        if re.match('[A-Z]{3}\d\w*', self.callsign):
-            airline = self.callsign[0:3]
+    @Instrumentation.traced('navdata.getNavaids')
+    def getNavaids(self,navaidFilePath,progress=None):
+        self.addWaypoints(parseNavaids(readLines(navaidFilePath,progress)))
+    
+    @Instrumentation.traced('navdata.getAirports')
+    def getAirports(self,airportsFilePath,progress=None):
+        self.addAirports(parseAirports(readLines(airportsFilePath,progress)))
+    
+    @Instrumentation.traced('navdata.getAirways')
+    def getAirways(self,airwaysFilePath,progress=None):
+        self.addAirwaySegments(parseAirways(readLines(airwaysFilePath,progress)))
+        self.finalizeAirways()
+    
+    ## Merges a result of the parser of stage, see NavdataParser.parseNavdata.
+    def mergeParsed(self,stage,result):
+        getattr(self,MERGE_METHODS[stage])(result)
+    
+    ## Merges the result of parseFixes.
+    def addFixes(self,result):
+        columns,cycleNumber = result
+        if cycleNumber is not None:
+            self.cycleNumber = cycleNumber
+        Instrumentation.count('navdata.fixes',len(columns[0]))
+        self.addWaypoints(columns)
+    
+    ## Merges waypoint columns (idents,lats,lons,types) of parseFixes or parseNavaids.
+    def addWaypoints(self,columns):
+        Instrumentation.count('navdata.waypoints',len(columns[0]))
+        self.waypoints.extend(columns)
+    
+    def addAirports(self,airports):
+        Instrumentation.count('navdata.airports',len(airports))
+        self.airports.update(airports)
+    
+    ## Adds airway segments of parseAirways. Call finalizeAirways when all are added.
+    def addAirwaySegments(self,segments):
+        Instrumentation.count('navdata.airwaySegments',len(segments))
+        for name1,type1,name2,type2,airwayNames in segments:
+            # Get nearest fix pair.
+            pair = self.getNearestFixPair(name1,type1,name2,type2)
+            if pair is None:
+                continue
+            fix1,fix2 = pair
+            
+            for aw in airwayNames:
+                if aw not in self.airways:
+                    self.airways[aw] = Airway(aw)
+                self.airways[aw].update(fix1,fix2)
+    
+    @Instrumentation.traced('navdata.finalizeAirways')
+    def finalizeAirways(self):
+        for aw in self.airways.values():
+            if aw.building:
+                aw.finalize()
+    
+    ## Uses the navdata (and route expander and finder) of fpl without copying it.
+    def shareNavdata(self,fpl):
+        self.waypoints = fpl.waypoints
+        self.airways = fpl.airways
+        self.airports = fpl.airports
+        self.spatialIndexes = fpl.spatialIndexes
+        self.cycleNumber = getattr(fpl,'cycleNumber',None)
+        self.navdataCache = fpl.navdataCache
+        if fpl.routeExpander is None:
+            fpl.routeExpander = RouteExpander(fpl)
+        self.routeExpander = fpl.routeExpander
+        if fpl.routeFinder is None:
+            fpl.routeFinder = RouteFinder(fpl)
+        self.routeFinder = fpl.routeFinder
+    
+    ## Attaches to the navdata cache file cachePath of navdataDir written by loadNavdata of another process.
+    # Returns False if the cache is missing, outdated or written from other navdata.
+    @Instrumentation.traced('navdata.attach')
+    def attachNavdata(self,cachePath,navdataDir):
+        self.routeExpander = None
+        self.routeFinder = None
+        cache = NavdataCache.fromPath(cachePath,navdataDir)
+        self.navdataCache = cache
+        return cache is not None and cache.load(self)
+    
+    ## Returns the legs of the route from depicao to desticao, see RouteExpander. Raises RouteError.
+    def expandRoute(self):
+        if self.routeExpander is None:
+            self.routeExpander = RouteExpander(self)
+        return self.routeExpander.expand(self.route,self.depicao,self.desticao,self.level)
+    
+    ## Returns the RouteFinder of the navdata, it is created on first use.
+    def getRouteFinder(self):
+        if self.routeFinder is None:
+            self.routeFinder = RouteFinder(self)
+        return self.routeFinder
+    
+    ## Returns routes from depicao to desticao along the airways, see RouteFinder. Raises RouteError.
+    def findRoutes(self,maxRoutes=MAX_ROUTES,timeBudget=TIME_BUDGET):
+        return self.getRouteFinder().findRoutes(self.depicao,self.desticao,maxRoutes,timeBudget)
+    
+    ## Returns distances and times of the expanded route at speed and level (with the wind of windField if given),
+    # see RouteTimes. Raises RouteError.
+    def getRouteTimes(self,windField=None):
+        return computeRouteTimes(self.expandRoute(),self.speed,self.speedtype,self.level,windField)
+    
+    ## Returns the SpatialIndex of 'waypoints' or 'airports', it is built on first use.
+    def getSpatialIndex(self,name):
+        try:
+            return self.spatialIndexes[name]
+        except KeyError:
+            if name == 'waypoints':
+                self.spatialIndexes[name] = SpatialIndex.fromWaypoints(self.waypoints)
+            else:
+                self.spatialIndexes[name] = SpatialIndex.fromAirports(self.airports)
+            return self.spatialIndexes[name]
+    
+    ## Returns [(ident,waypoint,distanceNm),...] of all waypoints within radiusNm of lat/lon, nearest first.
+    def getWaypointsNear(self,lat,lon,radiusNm):
+        return [(self.waypoints.getIdent(row),self.waypoints.getRow(row),distance) for row,distance in self.getSpatialIndex('waypoints').radius(lat,lon,radiusNm)]
+    
+    ## Returns (ident,distanceNm) of the airport nearest to lat/lon.
+    def getNearestAirport(self,lat,lon):
+        return self.getSpatialIndex('airports').nearest(lat,lon)
+    
+    ## Returns the pair of fixes with the given names and types that are nearest to each other.
+    # Fixes are returned as tuples (name,lat,lon,type), None if a name is unknown.
+    def getNearestFixPair(self,name1,type1,name2,type2):
+        fixes1 = self.waypoints.get(name1)
+        fixes2 = self.waypoints.get(name2)
+        if fixes1 is None or fixes2 is None:
+            return None
+        
+        if len(fixes1) == 1 and len(fixes2) == 1:
+            fix1 = fixes1[0]
+            fix2 = fixes2[0]
         else:
-            airline = ''
+            # Only consider fixes of the given type if there are any.
+            fixes1 = [fi for fi in fixes1 if fi[2] == type1] or fixes1
+            fixes2 = [fi for fi in fixes2 if fi[2] == type2] or fixes2
+            
+            fi1id,fi2id,_ = avFormula.nearestPair([fi[0] for fi in fixes1],[fi[1] for fi in fixes1],
+                                                  [fi[0] for fi in fixes2],[fi[1] for fi in fixes2])
+            fix1 = fixes1[fi1id]
+            fix2 = fixes2[fi2id]
         
-        # Write flightplan.
-        with open(filepath,'w') as fplFile:
-            fplFile.write("[FLIGHTPLAN]\r\n")
-            fplFile.write("CALLSIGN={}\r\n".format(self.callsign))
-            fplFile.write("PIC={}\r\n".format(self.pic))
-            fplFile.write("FMCROUTE={}\r\n".format(self.route))
-            fplFile.write("LIVERY=\r\n")
-            fplFile.write("AIRLINE={}\r\n".format(airline))
-            fplFile.write("SPEEDTYPE={}\r\n".format(self.speedtype))
-            fplFile.write("POB={}\r\n".format(self.pob))
-            fplFile.write("ENDURANCE={}\r\n".format(self.endurance))
-            fplFile.write("OTHER={}\r\n".format(self.other))
-            fplFile.write("ALT2ICAO={}\r\n".format(self.alt2icao))
-            fplFile.write("ALTICAO={}\r\n".format(self.alticao))
-            fplFile.write("EET={}\r\n".format(self.eet))
-            fplFile.write("DESTICAO={}\r\n".format(self.desticao))
-            fplFile.write("ROUTE={}\r\n".format(self.route))
-            fplFile.write("LEVEL={}\r\n".format(self.level))
-            fplFile.write("LEVELTYPE={}\r\n".format(self.leveltype))
-            fplFile.write("SPEED={}\r\n".format(self.speed))
-            fplFile.write("DEPTIME={}\r\n".format(self.deptime))
-            fplFile.write("DEPICAO={}\r\n".format(self.depicao))
-            fplFile.write("TRANSPONDER={}\r\n".format(self.transponder))
-            fplFile.write("EQUIPMENT={}\r\n".format(self.equipment))
-            fplFile.write("WAKECAT={}\r\n".format(self.wakecat))
-            fplFile.write("ACTYPE={}\r\n".format(self.actype))
-            fplFile.write("NUMBER={}\r\n".format(self.number))
-            fplFile.write("FLIGHTTYPE={}\r\n".format(self.flighttype))
-            fplFile.write("RULES={}\r\n".format(self.rules))
-    
-    def getFixes(self,fixesFilePath):
-        with open(fixesFilePath) as waypointsFile:
-            for line in waypointsFile:
-                lineSplit = re.split(' +',line.strip())
-                if len(lineSplit) == 6:
-                    newWaypoint = [float(lineSplit[0]),float(lineSplit[1]),11]
-                    if lineSplit[2] not in self.waypoints:
-                        self.waypoints.update({lineSplit[2]:[newWaypoint]})
-                    else:
-                        self.waypoints[lineSplit[2]].append(newWaypoint)
-                elif len(lineSplit) > 1:
-                    self.cycleNumber = re.findall('(?<=data cycle )\d{4}',line)[0]
-    
-    def getNavaids(self,navaidFilePath):
-        with open(navaidFilePath) as navaidFile:
-            for line in navaidFile:
-                lineSplit = re.split(' +',line.strip())
-                if lineSplit[0] in ['2','3','13']:
-                    lineSplit[0] = lineSplit[0][-1]
-                    newWaypoint = [float(lineSplit[1]),float(lineSplit[2]),int(lineSplit[0])]
-                    if lineSplit[7] not in self.waypoints:
-                        self.waypoints.update({lineSplit[7]:[newWaypoint]})
-                    else:
-                        self.waypoints[lineSplit[7]].append(newWaypoint)
-    
-    
-    def getAirports(self,airportsFilePath):
-        with open(airportsFilePath) as airportsFile:
-            for line in airportsFile:
-                lineSplit = re.split(',',line.strip())
-                lat = re.split(' +',lineSplit[2].strip())
-                lat = float(lat[1])
-                lon = re.split(' +',lineSplit[3].strip())
-                lon = float(lon[1])
-                self.airports[lineSplit[0]] = [lat,lon]
-                
-        pass
-    
-    
-    def getAirways(self,airwaysFilePath):
-        with open(airwaysFilePath) as airwaysFile:
-            for line in airwaysFile:
-                lineSplit = re.split(' +',line.strip())
-                if len(lineSplit) == 11:
-                    # Get nearest fix pair.
-                    fixes1 = deepcopy(self.waypoints[lineSplit[0]])
-                    fixes2 = deepcopy(self.waypoints[lineSplit[3]])
-                    nearest = [None,None]
-                    distanceMin = 3.2 # Slightly greater than pi
-                    
-                    if len(fixes1) > 1 or len(fixes2) > 1:
-                        for fi1id,fi1 in enumerate(fixes1):
-                            if int(lineSplit[2]) != fi1[2]:
-                                continue
-                            for fi2id,fi2 in enumerate(fixes2):
-                                if int(lineSplit[5]) != fi2[2]:
-                                    continue
-                                distance = avFormula.gcDistance(fi1[0],fi1[1],fi2[0],fi2[1])
-                                if distance < distanceMin:
-                                    nearest = [fi1id,fi2id]
-                                    distanceMin = distance
-                        
-                    
-                    else:
-                        nearest = [0,0]
-                        
-                    
-                    fix1 = fixes1[nearest[0]]
-                    fix2 = fixes2[nearest[1]]
-                    
-                    # Add fix name to list
-                    fix1.insert(0,lineSplit[0])
-                    fix2.insert(0,lineSplit[3])
-                    
-                    
-                    curAirways = lineSplit[10].split('-')
-                    for aw in curAirways:
-                        if aw not in self.airways:
-                            self.airways[aw] = Airway(lineSplit[10])
-                        self.airways[aw].update(fix1,fix2)
-                        
+        return (name1,fix1[0],fix1[1],fix1[2]),(name2,fix2[0],fix2[1],fix2[2])
     
+
+for field in FIELDS:
+    setattr(Fpl,field,planField(field))
+
+
 class Airway(object):
+    """
+    Airway consisting of one or more parts. Each part is a list of fixes
+    (name,lat,lon,type) in the order they are connected.
+    While building, the parts are deques and self.partOf maps each fix to
+    the id of its part. After finalize() self.parts is a list of lists and
+    self.index maps each fix to (part id, position in part).
+    A part is a chain, the segment closing a circular airway (both fixes
+    already in the same part) is only kept in self.closingSegments.
+    """
     
-    def __init__(self,name):#,nFixes):
+    def __init__(self,name):
         self.name = name
         self.parts = []
-        
+        self.index = {}
+        self.building = {}
+        self.partOf = {}
+        self.nextPartId = 0
+        self.closingSegments = []
+    
     def update(self,fix1,fix2):
-        
-        # Check parts if one or both fixed are alredy included and get their positions fix<n>Part.
-        fix1Part = None
-        fix2Part = None
-        
-        for paId,pa in enumerate(self.parts):
-            if fix1 in pa:
-                fix1Part = paId
-                
-            if fix2 in pa:
-                fix2Part = paId
-        paId = None
-        pa = None
+        fix1Part = self.partOf.get(fix1)
+        fix2Part = self.partOf.get(fix2)
         
         # Sort the leg to a part or concat two parts. Several cases:
         # Case 1: Fixes in no part > Create new part.
         if fix1Part is None and fix2Part is None:
-            self.parts.append([fix1,fix2])
-            
+            self.newPart(fix1,fix2)
+        
         # Case 2: Only fix 2 included > append fix 1.
         elif fix1Part is None:
-            fix2Ind = self.parts[fix2Part].index(fix2)
-            if not fix2Ind:
-                self.parts[fix2Part].insert(0, fix1)
-            elif fix2Ind == (len(self.parts[fix2Part]) - 1):
-                self.parts[fix2Part].append(fix1)
-            else:
-                raise(Exception,'Unexpected format cannot append to an intermediate fix')
-            
+            self.attach(fix2Part,fix2,fix1)
+        
         # Case 3: Only fix 1 included > append fix 2.
         elif fix2Part is None:
-            fix1Ind = self.parts[fix1Part].index(fix1)
-            if not fix1Ind:
-                self.parts[fix1Part].insert(0, fix2)
-            elif fix1Ind == (len(self.parts[fix1Part]) - 1):
-                self.parts[fix1Part].append(fix2)
-            else:
-                raise(Exception,'Unexpected format cannot append to an intermediate fix')
+            self.attach(fix1Part,fix1,fix2)
         
         # Case 4: Both fixes included in different parts > Concat parts.
         elif fix1Part != fix2Part:
-            fix1Ind = self.parts[fix1Part].index(fix1)
-            fix2Ind = self.parts[fix2Part].index(fix2)
-            
-            if not fix1Ind:
-                self.parts[fix1Part] = self.parts[fix1Part][::-1]
-                
-            if fix2Ind == (len(self.parts[fix2Part]) - 1):
-                self.parts[fix2Part] = self.parts[fix2Part][::-1]
-            
-            self.parts.append(self.parts[fix1Part] + self.parts[fix2Part])
-            self.parts.pop(fix1Part)
-            if fix2Part > fix1Part:
-                fix2Part -= 1
-            self.parts.pop(fix2Part)
\ No newline at end of file
+            self.join(fix1Part,fix1,fix2Part,fix2)
+        
+        # Case 5: Both fixes included in the same part > Circular airway, keep the segment aside.
+        else:
+            self.closingSegments.append((fix1,fix2))
+    
+    def newPart(self,fix1,fix2):
+        partId = self.nextPartId
+        self.nextPartId += 1
+        self.building[partId] = deque([fix1,fix2])
+        self.partOf.setdefault(fix1,partId)
+        self.partOf.setdefault(fix2,partId)
+    
+    ## Appends newFix next to fix, which has to be at one end of the part.
+    def attach(self,partId,fix,newFix):
+        part = self.building[partId]
+        if part[0] == fix:
+            part.appendleft(newFix)
+        elif part[-1] == fix:
+            part.append(newFix)
+        else:
+            # Branch at an intermediate fix, start a new part.
+            self.newPart(fix,newFix)
+            return
+        self.partOf[newFix] = partId
+    
+    ## Connects two parts via fix1 and fix2. The shorter part is moved to the longer one.
+    def join(self,fix1Part,fix1,fix2Part,fix2):
+        part1 = self.building[fix1Part]
+        part2 = self.building[fix2Part]
+        if (part1[0] != fix1 and part1[-1] != fix1) or (part2[0] != fix2 and part2[-1] != fix2):
+            # Branch at an intermediate fix, start a new part.
+            self.newPart(fix1,fix2)
+            return
+        
+        if len(part1) < len(part2):
+            part1,part2 = part2,part1
+            fix1,fix2 = fix2,fix1
+            fix2Part = fix1Part
+        
+        # Orient the shorter part so that fix2 is adjacent to fix1.
+        if part1[-1] == fix1:
+            part1.extend(part2 if part2[0] == fix2 else reversed(part2))
+        else:
+            part1.extendleft(part2 if part2[0] == fix2 else reversed(part2))
+        
+        keepId = self.partOf[fix1]
+        for fix in part2:
+            if self.partOf[fix] == fix2Part:
+                self.partOf[fix] = keepId
+        del self.building[fix2Part]
+    
+    ## Converts the parts to lists and indexes the position of every fix.
+    def finalize(self):
+        self.parts = [list(pa) for pa in self.building.values()]
+        self.index = {}
+        for paId,pa in enumerate(self.parts):
+            for wpId,wp in enumerate(pa):
+                self.index.setdefault(wp,(paId,wpId))
+        self.building = {}
+        self.partOf = {}
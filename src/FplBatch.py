@@ -0,0 +1,199 @@
+#!/usr/bin/python
+# -*- coding: iso-8859-15 -*-
+#==============================================================================
+# FplBatch - Generates flightplans of many flights without GUI
+# Copyright (C) 2019  Oliver Clemens
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <https://www.gnu.org/licenses/>.
+#==============================================================================
+# Usage: python FplBatch.py flights.csv|flights.jsonl outDir [options]
+# Every flight (CSV row or JSON object per line) needs dep, dest, route, type
+# and level. Other columns named like Fpl attributes (callsign, speed, ...)
+# are used as well. A Default.fpl next to the flights file provides the
+# defaults of all flights. For each flight <name>.fpl, <name>.fms and
+# <name>.txt (ICAO flightplan) are written to outDir.
+#==============================================================================
+
+import os
+import csv
+import sys
+import json
+import time
+import argparse
+import configparser
+from concurrent.futures import ProcessPoolExecutor
+from Fpl import Fpl, loadWorkerFpl
+from FlightPlan import FlightPlan, FIELDS
+import Instrumentation
+from NavdataCache import getNavdataDir
+from RouteExpander import RouteError, formatFms
+
+# Column names of the flights file that differ from the Fpl attributes.
+COLUMN_ALIASES = {'dep':'depicao','dest':'desticao','type':'actype'}
+REQUIRED_COLUMNS = ['depicao','desticao','route','actype','level']
+
+# Flights per job of the worker pool.
+CHUNK_SIZE = 16
+
+# Navdata of the process, see initWorker.
+workerFpl = None
+
+# Default.fpl of the template directories, see getTemplatePlan.
+templatePlans = {}
+
+
+## Returns the flights of a CSV or JSONL file as list of dicts with Fpl attribute names as keys.
+def readFlights(path):
+    with open(path,newline='') as flightsFile:
+        if os.path.splitext(path)[1].lower() in ('.jsonl','.json'):
+            rows = [json.loads(line) for line in flightsFile if line.strip()]
+        else:
+            rows = list(csv.DictReader(flightsFile))
+    
+    flights = []
+    for row in rows:
+        flight = {}
+        for key,value in row.items():
+            key = key.strip().lower()
+            flight[COLUMN_ALIASES.get(key,key)] = str(value).strip()
+        flights.append(flight)
+    return flights
+
+
+## Loads the navdata of the process. Workers attach to the cache file cachePath written by the main process.
+def initWorker(navdataDir,cacheDir,cachePath=None):
+    global workerFpl
+    workerFpl = loadWorkerFpl(navdataDir,cacheDir,cachePath)
+
+
+## Returns the FlightPlan of Default.fpl in templateDir (empty one if there is none), loaded once per process.
+def getTemplatePlan(templateDir):
+    plan = templatePlans.get(templateDir)
+    if plan is None:
+        defaultPath = os.path.join(templateDir,'Default.fpl')
+        plan = FlightPlan.load(defaultPath) if os.path.isfile(defaultPath) else FlightPlan()
+        templatePlans[templateDir] = plan
+    return plan
+
+
+## Writes the files of one flight. Returns None or the error message.
+def processFlight(job):
+    flightId,flight,templateDir,outDir = job
+    try:
+        missing = [co for co in REQUIRED_COLUMNS if not flight.get(co)]
+        if missing:
+            raise ValueError('missing {}'.format(', '.join(missing)))
+        
+        plan = getTemplatePlan(templateDir).copy()
+        for key,value in flight.items():
+            if key in FIELDS:
+                setattr(plan,key,value.upper() if key in REQUIRED_COLUMNS else value)
+        # The speed may come from Default.fpl as well.
+        if not plan.speed:
+            raise ValueError('missing speed')
+        fpl = Fpl(templateDir,plan)
+        fpl.shareNavdata(workerFpl)
+        
+        # Everything is checked before the first file is written.
+        name = '{:04}_{}{}'.format(flightId,fpl.depicao,fpl.desticao)
+        legs = fpl.expandRoute()
+        fplText = fpl.getFplText()
+        fpl.save(os.path.join(outDir,'{}.fpl'.format(name)))
+        with open(os.path.join(outDir,'{}.fms'.format(name)),'w') as fmsFile:
+            fmsFile.write(formatFms(legs,fpl.cycleNumber))
+        with open(os.path.join(outDir,'{}.txt'.format(name)),'w') as txtFile:
+            txtFile.write(fplText)
+    except (RouteError,ValueError,KeyError,OSError) as e:
+        return 'flight {}: {}'.format(flightId,e)
+    return None
+
+
+## Processes all flights of flightsPath. Returns the error messages.
+@Instrumentation.traced('batch.run')
+def runBatch(flightsPath,outDir,navdataDir,cacheDir,workers=None):
+    workers = workers or os.cpu_count() or 1
+    if not os.path.isdir(outDir):
+        os.makedirs(outDir)
+    if not os.path.isdir(cacheDir):
+        os.makedirs(cacheDir)
+    
+    # Load navdata once, this writes the cache for the workers if it is outdated.
+    t0 = time.perf_counter()
+    initWorker(navdataDir,cacheDir)
+    cachePath = workerFpl.navdataCache.path
+    print('Navdata loaded in {:.2f} s'.format(time.perf_counter() - t0))
+    
+    flights = readFlights(flightsPath)
+    Instrumentation.count('batch.flights',len(flights))
+    templateDir = os.path.dirname(os.path.abspath(flightsPath))
+    jobs = [(flId,fl,templateDir,outDir) for flId,fl in enumerate(flights,1)]
+    t0 = time.perf_counter()
+    if workers > 1:
+        with ProcessPoolExecutor(workers,initializer=initWorker,initargs=(navdataDir,cacheDir,cachePath)) as pool:
+            results = list(pool.map(processFlight,jobs,chunksize=CHUNK_SIZE))
+    else:
+        results = [processFlight(job) for job in jobs]
+    duration = time.perf_counter() - t0
+    
+    errors = [re for re in results if re is not None]
+    Instrumentation.count('batch.errors',len(errors))
+    print('{} flights in {:.2f} s ({:.1f} flights/s), {} failed'.format(len(flights),
+                                                                          duration,
+                                                                          len(flights)/duration if duration else 0,
+                                                                          len(errors)))
+    return errors
+
+
+## Returns the X-Plane directory set in FPLGUI.cfg or None.
+def getConfiguredXPlaneDir(databaseDir):
+    config = configparser.RawConfigParser()
+    config.read(os.path.join(databaseDir,'FPLGUI.cfg'))
+    return config.get('FPLGUI','XPLANEDIR',fallback=None)
+
+
+def main(argv=None):
+    srcDir = os.path.dirname(os.path.abspath(__file__))
+    databaseDir = os.path.join(os.path.dirname(srcDir),'database')
+    
+    parser = argparse.ArgumentParser(description='Generate .fpl, .fms and ICAO flightplan text of many flights.')
+    parser.add_argument('flights',help='CSV or JSONL file of flights (dep, dest, route, type, level, speed, ...)')
+    parser.add_argument('outDir',help='output directory')
+    parser.add_argument('--xplane',help='X-Plane directory (default: from FPLGUI.cfg)')
+    parser.add_argument('--navdata',help='navdata directory (default: from the X-Plane directory)')
+    parser.add_argument('--cache',default=databaseDir,help='directory of the navdata cache')
+    parser.add_argument('--workers',type=int,default=0,help='worker processes (0: all cores)')
+    parser.add_argument('--trace',help='write timing spans and counters to this file (see Instrumentation)')
+    parser.add_argument('--trace-format',default='chrome',choices=Instrumentation.TRACE_FORMATS,help='format of the trace file')
+    args = parser.parse_args(argv)
+    
+    if args.trace:
+        Instrumentation.enable(args.trace,args.trace_format)
+    else:
+        Instrumentation.enableFromEnvironment()
+    
+    navdataDir = args.navdata
+    if navdataDir is None:
+        xPlaneDir = args.xplane or getConfiguredXPlaneDir(databaseDir)
+        if xPlaneDir is None:
+            parser.error('either --navdata or --xplane is required (no X-Plane directory in FPLGUI.cfg)')
+        navdataDir = getNavdataDir(xPlaneDir)
+    
+    errors = runBatch(args.flights,args.outDir,navdataDir,args.cache,args.workers)
+    for er in errors:
+        print(er)
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
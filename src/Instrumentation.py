@@ -0,0 +1,274 @@
+#!/usr/bin/python
+# -*- coding: iso-8859-15 -*-
+#==============================================================================
+# Instrumentation - Timing spans, counters and memory samples
+# Copyright (C) 2019  Oliver Clemens
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <https://www.gnu.org/licenses/>.
+#==============================================================================
+# Off by default. It is enabled by the main program of a process:
+#   - environment variable FPLGUI_TRACE=<file> (FPLGUI_TRACE_FORMAT=json for
+#     the summary format), see enableFromEnvironment
+#   - Options: Trace file (FPLGUI), --trace (FplBatch, RouteValidator)
+# When enabled, named spans, counters and samples of the process memory are
+# recorded and written at exit:
+#   chrome  trace event file for chrome://tracing or https://ui.perfetto.dev
+#   json    totals per span name, counters and peak memory
+# When disabled span() returns a shared no-op object and count() returns at
+# once, so instrumented code costs one function call per span. Worker
+# processes are not traced.
+#==============================================================================
+
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+from functools import wraps
+
+TRACE_FORMATS = ['chrome','json']
+
+# Interval of the memory samples in s.
+SAMPLE_INTERVAL = 0.05
+
+enabled = False
+
+# Recorded events (kind,name,start,end,threadId,args), start and end in s of perf_counter.
+events = []
+counters = {}
+peakMemory = 0
+traceFile = None
+traceFormat = 'chrome'
+startTime = time.perf_counter()
+tracePid = None
+sampler = None
+
+if sys.platform == 'win32':
+    import ctypes
+    from ctypes import wintypes
+    
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [('cb',wintypes.DWORD),
+                    ('PageFaultCount',wintypes.DWORD),
+                    ('PeakWorkingSetSize',ctypes.c_size_t),
+                    ('WorkingSetSize',ctypes.c_size_t),
+                    ('QuotaPeakPagedPoolUsage',ctypes.c_size_t),
+                    ('QuotaPagedPoolUsage',ctypes.c_size_t),
+                    ('QuotaPeakNonPagedPoolUsage',ctypes.c_size_t),
+                    ('QuotaNonPagedPoolUsage',ctypes.c_size_t),
+                    ('PagefileUsage',ctypes.c_size_t),
+                    ('PeakPagefileUsage',ctypes.c_size_t)]
+
+
+class Span(object):
+    """
+    Context manager recording the time between enter and exit as span.
+    """
+    
+    def __init__(self,name,args):
+        self.name = name
+        self.args = args
+        self.start = None
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self,*exc):
+        events.append(('span',self.name,self.start,time.perf_counter(),threading.get_ident(),self.args))
+        return False
+
+
+class NoSpan(object):
+    """
+    Span of disabled instrumentation.
+    """
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self,*exc):
+        return False
+
+
+NO_SPAN = NoSpan()
+
+
+class MemorySampler(threading.Thread):
+    
+    def __init__(self):
+        threading.Thread.__init__(self,name='MemorySampler',daemon=True)
+        self.stopped = threading.Event()
+    
+    def run(self):
+        while not self.stopped.wait(SAMPLE_INTERVAL):
+            sampleMemory()
+
+
+## Returns a span context manager: with span('navdata.load'): ...
+def span(name,**args):
+    if not enabled:
+        return NO_SPAN
+    return Span(name,args)
+
+
+## Decorator recording every call of a function as span.
+def traced(name):
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args,**kwargs):
+            if not enabled:
+                return function(*args,**kwargs)
+            with Span(name,{}):
+                return function(*args,**kwargs)
+        return wrapper
+    return decorator
+
+
+## Records a span that started at start (value of now()) and ends now.
+def addSpan(name,start,**args):
+    if enabled:
+        events.append(('span',name,start,time.perf_counter(),threading.get_ident(),args))
+
+
+## Adds value to the counter name.
+def count(name,value=1):
+    if not enabled:
+        return
+    value += counters.get(name,0)
+    counters[name] = value
+    events.append(('counter',name,time.perf_counter(),None,threading.get_ident(),{name:value}))
+
+
+def now():
+    return time.perf_counter()
+
+
+## Returns (current,peak) memory of the process in bytes or None if unknown.
+def getMemoryUsage():
+    if sys.platform == 'win32':
+        memoryCounters = PROCESS_MEMORY_COUNTERS()
+        memoryCounters.cb = ctypes.sizeof(memoryCounters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(process,ctypes.byref(memoryCounters),memoryCounters.cb):
+            return None
+        return memoryCounters.WorkingSetSize,memoryCounters.PeakWorkingSetSize
+    
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is in kB, on macOS in bytes.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss*(1 if sys.platform == 'darwin' else 1024)
+    try:
+        with open('/proc/self/statm') as statmFile:
+            current = int(statmFile.read().split()[1])*os.sysconf('SC_PAGE_SIZE')
+    except (OSError,ValueError,IndexError):
+        current = peak
+    return current,peak
+
+
+## Records the current memory of the process.
+def sampleMemory():
+    global peakMemory
+    usage = getMemoryUsage()
+    if usage is None:
+        return
+    current,peak = usage
+    peakMemory = max(peakMemory,peak)
+    events.append(('counter','memory',time.perf_counter(),None,threading.get_ident(),{'rssMB':round(current/1e6,1)}))
+
+
+## Enables the instrumentation of this process, the trace is written to path at exit.
+def enable(path,outputFormat='chrome'):
+    global enabled, traceFile, traceFormat, tracePid, sampler
+    if outputFormat not in TRACE_FORMATS:
+        raise ValueError('Unknown trace format {}, use one of {}'.format(outputFormat,', '.join(TRACE_FORMATS)))
+    traceFile = path
+    traceFormat = outputFormat
+    if enabled:
+        return
+    
+    tracePid = os.getpid()
+    enabled = True
+    sampleMemory()
+    if getMemoryUsage() is not None:
+        sampler = MemorySampler()
+        sampler.start()
+    atexit.register(write)
+
+
+## Enables the instrumentation if the environment variable FPLGUI_TRACE is set. Returns True if enabled.
+def enableFromEnvironment():
+    path = os.environ.get('FPLGUI_TRACE')
+    if path:
+        enable(path,os.environ.get('FPLGUI_TRACE_FORMAT','chrome').lower())
+    return enabled
+
+
+## Writes the trace file.
+def write():
+    if not enabled or os.getpid() != tracePid:
+        return
+    if sampler is not None:
+        sampler.stopped.set()
+    sampleMemory()
+    
+    if traceFormat == 'json':
+        trace = getSummary()
+    else:
+        trace = getChromeTrace()
+    with open(traceFile,'w') as outFile:
+        json.dump(trace,outFile,indent=None if traceFormat == 'chrome' else 1)
+
+
+## Returns the trace as dict of the Chrome trace event format.
+def getChromeTrace():
+    pid = os.getpid()
+    traceEvents = []
+    for thread in threading.enumerate():
+        traceEvents.append({'name':'thread_name','ph':'M','pid':pid,'tid':thread.ident,'args':{'name':thread.name}})
+    for kind,name,start,end,threadId,args in list(events):
+        event = {'name':name,'pid':pid,'tid':threadId,'ts':round((start - startTime)*1e6,1),'args':args}
+        if kind == 'span':
+            event['ph'] = 'X'
+            event['dur'] = round((end - start)*1e6,1)
+        else:
+            event['ph'] = 'C'
+        traceEvents.append(event)
+    return {'traceEvents':traceEvents,
+            'displayTimeUnit':'ms',
+            'otherData':{'counters':dict(counters),'peakMemory':peakMemory}}
+
+
+## Returns count, total and maximum duration (s) per span name, the counters and the peak memory (bytes).
+def getSummary():
+    spans = {}
+    for kind,name,start,end,_,_ in list(events):
+        if kind != 'span':
+            continue
+        if name not in spans:
+            spans[name] = {'count':0,'total':0.0,'max':0.0}
+        duration = end - start
+        spans[name]['count'] += 1
+        spans[name]['total'] += duration
+        spans[name]['max'] = max(spans[name]['max'],duration)
+    for sp in spans.values():
+        sp['total'] = round(sp['total'],6)
+        sp['max'] = round(sp['max'],6)
+    return {'duration':round(time.perf_counter() - startTime,6),
+            'spans':spans,
+            'counters':dict(counters),
+            'peakMemory':peakMemory}
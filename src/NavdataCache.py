@@ -0,0 +1,378 @@
+#!/usr/bin/python
+# -*- coding: iso-8859-15 -*-
+#==============================================================================
+# NavdataCache - Compiled binary cache of the X-Plane navdata
+# Copyright (C) 2019  Oliver Clemens
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <https://www.gnu.org/licenses/>.
+#==============================================================================
+# File layout:
+#   MAGIC | header length (uint32) | header (pickle)
+#         | index length (uint32) | index (pickle) | padding
+#         | waypoint columns and grid (raw, 8 byte aligned) | shards (pickle each)
+# The header holds the cache key (format version, AIRAC cycle and path, size
+# and mtime of every source file). The waypoints are the raw columns of the
+# WaypointStore and the grid of their SpatialIndex, they are used directly
+# from the mapped file. For the other tables the index maps the first two
+# characters of an ident (or airway name) to the position of its shard behind
+# the index. Shards are only unpickled when an ident of them is requested (see
+# LazyNavdata). The other spatial indexes are stored as one blob each (see
+# LazyBlobs).
+# All processes that load or attach the cache map the same file, so the
+# waypoints exist only once in memory (page cache) however many FPLGUI
+# instances or batch workers run. A mapped file cannot be replaced or removed
+# on Windows, so every key gets its own file (navdata.<hash of key>.cache).
+# Files of older keys of the same navdata directory (Custom Data and default
+# data have a file each) are removed after saving unless another process still
+# maps them, they are removed by a later save then. Worker processes attach to
+# the file of the main process (see fromPath).
+#==============================================================================
+
+import os
+import re
+import json
+import mmap
+import pickle
+import struct
+import hashlib
+import tempfile
+import warnings
+from collections.abc import Mapping
+from NavdataParser import NAVDATA_ENCODING
+from SpatialIndex import SpatialIndex
+from WaypointStore import WaypointStore
+
+CACHE_VERSION = 8
+CACHE_FILENAME = 'navdata.{}.cache'
+
+# Cache files of all keys (and the one file of versions before 7).
+CACHE_FILE_PATTERN = re.compile(r'navdata\.([0-9a-f]+\.)?cache')
+MAGIC = b'FPLGUINAV'
+HEADER_LENGTH = struct.Struct('<I')
+SHARD_KEY_LENGTH = 2
+ALIGNMENT = 8
+
+NAVDATA_FILES = ['earth_fix.dat','earth_nav.dat','apt.csv','earth_awy.dat']
+NAVDATA_TABLES = ['airports','airways']
+SPATIAL_INDEXES = ['airports']
+
+
+## Returns the navdata directory of X-Plane: Custom Data if it contains all navdata files, otherwise default data.
+def getNavdataDir(xPlaneDir):
+    customDataDir = os.path.join(xPlaneDir,'Custom Data')
+    if all(os.path.exists(os.path.join(customDataDir,fi)) for fi in NAVDATA_FILES):
+        return customDataDir
+    return os.path.join(xPlaneDir,'Resources','default data')
+
+
+## Reads the AIRAC cycle from the header of earth_fix.dat without parsing the file.
+def readCycleNumber(fixesFilePath):
+    with open(fixesFilePath,encoding=NAVDATA_ENCODING) as fixesFile:
+        for _ in range(5):
+            reFind = re.search(r'(?<=data cycle )\d{4}',fixesFile.readline())
+            if reFind:
+                return reFind.group()
+    return None
+
+
+## Returns the name of the cache file of key.
+def getCacheFilename(key):
+    return CACHE_FILENAME.format(hashlib.sha1(json.dumps(key,sort_keys=True).encode('utf-8')).hexdigest()[:16])
+
+
+## Returns the paths of the cache files in cacheDir, newest first.
+def listCacheFiles(cacheDir):
+    try:
+        entries = [en for en in os.scandir(cacheDir) if CACHE_FILE_PATTERN.fullmatch(en.name)]
+    except OSError:
+        return []
+    entries.sort(key=lambda en: en.stat().st_mtime_ns,reverse=True)
+    return [en.path for en in entries]
+
+
+class NavdataCache(object):
+    """
+    The cache file of the navdata in navdataDir. path is the file that was
+    loaded or saved last (None before).
+    """
+    
+    def __init__(self,cacheDir,navdataDir,path=None):
+        self.cacheDir = cacheDir
+        self.path = path
+        self.navdataDir = navdataDir
+        self.sourcePaths = [os.path.join(navdataDir,fi) for fi in NAVDATA_FILES]
+    
+    def getKey(self):
+        sources = []
+        for sp in self.sourcePaths:
+            st = os.stat(sp)
+            sources.append((os.path.abspath(sp),st.st_size,st.st_mtime_ns))
+        
+        return {'version':CACHE_VERSION,
+                'cycle':readCycleNumber(self.sourcePaths[0]),
+                'sources':sources}
+    
+    ## Returns the header of the cache file path (default: self.path) or None if there is no readable cache.
+    def readHeader(self,path=None):
+        try:
+            with open(path or self.path,'rb') as cacheFile:
+                if cacheFile.read(len(MAGIC)) != MAGIC:
+                    return None
+                headerLength = HEADER_LENGTH.unpack(cacheFile.read(HEADER_LENGTH.size))[0]
+                return pickle.loads(cacheFile.read(headerLength))
+        except Exception:
+            # Unpickling a truncated or corrupt header raises nearly any exception, the cache is rebuilt then.
+            return None
+    
+    ## Returns True if header is the one of a cache written from the navdata in navdataDir.
+    def isFromNavdataDir(self,header):
+        sources = header.get('sources') if isinstance(header,dict) else None
+        return bool(sources) and os.path.dirname(sources[0][0]) == os.path.abspath(self.navdataDir)
+    
+    def isValid(self):
+        try:
+            key = self.getKey()
+        except OSError:
+            return False
+        return self.readHeader(os.path.join(self.cacheDir,getCacheFilename(key))) == key
+    
+    ## Returns a NavdataCache of the cache file path if it is up to date for the navdata in navdataDir, otherwise
+    # None (outdated or written from another navdata directory).
+    @classmethod
+    def fromPath(cls,path,navdataDir):
+        cache = cls(os.path.dirname(path),navdataDir,path)
+        try:
+            key = cache.getKey()
+        except OSError:
+            return None
+        return cache if cache.readHeader() == key else None
+    
+    ## Loads the navdata from the cache into the fpl. Returns False if the cache is outdated.
+    # With checkKey=False the newest cache of navdataDir is loaded, outdated as well if it has the current format.
+    def load(self,fpl,checkKey=True):
+        try:
+            key = self.getKey()
+        except OSError:
+            if checkKey:
+                return False
+            key = None
+        
+        if checkKey:
+            self.path = os.path.join(self.cacheDir,getCacheFilename(key))
+        else:
+            paths = [pa for pa in listCacheFiles(self.cacheDir) if self.isFromNavdataDir(self.readHeader(pa))]
+            if not paths:
+                return False
+            self.path = paths[0]
+        try:
+            with open(self.path,'rb') as cacheFile:
+                mm = mmap.mmap(cacheFile.fileno(),0,access=mmap.ACCESS_READ)
+        except (OSError,ValueError):
+            return False
+        
+        try:
+            if mm[:len(MAGIC)] != MAGIC:
+                raise ValueError('No navdata cache')
+            offset = len(MAGIC)
+            headerLength = HEADER_LENGTH.unpack_from(mm,offset)[0]
+            offset += HEADER_LENGTH.size
+            header = pickle.loads(mm[offset:offset+headerLength])
+            if checkKey:
+                outdated = header != key
+            else:
+                outdated = header.get('version') != CACHE_VERSION
+            if outdated:
+                raise ValueError('Navdata cache outdated')
+            offset += headerLength
+            indexLength = HEADER_LENGTH.unpack_from(mm,offset)[0]
+            offset += HEADER_LENGTH.size
+            index = pickle.loads(mm[offset:offset+indexLength])
+            offset = align(offset + indexLength)
+        except Exception:
+            mm.close()
+            return False
+        
+        # The waypoint columns are views of the mapping (the idents are read from
+        # it directly), the shards are decoded on first access. The mapping stays
+        # open meanwhile.
+        view = memoryview(mm)
+        buffers = {name:view[offset+start:offset+start+length] for name,(start,length) in index['waypoints'].items()}
+        buffers['idents'] = (mm,offset + index['waypoints']['idents'][0])
+        fpl.waypoints = WaypointStore.fromBuffers(buffers)
+        for name in NAVDATA_TABLES:
+            setattr(fpl,name,LazyNavdata(mm,offset,index[name]))
+        fpl.spatialIndexes = LazyBlobs(mm,offset,index['spatialIndexes'])
+        buffers = {name:view[offset+start:offset+start+length] for name,(start,length) in index['waypointGrid'].items()}
+        fpl.spatialIndexes['waypoints'] = SpatialIndex.fromBuffers(fpl.waypoints.lats,fpl.waypoints.lons,buffers,index['waypointGridSize'])
+        fpl.cycleNumber = index['cycleNumber']
+        
+        return True
+    
+    ## Writes the navdata of the fpl to the cache file of the current key and removes the files of other keys of
+    # navdataDir and of older versions.
+    # Returns False (with a warning) if the file cannot be written, the navdata of the fpl stays usable then.
+    def save(self,fpl):
+        key = self.getKey()
+        header = pickle.dumps(key,pickle.HIGHEST_PROTOCOL)
+        
+        # Collect the blobs and their positions relative to the first one.
+        blobs = []
+        index = {'cycleNumber':getattr(fpl,'cycleNumber',None)}
+        shardOffset = 0
+        
+        # Raw buffers of the waypoints.
+        waypointGrid = fpl.getSpatialIndex('waypoints')
+        index['waypointGridSize'] = waypointGrid.cellSize
+        for indexName,buffers in [('waypoints',fpl.waypoints.toBuffers()),('waypointGrid',waypointGrid.toBuffers())]:
+            index[indexName] = {}
+            for name,blob in buffers.items():
+                padding = align(shardOffset) - shardOffset
+                blobs.append(bytes(padding))
+                shardOffset += padding
+                index[indexName][name] = (shardOffset,len(blob))
+                blobs.append(blob)
+                shardOffset += len(blob)
+        
+        for name in NAVDATA_TABLES:
+            index[name] = {}
+            for shardKey,shard in splitShards(getattr(fpl,name)).items():
+                blob = pickle.dumps(shard,pickle.HIGHEST_PROTOCOL)
+                index[name][shardKey] = (shardOffset,len(blob),len(shard))
+                blobs.append(blob)
+                shardOffset += len(blob)
+        
+        index['spatialIndexes'] = {}
+        for name in SPATIAL_INDEXES:
+            blob = pickle.dumps(fpl.getSpatialIndex(name),pickle.HIGHEST_PROTOCOL)
+            index['spatialIndexes'][name] = (shardOffset,len(blob))
+            blobs.append(blob)
+            shardOffset += len(blob)
+        
+        indexBlob = pickle.dumps(index,pickle.HIGHEST_PROTOCOL)
+        indexEnd = len(MAGIC) + 2*HEADER_LENGTH.size + len(header) + len(indexBlob)
+        
+        # Write to a temporary file first so a crash never leaves a broken cache. If another process saved the
+        # same key meanwhile and maps it, its file stays (it has the same content).
+        path = os.path.join(self.cacheDir,getCacheFilename(key))
+        tmpPath = None
+        try:
+            fd,tmpPath = tempfile.mkstemp(suffix='.tmp',prefix='{}.'.format(os.path.basename(path)),dir=self.cacheDir)
+            with open(fd,'wb') as cacheFile:
+                cacheFile.write(MAGIC)
+                cacheFile.write(HEADER_LENGTH.pack(len(header)))
+                cacheFile.write(header)
+                cacheFile.write(HEADER_LENGTH.pack(len(indexBlob)))
+                cacheFile.write(indexBlob)
+                cacheFile.write(bytes(align(indexEnd) - indexEnd))
+                for blob in blobs:
+                    cacheFile.write(blob)
+            if self.readHeader(path) == key:
+                os.remove(tmpPath)
+            else:
+                os.replace(tmpPath,path)
+        except OSError as e:
+            if tmpPath is not None and os.path.exists(tmpPath):
+                try:
+                    os.remove(tmpPath)
+                except OSError:
+                    pass
+            warnings.warn('Navdata cache not saved: {}'.format(e))
+            return False
+        self.path = path
+        
+        # Files of older keys, still mapped by other processes on Windows. The caches of other navdata directories
+        # stay.
+        for oldPath in listCacheFiles(self.cacheDir):
+            oldHeader = self.readHeader(oldPath)
+            if oldPath != path and (oldHeader is None or oldHeader.get('version') != CACHE_VERSION
+                                    or self.isFromNavdataDir(oldHeader)):
+                try:
+                    os.remove(oldPath)
+                except OSError:
+                    pass
+        return True
+
+
+## Returns offset rounded up to the next multiple of ALIGNMENT.
+def align(offset):
+    return -(-offset//ALIGNMENT)*ALIGNMENT
+
+
+## Splits a navdata dict into shards by the first characters of the ident.
+def splitShards(navdata):
+    shards = {}
+    for ident,value in navdata.items():
+        shardKey = ident[:SHARD_KEY_LENGTH]
+        if shardKey not in shards:
+            shards[shardKey] = {}
+        shards[shardKey][ident] = value
+    return shards
+
+
+class LazyNavdata(Mapping):
+    """
+    Read-only dict-like view of one navdata table of the cache.
+    Only the shards containing requested idents are unpickled.
+    """
+    
+    def __init__(self,mm,base,shards):
+        self.mm = mm
+        self.base = base
+        self.shards = shards
+        self.loaded = {}
+    
+    def getShard(self,shardKey):
+        shard = self.loaded.get(shardKey)
+        if shard is None:
+            if shardKey not in self.shards:
+                return {}
+            offset,length,_ = self.shards[shardKey]
+            offset += self.base
+            shard = pickle.loads(self.mm[offset:offset+length])
+            self.loaded[shardKey] = shard
+        return shard
+    
+    def __getitem__(self,ident):
+        return self.getShard(ident[:SHARD_KEY_LENGTH])[ident]
+    
+    def __contains__(self,ident):
+        return ident in self.getShard(ident[:SHARD_KEY_LENGTH])
+    
+    def __iter__(self):
+        for shardKey in self.shards:
+            yield from self.getShard(shardKey)
+    
+    def __len__(self):
+        return sum(sh[2] for sh in self.shards.values())
+
+
+class LazyBlobs(dict):
+    """
+    Dict of objects of the cache, each one is unpickled on first access.
+    """
+    
+    def __init__(self,mm,base,blobs):
+        dict.__init__(self)
+        self.mm = mm
+        self.base = base
+        self.blobs = blobs
+    
+    def __missing__(self,name):
+        if name not in self.blobs:
+            raise KeyError(name)
+        offset,length = self.blobs[name]
+        offset += self.base
+        value = pickle.loads(self.mm[offset:offset+length])
+        self[name] = value
+        return value
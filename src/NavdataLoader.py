@@ -0,0 +1,86 @@
+#!/usr/bin/python
+# -*- coding: iso-8859-15 -*-
+#==============================================================================
+# NavdataLoader - Loads the navdata of a Fpl in a background thread
+# Copyright (C) 2019  Oliver Clemens
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <https://www.gnu.org/licenses/>.
+#==============================================================================
+# The Tk main thread must not touch the loader except reading its attributes.
+# Poll them via after() and check the events before using the navdata.
+#==============================================================================
+
+import os
+import threading
+from NavdataCache import NAVDATA_FILES
+
+
+class NavdataLoader(threading.Thread):
+    
+    def __init__(self,fpl,navdataDir,cacheDir,workers=1):
+        threading.Thread.__init__(self,name='NavdataLoader',daemon=True)
+        self.fpl = fpl
+        self.navdataDir = navdataDir
+        self.cacheDir = cacheDir
+        self.workers = workers
+        
+        # Progress, written by the loader thread only.
+        self.stage = 'cache'
+        self.bytesTotal = sum(os.path.getsize(os.path.join(navdataDir,fi)) for fi in NAVDATA_FILES)
+        self.bytesDone = 0
+        self.bytesRead = 0
+        self.linesDone = 0
+        self.linesRead = 0
+        self.fromCache = False
+        self.error = None
+        
+        # Set when airports (sufficient for the main window) resp. everything is loaded.
+        self.airportsLoaded = threading.Event()
+        self.finished = threading.Event()
+    
+    def run(self):
+        try:
+            self.fromCache = self.fpl.loadNavdata(self.navdataDir,self.cacheDir,self.progress,self.workers)
+        except Exception as e:
+            self.error = e
+            raise
+        finally:
+            self.stage = 'done'
+            self.bytesRead = self.bytesTotal
+            self.airportsLoaded.set()
+            self.finished.set()
+    
+    def progress(self,stage,nBytes,nLines):
+        if stage != self.stage:
+            # New stage, the last one is done.
+            self.bytesDone = self.bytesRead
+            self.linesDone = self.linesRead
+            if self.stage == 'airports':
+                self.airportsLoaded.set()
+            self.stage = stage
+        self.bytesRead = self.bytesDone + nBytes
+        self.linesRead = self.linesDone + nLines
+    
+    ## Returns a short description of the current progress.
+    def getStatus(self):
+        if self.error is not None:
+            return 'Error loading navdata: {}'.format(self.error)
+        if self.stage == 'cache':
+            return 'Reading navdata cache'
+        if self.stage == 'done':
+            return 'Navdata loaded'
+        return 'Parsing {}: {:.1f}/{:.1f} MB, {} lines'.format(self.stage,
+                                                          self.bytesRead/1e6,
+                                                          self.bytesTotal/1e6,
+                                                          self.linesRead)
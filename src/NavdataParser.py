@@ -0,0 +1,236 @@
+#!/usr/bin/python
+# -*- coding: iso-8859-15 -*-
+#==============================================================================
+# NavdataParser - Parsers of the X-Plane navdata files, serial and parallel
+# Copyright (C) 2019  Oliver Clemens
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <https://www.gnu.org/licenses/>.
+#==============================================================================
+# The parse* functions take an iterable of lines and return plain data that is
+# merged into a Fpl by Fpl.add*. For parallel parsing the files are split in
+# byte ranges at line boundaries and the chunks are parsed in a process pool.
+# The results are merged in file order, so they are identical to the serial
+# parse.
+# The fields are split with str.split (the files are separated by spaces),
+# coordinates are collected as strings and converted column by column.
+#==============================================================================
+
+import os
+import re
+import gc
+from contextlib import contextmanager
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+import Instrumentation
+
+# Lines between two progress reports of the navdata loaders.
+PROGRESS_INTERVAL = 20000
+
+# Chunks per worker, more chunks give smoother progress and load balancing.
+CHUNKS_PER_WORKER = 4
+
+# Row codes of earth_nav.dat that are waypoints and their type (NDB, VOR, DME -> VOR).
+NAVAID_TYPES = {'2':2,'3':3,'13':3}
+
+# Encoding of the navdata files for the serial and the parallel parse. Only the (ASCII) idents and coordinates
+# are used, latin-1 decodes any other byte (e.g. of airport names) without error and independent of the locale.
+NAVDATA_ENCODING = 'latin-1'
+
+
+## Yields the lines of a text file. Reports progress(bytes,lines) every PROGRESS_INTERVAL lines and at the end.
+def readLines(filePath,progress=None):
+    with open(filePath,encoding=NAVDATA_ENCODING) as textFile:
+        if progress is None and not Instrumentation.enabled:
+            yield from textFile
+            return
+        
+        lineNr = 0
+        for lineNr,line in enumerate(textFile,1):
+            if progress is not None and not lineNr % PROGRESS_INTERVAL:
+                progress(textFile.buffer.tell(),lineNr)
+            yield line
+        Instrumentation.count('navdata.lines',lineNr)
+        if progress is not None:
+            progress(os.path.getsize(filePath),lineNr)
+
+
+## Returns the lines (without line end) of the byte range [start,end) of a file. Like readLines only \n and \r\n
+# end a line, str.splitlines would split at latin-1 characters like \x85 as well.
+def readChunk(filePath,start,end):
+    with open(filePath,'rb') as chunkFile:
+        chunkFile.seek(start)
+        lines = chunkFile.read(end - start).decode(NAVDATA_ENCODING).split('\n')
+    if not lines[-1]:
+        lines.pop()
+    return [line[:-1] if line.endswith('\r') else line for line in lines]
+
+
+## Splits a file in about nChunks byte ranges (start,end) that begin at line starts.
+def getChunks(filePath,nChunks):
+    size = os.path.getsize(filePath)
+    bounds = [0]
+    with open(filePath,'rb') as chunkFile:
+        for chId in range(1,nChunks):
+            pos = max(size*chId//nChunks,bounds[-1])
+            chunkFile.seek(pos)
+            chunkFile.readline()
+            pos = min(chunkFile.tell(),size)
+            if pos > bounds[-1]:
+                bounds.append(pos)
+    if bounds[-1] < size:
+        bounds.append(size)
+    return list(zip(bounds[:-1],bounds[1:]))
+
+
+## Pauses the garbage collector. Parsers creating many tuples/lists would trigger it again and again
+# (the results contain no reference cycles).
+@contextmanager
+def pausedGc():
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+## Returns an array of the floats of strings, converted in one pass (faster than one by one in the parse loop).
+def toFloatArray(strings):
+    return array('d',map(float,strings))
+
+
+## Parses lines of earth_fix.dat. Returns the waypoint columns and the cycle number (None if not in lines).
+def parseFixes(lines):
+    idents = []
+    lats = []
+    lons = []
+    cycleNumber = None
+    for line in lines:
+        lineSplit = line.split()
+        if len(lineSplit) == 6:
+            lats.append(lineSplit[0])
+            lons.append(lineSplit[1])
+            idents.append(lineSplit[2])
+        elif len(lineSplit) > 1 and 'data cycle ' in line:
+            reFind = re.findall(r'(?<=data cycle )\d{4}',line)
+            if reFind:
+                cycleNumber = reFind[0]
+    return (idents,toFloatArray(lats),toFloatArray(lons),array('b',[11])*len(idents)),cycleNumber
+
+
+## Parses lines of earth_nav.dat. Returns the waypoint columns (NDB, VOR and DME).
+def parseNavaids(lines):
+    idents = []
+    lats = []
+    lons = []
+    types = []
+    for line in lines:
+        lineSplit = line.split()
+        if lineSplit and lineSplit[0] in NAVAID_TYPES:
+            idents.append(lineSplit[7])
+            lats.append(lineSplit[1])
+            lons.append(lineSplit[2])
+            types.append(NAVAID_TYPES[lineSplit[0]])
+    return idents,toFloatArray(lats),toFloatArray(lons),array('b',types)
+
+
+## Parses lines of apt.csv. Returns the airports.
+def parseAirports(lines):
+    airports = {}
+    with pausedGc():
+        for line in lines:
+            lineSplit = line.strip().split(',')
+            if len(lineSplit) < 4:
+                continue
+            airports[lineSplit[0]] = [float(lineSplit[2].split()[1]),float(lineSplit[3].split()[1])]
+    return airports
+
+
+## Parses lines of earth_awy.dat. Returns segments (name1,type1,name2,type2,airwayNames).
+def parseAirways(lines):
+    segments = []
+    with pausedGc():
+        for line in lines:
+            lineSplit = line.split()
+            if len(lineSplit) == 11:
+                segments.append((lineSplit[0],int(lineSplit[2]),lineSplit[3],int(lineSplit[5]),lineSplit[10].split('-')))
+    return segments
+
+
+# Stages of the navdata loading: (stage, file name, parser, Fpl merge method).
+# Airports first, they are sufficient to open the main window.
+STAGES = [('airports','apt.csv',parseAirports,'addAirports'),
+          ('fixes','earth_fix.dat',parseFixes,'addFixes'),
+          ('navaids','earth_nav.dat',parseNavaids,'addWaypoints'),
+          ('airways','earth_awy.dat',parseAirways,'addAirwaySegments')]
+PARSERS = {st[0]:st[2] for st in STAGES}
+MERGE_METHODS = {st[0]:st[3] for st in STAGES}
+
+
+## Worker: parses a chunk of a file. Returns the result and the number of lines.
+def parseChunk(stage,filePath,start,end):
+    lines = readChunk(filePath,start,end)
+    return PARSERS[stage](lines),len(lines)
+
+
+## Parses all navdata files of navdataDir and passes the results to merge(stage,result) in file order, with more
+# than one worker (None: all cores) in parallel, a stage is merged in several results (chunks) then.
+# progress(stage,bytes,lines) is called at the start of every stage (after all results of the stage before are
+# merged) and periodically.
+def parseNavdata(navdataDir,merge,workers=1,progress=None):
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers > 1:
+        parseParallel(navdataDir,merge,workers,progress)
+        return
+    
+    for stage,filename,parser,_ in STAGES:
+        filePath = os.path.join(navdataDir,filename)
+        with Instrumentation.span('navdata.parse.{}'.format(stage)):
+            if progress is None:
+                merge(stage,parser(readLines(filePath)))
+            else:
+                progress(stage,0,0)
+                merge(stage,parser(readLines(filePath,lambda nBytes,nLines,stage=stage: progress(stage,nBytes,nLines))))
+
+
+## Parses all navdata files of navdataDir in a pool of workers processes, see parseNavdata.
+# progress(stage,bytes,lines) is called at the start of every stage and after every merged chunk.
+@Instrumentation.traced('navdata.parseParallel')
+def parseParallel(navdataDir,merge,workers=None,progress=None):
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(workers) as pool:
+        # Submit all chunks of all files at once.
+        jobs = []
+        for stage,filename,_,_ in STAGES:
+            filePath = os.path.join(navdataDir,filename)
+            futures = [(pool.submit(parseChunk,stage,filePath,start,end),end - start)
+                       for start,end in getChunks(filePath,workers*CHUNKS_PER_WORKER)]
+            jobs.append((stage,futures))
+        
+        # Merge in file order.
+        for stage,futures in jobs:
+            nBytes = 0
+            nLines = 0
+            if progress is not None:
+                progress(stage,nBytes,nLines)
+            for future,chunkSize in futures:
+                result,chunkLines = future.result()
+                merge(stage,result)
+                nBytes += chunkSize
+                nLines += chunkLines
+                Instrumentation.count('navdata.lines',chunkLines)
+                if progress is not None:
+                    progress(stage,nBytes,nLines)
@@ -0,0 +1,264 @@
+#!/usr/bin/python
+# -*- coding: iso-8859-15 -*-
+#==============================================================================
+# NavdataUpdate - Incremental update of the navdata cache to new navdata
+# Copyright (C) 2019  Oliver Clemens
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <https://www.gnu.org/licenses/>.
+#==============================================================================
+# If the navdata changed (e.g. new AIRAC cycle) the new files are parsed and
+# compared with the outdated cache:
+#   waypoints (by ident and type) and airports: added, removed, moved
+#   airway segments: added, removed
+# Airways without changed segments or waypoints are taken from the cache, only
+# the others are built again (building the airways is the slow part of the
+# parsing). The changes are written to navdataUpdate.json in the cache
+# directory. Routes using changed waypoints or airways can be listed with
+# findAffectedRoutes.
+#
+# Usage: python NavdataUpdate.py navdataDir cacheDir [routes...]
+#   routes: .fpl files, corte.in, routeDatabase.txt or directories of them
+#==============================================================================
+
+import os
+import sys
+import json
+import time
+import types
+from NavdataCache import NavdataCache
+from NavdataParser import parseNavdata
+from RouteDatabase import iterStoredRoutes
+import avFormula
+import Instrumentation
+
+REPORT_FILENAME = 'navdataUpdate.json'
+
+# Points of the same ident and type within this distance are moved, not removed and added.
+MOVE_LIMIT_NM = 100
+
+
+## Loads the outdated cache. Returns plain copies of the data, so the cache file is not mapped anymore
+# afterwards, or None if there is no cache of the current format.
+def readCachedNavdata(cacheDir,navdataDir):
+    cached = types.SimpleNamespace()
+    if not NavdataCache(cacheDir,navdataDir).load(cached,checkKey=False):
+        return None
+    
+    store = cached.waypoints
+    rowIdents = [ident for k,ident in enumerate(store.idents) for _ in range(store.starts[k+1] - store.starts[k])]
+    return {'cycleNumber':cached.cycleNumber,
+            'waypoints':set(zip(rowIdents,store.types,store.lats,store.lons)),
+            'airports':{(ident,) + tuple(cached.airports[ident]) for ident in cached.airports},
+            'airways':dict(cached.airways.items())}
+
+
+## Returns the points {key:[(lat,lon),...]} of rows (key...,lat,lon) grouped by key.
+def groupPoints(rows):
+    points = {}
+    for row in rows:
+        key = row[:-2]
+        if key not in points:
+            points[key] = []
+        points[key].append(row[-2:])
+    return points
+
+
+## Compares the sets of rows (key...,lat,lon). Returns lists added, removed and moved of dicts.
+def diffPoints(oldRows,newRows,keyNames):
+    oldPoints = groupPoints(oldRows - newRows)
+    newPoints = groupPoints(newRows - oldRows)
+    added = []
+    removed = []
+    moved = []
+    for key in oldPoints.keys() | newPoints.keys():
+        record = dict(zip(keyNames,key))
+        old = oldPoints.get(key,[])
+        new = newPoints.get(key,[])
+        
+        # Moved points, nearest first.
+        pairs = sorted((avFormula.gcDistanceNm(op[0],np[0],op[1],np[1]),opId,npId)
+                       for opId,op in enumerate(old) for npId,np in enumerate(new))
+        oldLeft = set(range(len(old)))
+        newLeft = set(range(len(new)))
+        for distance,opId,npId in pairs:
+            if distance > MOVE_LIMIT_NM:
+                break
+            if opId in oldLeft and npId in newLeft:
+                oldLeft.remove(opId)
+                newLeft.remove(npId)
+                moved.append(dict(record,old=old[opId],new=new[npId],distanceNm=round(distance,3)))
+        removed.extend(dict(record,lat=old[opId][0],lon=old[opId][1]) for opId in sorted(oldLeft))
+        added.extend(dict(record,lat=new[npId][0],lon=new[npId][1]) for npId in sorted(newLeft))
+    
+    for records in (added,removed,moved):
+        records.sort(key=lambda re: [re[na] for na in keyNames])
+    return added,removed,moved
+
+
+## Returns the key of the segment between the waypoints name1 and name2, the same in both directions.
+def segmentKey(name1,name2):
+    return (name1,name2) if name1 <= name2 else (name2,name1)
+
+
+## Returns the segments {airway:{(name1,name2),...}} (see segmentKey) of Airway objects, the closing segments of
+# circular airways included.
+def airwaySegments(airways):
+    segments = {}
+    for name,aw in airways.items():
+        segments[name] = {segmentKey(fi1[0],fi2[0]) for pa in aw.parts for fi1,fi2 in zip(pa[:-1],pa[1:])}
+        segments[name].update(segmentKey(fi1[0],fi2[0]) for fi1,fi2 in aw.closingSegments)
+    return segments
+
+
+## Returns the segments {airway:{(name1,name2),...}} (see segmentKey) of parseAirways results between known
+# waypoints.
+def parsedSegments(segments,knownNames):
+    result = {}
+    for name1,_,name2,_,airwayNames in segments:
+        if name1 not in knownNames or name2 not in knownNames:
+            continue
+        for aw in airwayNames:
+            if aw not in result:
+                result[aw] = set()
+            result[aw].add(segmentKey(name1,name2))
+    return result
+
+
+## Updates the cache in cacheDir to the navdata of navdataDir and loads it into fpl. progress and workers: see
+# NavdataParser.parseNavdata. Returns the report of the changes or None if there is no outdated cache to update
+# (parse everything then).
+@Instrumentation.traced('navdata.update')
+def updateNavdata(fpl,navdataDir,cacheDir,progress=None,workers=1):
+    t0 = time.perf_counter()
+    cached = readCachedNavdata(cacheDir,navdataDir)
+    if cached is None:
+        return None
+    
+    # Parse the new files. Airports and waypoints are merged into fpl as soon as they are parsed (like a full parse,
+    # the main window opens after the airports), the airway segments are only collected.
+    newWaypoints = set()
+    parsedAirways = []
+    
+    def merge(stage,result):
+        if stage == 'airways':
+            parsedAirways.extend(result)
+            return
+        fpl.mergeParsed(stage,result)
+        if stage != 'airports':
+            idents,lats,lons,wpTypes = result[0] if stage == 'fixes' else result
+            newWaypoints.update(zip(idents,wpTypes,lats,lons))
+    
+    parseNavdata(navdataDir,merge,workers,progress)
+    fpl.waypoints.finalize()
+    
+    # Differences.
+    waypointChanges = diffPoints(cached['waypoints'],newWaypoints,['ident','type'])
+    airportChanges = diffPoints(cached['airports'],{(ident,) + tuple(ap) for ident,ap in fpl.airports.items()},['ident'])
+    
+    oldSegments = airwaySegments(cached['airways'])
+    newSegments = parsedSegments(parsedAirways,{wp[0] for wp in newWaypoints})
+    segmentsAdded = []
+    segmentsRemoved = []
+    for aw in sorted(oldSegments.keys() | newSegments.keys()):
+        segmentsAdded.extend([aw,fi1,fi2] for fi1,fi2 in sorted(newSegments.get(aw,set()) - oldSegments.get(aw,set())))
+        segmentsRemoved.extend([aw,fi1,fi2] for fi1,fi2 in sorted(oldSegments.get(aw,set()) - newSegments.get(aw,set())))
+    
+    # Airways with changed segments or waypoints are built again, the others are taken from the cache.
+    changedWaypoints = {re['ident'] for changes in waypointChanges for re in changes}
+    rebuild = {se[0] for se in segmentsAdded + segmentsRemoved}
+    for aw,segments in newSegments.items():
+        if aw not in rebuild and any(fi in changedWaypoints for se in segments for fi in se):
+            rebuild.add(aw)
+    fpl.addAirwaySegments([se[:4] + ([aw for aw in se[4] if aw in rebuild],) for se in parsedAirways
+                           if any(aw in rebuild for aw in se[4])])
+    for aw in newSegments:
+        if aw not in rebuild:
+            fpl.airways[aw] = cached['airways'][aw]
+    fpl.finalizeAirways()
+    oldCycle = cached['cycleNumber']
+    del cached
+    
+    NavdataCache(cacheDir,navdataDir).save(fpl)
+    
+    report = {'oldCycle':oldCycle,
+              'newCycle':getattr(fpl,'cycleNumber',None),
+              'duration':round(time.perf_counter() - t0,3),
+              'waypoints':dict(zip(['added','removed','moved'],waypointChanges)),
+              'airports':dict(zip(['added','removed','moved'],airportChanges)),
+              'airwaySegments':{'added':segmentsAdded,'removed':segmentsRemoved},
+              'airwaysRebuilt':sorted(rebuild & newSegments.keys()),
+              'airwaysRemoved':sorted(rebuild - newSegments.keys()),
+              'airwaysKept':len(newSegments.keys() - rebuild)}
+    with open(os.path.join(cacheDir,REPORT_FILENAME),'w') as reportFile:
+        json.dump(report,reportFile,indent=1)
+    return report
+
+
+## Returns the names of the waypoints and airways changed by an update (see updateNavdata).
+def getChangedNames(report):
+    names = set()
+    for table in ('waypoints','airports'):
+        for changes in report[table].values():
+            names.update(re['ident'] for re in changes)
+    names.update(report['airwaysRebuilt'])
+    names.update(report['airwaysRemoved'])
+    return names
+
+
+## Returns [(source,depicao,route,desticao),...] of the stored routes using a waypoint, airport or airway
+# changed by an update. paths: see RouteDatabase.iterStoredRoutes.
+def findAffectedRoutes(report,paths):
+    changedNames = getChangedNames(report)
+    affected = []
+    for source,depicao,route,desticao in iterStoredRoutes(paths):
+        names = [depicao,desticao] + [to.partition('/')[0] for to in route.split()]
+        if any(na in changedNames for na in names):
+            affected.append((source,depicao,route,desticao))
+    return affected
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) < 2:
+        print('Usage: python NavdataUpdate.py navdataDir cacheDir [routes...]')
+        return 2
+    navdataDir,cacheDir,routePaths = argv[0],argv[1],argv[2:]
+    
+    if NavdataCache(cacheDir,navdataDir).isValid():
+        print('Navdata cache is up to date.')
+        return 0
+    
+    from Fpl import Fpl
+    fpl = Fpl(cacheDir)
+    report = updateNavdata(fpl,navdataDir,cacheDir)
+    if report is None:
+        print('No navdata cache to update, parsing everything.')
+        fpl.loadNavdata(navdataDir,cacheDir)
+        return 0
+    
+    print('Cycle {} -> {} in {:.2f} s'.format(report['oldCycle'],report['newCycle'],report['duration']))
+    for table in ('waypoints','airports'):
+        print('{}: {} added, {} removed, {} moved'.format(table,*[len(report[table][ch]) for ch in ('added','removed','moved')]))
+    print('airway segments: {} added, {} removed'.format(len(report['airwaySegments']['added']),
+                                                          len(report['airwaySegments']['removed'])))
+    print('airways: {} rebuilt, {} removed, {} kept'.format(len(report['airwaysRebuilt']),
+                                                           len(report['airwaysRemoved']),
+                                                           report['airwaysKept']))
+    for source,depicao,route,desticao in findAffectedRoutes(report,routePaths):
+        print('affected: {}: {} {} {}'.format(source,depicao,route,desticao))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -23,9 +23,10 @@ import datetime
 import os
 import re
 import configparser as ConfigParser
-from tkinter import Tk, Menu, Label, Entry, StringVar, IntVar, OptionMenu, W, END, Toplevel, Button, Listbox, Checkbutton
+from tkinter import Tk, Menu, Label, Entry, StringVar, IntVar, OptionMenu, W, END, Toplevel, Button, Listbox, Checkbutton, TclError
 from tkinter.filedialog import askdirectory, askopenfilename, asksaveasfilename
 from tkinter.messagebox import showwarning, showinfo
+from Instrumentation import TRACE_FORMATS
 
 class OptionsWindow(object):
     
@@ -47,6 +48,11 @@ class OptionsWindow(object):
 #         self.fsxUse = IntVar(self.master)
 #         self.fsxUse.set(0)
 #         self.fsxDir = StringVar(self.master)
+        self.navdataWorkers = IntVar(self.master)
+        self.navdataWorkers.set(1)
+        self.traceFile = StringVar(self.master)
+        self.traceFormat = StringVar(self.master)
+        self.traceFormat.set(TRACE_FORMATS[0])
         
         # Get current options.
         self.optionsFile = os.path.join(databaseDir,'FPLGUI.cfg')
@@ -114,6 +120,34 @@ class OptionsWindow(object):
         self.e_opfFormat = Entry(self.master,textvariable=self.opfFormat)#,width=50)
         self.e_opfFormat.grid(row=6, column=1)
         
+        #------------- NAVDATA -------------#
+        # Row 7
+        Label(self.master).grid(row=7,column=0)
+        
+        # Row 8
+        Label(self.master, text="Navdata").grid(row=8, column=0)
+        
+        # Row 9
+        Label(self.master, text='Parser processes').grid(row=9, column=0)
+        
+        self.e_navdataWorkers = Entry(self.master,textvariable=self.navdataWorkers)
+        self.e_navdataWorkers.grid(row=9, column=1)
+        Label(self.master, text='(1: serial, 0: all cores)').grid(row=9, column=2)
+        
+        #------------- DEBUG -------------#
+        # Row 10
+        Label(self.master).grid(row=10,column=0)
+        
+        # Row 11
+        Label(self.master, text="Debug").grid(row=11, column=0)
+        
+        # Row 12
+        Label(self.master, text='Trace file').grid(row=12, column=0)
+        
+        self.e_traceFile = Entry(self.master,textvariable=self.traceFile,width=50)
+        self.e_traceFile.grid(row=12, column=1,columnspan=3)
+        OptionMenu(self.master,self.traceFormat,*TRACE_FORMATS).grid(row=12, column=4)
+        Label(self.master, text='(timing of the next start, empty: off)').grid(row=13, column=1)
         
         
         
@@ -139,6 +173,16 @@ class OptionsWindow(object):
                 self.xpUse.set(int(config.get('FPLGUI','XPUSE')))
             except ConfigParser.NoOptionError:
                 self.xpUse.set(1)
+            
+            # navdataWorkers
+            try:
+                self.navdataWorkers.set(config.getint('NAVDATA','WORKERS'))
+            except (ConfigParser.NoSectionError,ConfigParser.NoOptionError,ValueError):
+                self.navdataWorkers.set(1)
+            
+            # Trace
+            self.traceFile.set(config.get('DEBUG','TRACEFILE',fallback=''))
+            self.traceFormat.set(config.get('DEBUG','TRACEFORMAT',fallback=TRACE_FORMATS[0]))
     
     def saveOptions(self):
         # Check options validity.
@@ -156,6 +200,18 @@ class OptionsWindow(object):
         config.add_section('SIMBRIEF')
         config.set('SIMBRIEF', 'opfformat', self.opfFormat.get())
         
+        # Navdata
+        config.add_section('NAVDATA')
+        try:
+            config.set('NAVDATA', 'WORKERS', self.navdataWorkers.get())
+        except TclError:
+            config.set('NAVDATA', 'WORKERS', 1)
+        
+        # Debug
+        config.add_section('DEBUG')
+        config.set('DEBUG', 'TRACEFILE', self.traceFile.get())
+        config.set('DEBUG', 'TRACEFORMAT', self.traceFormat.get())
+        
         with open(os.path.join(self.optionsFile),'w') as configFile:
             config.write(configFile)
     
@@ -0,0 +1,183 @@
+#!/usr/bin/python
+# -*- coding: iso-8859-15 -*-
+#==============================================================================
+# RouteCompleter - Completion of route elements from the loaded navdata
+# Copyright (C) 2019  Oliver Clemens
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <https://www.gnu.org/licenses/>.
+#==============================================================================
+# The waypoint idents are already sorted in the WaypointStore, so the rows of
+# all idents with a prefix are one contiguous range. Airway names are kept in
+# a sorted list. Candidates are ranked:
+#   1. connected: airways via the last waypoint resp. waypoints on the last
+#      airway of the route
+#   2. distance to the last waypoint of the route (or departure airport)
+#   3. ident
+#==============================================================================
+
+from bisect import bisect_left
+import avFormula
+from SpatialIndex import NM_PER_RADIAN
+from WaypointStore import PREFIX_END
+
+# Number of candidates returned by complete.
+MAX_RESULTS = 10
+
+# Maximum waypoint rows ranked by distance one by one. Larger prefix ranges
+# are searched around the last waypoint with the spatial index.
+MAX_RANKED_ROWS = 50000 if avFormula.numpy is not None else 1000
+
+# Radius of the spatial search, doubled up to the maximum until enough
+# candidates are found.
+SEARCH_RADIUS_NM = 60
+MAX_SEARCH_RADIUS_NM = 240
+
+
+class RouteCompleter(object):
+    """
+    Completes the last element of a route string. The indexes are built on
+    first use, so create it only after the navdata is loaded.
+    """
+    
+    def __init__(self,fpl):
+        self.fpl = fpl
+        self.airwayNames = None
+        self.fixAirways = None
+        self.context = (None,None)
+    
+    ## Builds the sorted airway names and the airways of every fix.
+    def buildIndex(self):
+        self.airwayNames = sorted(self.fpl.airways)
+        self.fixAirways = {}
+        for aw in self.fpl.airways.values():
+            for pa in aw.parts:
+                for fix in pa:
+                    if fix[0] not in self.fixAirways:
+                        self.fixAirways[fix[0]] = set()
+                    self.fixAirways[fix[0]].add(aw.name)
+    
+    ## Returns the ranked candidates [(ident,kind,distanceNm),...] for the last element of route.
+    # kind is 'waypoint' or 'airway', distanceNm is None if there is no position in the route.
+    def complete(self,route,depicao=None,limit=MAX_RESULTS):
+        if self.airwayNames is None:
+            self.buildIndex()
+        
+        tokens = route.upper().split(' ')
+        prefix = tokens[-1]
+        position,airway,fix = self.getContext(depicao,tuple(to for to in tokens[:-1] if to))
+        
+        # Connected candidates.
+        ranked = []
+        if airway is not None:
+            for name,lat,lon,_ in self.getAirwayFixes(airway,fix):
+                if name.startswith(prefix) and (fix is None or name != fix[0]):
+                    distance = None if position is None else avFormula.gcDistanceNm(position[0],lat,position[1],lon)
+                    ranked.append((0,distance,name,'waypoint'))
+        elif fix is not None:
+            for aw in self.fixAirways.get(fix[0],()):
+                if aw.startswith(prefix):
+                    ranked.append((0,None,aw,'airway'))
+        
+        # Other candidates, only if something is typed.
+        if prefix:
+            ranked.extend((1,distance,name,'waypoint') for name,distance in self.getWaypoints(prefix,position,limit))
+            k0 = bisect_left(self.airwayNames,prefix)
+            k1 = bisect_left(self.airwayNames,prefix + PREFIX_END)
+            ranked.extend((1,None,aw,'airway') for aw in self.airwayNames[k0:min(k1,k0+limit)])
+        
+        result = []
+        known = set()
+        for _,distance,name,kind in sorted(ranked,key=rankKey):
+            if (name,kind) not in known:
+                known.add((name,kind))
+                result.append((name,kind,distance))
+                if len(result) == limit:
+                    break
+        return result
+    
+    ## Resolves the route elements tokens starting at depicao.
+    # Returns the position of the last waypoint (lat,lon), the name of the airway following it
+    # (or None) and the last waypoint (name,lat,lon,type). The last result is reused.
+    def getContext(self,depicao,tokens):
+        if self.context[0] == (depicao,tokens):
+            return self.context[1]
+        
+        position = self.fpl.airports.get(depicao) if depicao else None
+        airway = None
+        fix = None
+        for to in tokens:
+            rows = self.fpl.waypoints.find(to)
+            if to in self.fpl.airways and (rows is None or (fix is not None and fix in self.fpl.airways[to].index)):
+                airway = to
+            elif rows is not None:
+                row = rows[0]
+                if position is not None and rows[1] - rows[0] > 1:
+                    row += avFormula.nearestPoint(position[0],position[1],
+                                                  self.fpl.waypoints.lats[rows[0]:rows[1]],
+                                                  self.fpl.waypoints.lons[rows[0]:rows[1]])[0]
+                lat,lon,wpType = self.fpl.waypoints.getRow(row)
+                fix = (to,lat,lon,wpType)
+                position = (lat,lon)
+                airway = None
+            else:
+                # DCT, speed/level, SID/STAR...
+                airway = None
+        
+        self.context = ((depicao,tokens),(position,airway,fix))
+        return self.context[1]
+    
+    ## Returns the fixes of the part of airway containing fix (all parts if fix is not on it).
+    def getAirwayFixes(self,airway,fix):
+        aw = self.fpl.airways[airway]
+        if fix is not None and fix in aw.index:
+            return aw.parts[aw.index[fix][0]]
+        return [fi for pa in aw.parts for fi in pa]
+    
+    ## Returns up to limit waypoints [(ident,distanceNm),...] starting with prefix, nearest to position first.
+    def getWaypoints(self,prefix,position,limit):
+        store = self.fpl.waypoints
+        rowStart,rowStop = store.findPrefix(prefix)
+        if rowStart == rowStop:
+            return []
+        
+        if position is None:
+            k0,k1 = store.idents.findPrefix(prefix)
+            return [(store.idents[k],None) for k in range(k0,min(k1,k0 + limit))]
+        
+        if rowStop - rowStart <= MAX_RANKED_ROWS:
+            nearest = [(rowStart + ro,di*NM_PER_RADIAN) for ro,di in
+                       avFormula.nearestPoints(position[0],position[1],store.lats[rowStart:rowStop],store.lons[rowStart:rowStop],2*limit)]
+        else:
+            nearest = []
+            radiusNm = SEARCH_RADIUS_NM
+            while len(nearest) < limit and radiusNm <= MAX_SEARCH_RADIUS_NM:
+                nearest = [(ro,di) for ro,di in self.fpl.getSpatialIndex('waypoints').radius(position[0],position[1],radiusNm)
+                           if rowStart <= ro < rowStop]
+                radiusNm *= 2
+        
+        # Duplicate idents only count with their nearest row.
+        result = []
+        known = set()
+        for row,distance in nearest:
+            ident = store.getIdent(row)
+            if ident not in known:
+                known.add(ident)
+                result.append((ident,distance))
+        return result[:limit]
+
+
+## Sort key of the ranked candidates (connected,distance,name,kind), unknown distances last.
+def rankKey(candidate):
+    connected,distance,name,kind = candidate
+    return (connected,distance is None,distance or 0,name,kind)
@@ -0,0 +1,235 @@
+#!/usr/bin/python
+# -*- coding: iso-8859-15 -*-
+#==============================================================================
+# RouteDatabase - Indexed IVAO route database
+# Copyright (C) 2019  Oliver Clemens
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <https://www.gnu.org/licenses/>.
+#==============================================================================
+# routeDatabase.txt has one route per line:
+#   DEPIDESTnn;routing;FLxxx, comment
+# It is converted once into a SQLite table indexed by the city pair DEPIDEST.
+# When size or modification time of the text file change, the routes of the
+# changed city pairs are replaced (the order of the routes matters only within
+# a city pair). The changed city pairs are found by a hash of the routes of
+# every city pair (table citypairs), so neither the old table nor the new file
+# is held in memory.
+# iterStoredRoutes reads the routes of all kinds of route files.
+#==============================================================================
+
+import os
+import re
+import sqlite3
+import hashlib
+import tempfile
+from contextlib import closing
+from FlightPlan import FlightPlan
+import Instrumentation
+
+ROUTE_DB_VERSION = 2
+ROUTE_TXT_FILENAME = 'routeDatabase.txt'
+ROUTE_DB_FILENAME = 'routeDatabase.sqlite'
+
+ROUTE_PATTERN = re.compile(r'(\w{8})\d{2};.+\n')
+
+# Company routes of the Flight Factor A320 (see FPLGUI.export2FFA320).
+CORTE_FILENAME = 'corte.in'
+COMPANY_ROUTE_SUFFIX = re.compile(r'CI\d+|FL\d+')
+
+
+class RouteDatabase(object):
+    
+    def __init__(self,databaseDir):
+        self.txtPath = os.path.join(databaseDir,ROUTE_TXT_FILENAME)
+        self.dbPath = os.path.join(databaseDir,ROUTE_DB_FILENAME)
+    
+    ## Returns the key of the text file the table has to match.
+    def getKey(self):
+        st = os.stat(self.txtPath)
+        return '{} {} {}'.format(ROUTE_DB_VERSION,st.st_size,st.st_mtime_ns)
+    
+    def isValid(self):
+        if not os.path.isfile(self.dbPath):
+            return False
+        try:
+            with closing(sqlite3.connect(self.dbPath)) as db:
+                row = db.execute("SELECT value FROM meta WHERE name='key'").fetchone()
+        except sqlite3.Error:
+            return False
+        return row is not None and row[0] == self.getKey()
+    
+    ## Converts the text file into the indexed table, line by line. Returns the number of city pairs.
+    @Instrumentation.traced('routeDatabase.build')
+    def build(self):
+        key = self.getKey()
+        
+        # Build in a temporary file first so a crash never leaves a broken database. The name is unique, a GUI
+        # import and the RouteDownloader may build at the same time.
+        fd,tmpPath = tempfile.mkstemp(suffix='.tmp',prefix='{}.'.format(ROUTE_DB_FILENAME),dir=os.path.dirname(self.dbPath))
+        os.close(fd)
+        try:
+            with closing(sqlite3.connect(tmpPath)) as db:
+                db.execute('CREATE TABLE meta (name TEXT PRIMARY KEY, value TEXT)')
+                db.execute('CREATE TABLE routes (citypair TEXT, line TEXT)')
+                db.execute('CREATE TABLE citypairs (citypair TEXT PRIMARY KEY, hash TEXT)')
+                hashes = {}
+                with open(self.txtPath) as txtFile:
+                    db.executemany('INSERT INTO routes VALUES (?,?)',iterRouteLines(txtFile,hashes))
+                db.executemany('INSERT INTO citypairs VALUES (?,?)',((cp,ha.hexdigest()) for cp,ha in hashes.items()))
+                db.execute('CREATE INDEX routesCitypair ON routes (citypair)')
+                db.execute("INSERT INTO meta VALUES ('key',?)",(key,))
+                db.commit()
+            os.replace(tmpPath,self.dbPath)
+        except BaseException:
+            if os.path.exists(tmpPath):
+                os.remove(tmpPath)
+            raise
+        return len(hashes)
+    
+    ## Returns the routes {citypair:[line,...]} of the text file.
+    def readRoutes(self):
+        routes = {}
+        with open(self.txtPath) as txtFile:
+            for reMatch in map(ROUTE_PATTERN.match,txtFile):
+                if reMatch:
+                    citypair = reMatch.group(1)
+                    if citypair not in routes:
+                        routes[citypair] = []
+                    routes[citypair].append(reMatch.group())
+        return routes
+    
+    ## Updates the table to the text file, only the routes of changed city pairs are replaced. The table
+    # is built from scratch if it does not exist or has an other format. Returns the number of changed city pairs.
+    @Instrumentation.traced('routeDatabase.updateIndex')
+    def updateIndex(self):
+        key = self.getKey()
+        try:
+            with closing(sqlite3.connect(self.dbPath)) as db:
+                row = db.execute("SELECT value FROM meta WHERE name='key'").fetchone()
+                if row is None or row[0].split()[0] != str(ROUTE_DB_VERSION):
+                    raise sqlite3.DatabaseError('Route database of an other format')
+                
+                # First pass: hashes of the city pairs of the file.
+                oldHashes = dict(db.execute('SELECT citypair,hash FROM citypairs'))
+                newHashes = {}
+                with open(self.txtPath) as txtFile:
+                    for _ in iterRouteLines(txtFile,newHashes):
+                        pass
+                newHashes = {cp:ha.hexdigest() for cp,ha in newHashes.items()}
+                changed = {cp for cp in oldHashes.keys() | newHashes.keys() if oldHashes.get(cp) != newHashes.get(cp)}
+                
+                # Second pass: the routes of the changed city pairs. One transaction, readers see the old or the
+                # new routes.
+                db.executemany('DELETE FROM routes WHERE citypair=?',((cp,) for cp in changed))
+                db.executemany('DELETE FROM citypairs WHERE citypair=?',((cp,) for cp in changed))
+                if changed:
+                    with open(self.txtPath) as txtFile:
+                        db.executemany('INSERT INTO routes VALUES (?,?)',
+                                       ((cp,line) for cp,line in iterRouteLines(txtFile) if cp in changed))
+                db.executemany('INSERT INTO citypairs VALUES (?,?)',
+                               ((cp,newHashes[cp]) for cp in changed if cp in newHashes))
+                db.execute("UPDATE meta SET value=? WHERE name='key'",(key,))
+                db.commit()
+        except sqlite3.Error:
+            return self.build()
+        Instrumentation.count('routeDatabase.changedCitypairs',len(changed))
+        return len(changed)
+    
+    ## Updates the table if the text file changed. Returns False if there is no text file.
+    def update(self):
+        if not os.path.isfile(self.txtPath):
+            return False
+        if not self.isValid():
+            self.updateIndex()
+        return True
+    
+    ## Returns the lines of all routes from depicao to desticao in file order.
+    @Instrumentation.traced('routeDatabase.getRoutes')
+    def getRoutes(self,depicao,desticao):
+        if not self.update():
+            return []
+        with closing(sqlite3.connect(self.dbPath)) as db:
+            return [row[0] for row in db.execute('SELECT line FROM routes WHERE citypair=? ORDER BY rowid',
+                                                 (depicao + desticao,))]
+    
+    ## Yields (name,routing) of all routes in file order, name is DEPIDESTnn.
+    def iterRoutes(self):
+        if not os.path.isfile(self.txtPath):
+            return
+        with open(self.txtPath) as txtFile:
+            for line in txtFile:
+                if ROUTE_PATTERN.match(line):
+                    name,routing = line.split(';')[:2]
+                    yield name,routing
+
+
+## Yields (citypair,line) of the routes of the open text file txtFile. If hashes is given, the routes of every
+# city pair are added to its hash there (hashlib.sha1 by city pair).
+def iterRouteLines(txtFile,hashes=None):
+    for reMatch in map(ROUTE_PATTERN.match,txtFile):
+        if reMatch:
+            citypair = reMatch.group(1)
+            line = reMatch.group()
+            if hashes is not None:
+                if citypair not in hashes:
+                    hashes[citypair] = hashlib.sha1()
+                hashes[citypair].update(line.encode('utf-8'))
+            yield citypair,line
+
+
+## Yields (source,depicao,route,desticao) of all stored routes in paths. route is without departure and
+# destination. paths may be .fpl files, Flight Factor A320 company routes (corte.in), route databases
+# (routeDatabase.txt) and directories containing any of them.
+def iterStoredRoutes(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            filePaths = sorted(os.path.join(path,fi) for fi in os.listdir(path)
+                               if fi.lower().endswith('.fpl') or fi in (ROUTE_TXT_FILENAME,CORTE_FILENAME))
+        else:
+            filePaths = [path]
+        
+        for filePath in filePaths:
+            filename = os.path.basename(filePath)
+            if filename == ROUTE_TXT_FILENAME:
+                for name,routing in RouteDatabase(os.path.dirname(filePath)).iterRoutes():
+                    tokens = routing.split()
+                    if tokens and tokens[0] == name[:4]:
+                        tokens = tokens[1:]
+                    if tokens and tokens[-1] == name[4:8]:
+                        tokens = tokens[:-1]
+                    yield '{}:{}'.format(filePath,name),name[:4],' '.join(tokens),name[4:8]
+            elif filename == CORTE_FILENAME:
+                yield from iterCompanyRoutes(filePath)
+            else:
+                try:
+                    plan = FlightPlan.load(filePath)
+                except (OSError,ValueError,UnicodeDecodeError):
+                    continue
+                yield filePath,plan.depicao,plan.route,plan.desticao
+
+
+## Yields the routes of corte.in, see iterStoredRoutes. A line is written by export2FFA320:
+#   RTE DEPIDEST DEPI route DEST CI30 FLxxx
+def iterCompanyRoutes(filePath):
+    with open(filePath) as corteFile:
+        for line in corteFile:
+            tokens = line.split()
+            if len(tokens) < 4 or tokens[0] != 'RTE':
+                continue
+            name = tokens[1]
+            tokens = tokens[2:]
+            while tokens and COMPANY_ROUTE_SUFFIX.fullmatch(tokens[-1]):
+                tokens.pop()
+            if len(tokens) >= 2:
+                yield '{}:{}'.format(filePath,name),tokens[0],' '.join(tokens[1:-1]),tokens[-1]
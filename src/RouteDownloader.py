@@ -0,0 +1,210 @@
+#!/usr/bin/python
+# -*- coding: iso-8859-15 -*-
+#==============================================================================
+# RouteDownloader - Background download of the IVAO route database
+# Copyright (C) 2019  Oliver Clemens
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <https://www.gnu.org/licenses/>.
+#==============================================================================
+# The request is conditional (If-None-Match/If-Modified-Since with ETag and
+# Last-Modified of the last download, kept in routeDatabase.json), so an
+# unchanged database is not transferred again. The response is streamed to a
+# temporary file, checked and swapped in with os.replace. Afterwards the route
+# index is updated for the changed city pairs (see RouteDatabase.updateIndex).
+# Like NavdataLoader the Tk main thread only reads the attributes of a
+# running RouteDownloader and polls them via after().
+#
+# Usage: python RouteDownloader.py [databaseDir] [--url URL]
+#==============================================================================
+
+import os
+import sys
+import json
+import time
+import zlib
+import argparse
+import threading
+from urllib.request import Request, urlopen
+from urllib.error import HTTPError
+from RouteDatabase import RouteDatabase, ROUTE_PATTERN, ROUTE_TXT_FILENAME
+import Instrumentation
+
+IVAO_ROUTES_URL = 'https://www.ivao.de/scripts/php/cms/pfpx'
+STATE_FILENAME = 'routeDatabase.json'
+
+# Automatic check at startup if the last one is older (s).
+UPDATE_INTERVAL = 864000
+TIMEOUT = 30 # s
+CHUNK_SIZE = 65536
+
+# A download is a route database if one of its first lines is a route.
+CHECK_LINES = 100
+
+
+## Returns the state of the last download {url,etag,lastModified,lastCheck} or {}.
+def readState(databaseDir):
+    try:
+        with open(os.path.join(databaseDir,STATE_FILENAME)) as stateFile:
+            return json.load(stateFile)
+    except (OSError,ValueError):
+        return {}
+
+
+def writeState(databaseDir,state):
+    with open(os.path.join(databaseDir,STATE_FILENAME),'w') as stateFile:
+        json.dump(state,stateFile,indent=1)
+
+
+## Returns True if the route database is missing or was not checked for UPDATE_INTERVAL.
+def isUpdateDue(databaseDir,url=IVAO_ROUTES_URL):
+    state = readState(databaseDir)
+    if not os.path.isfile(os.path.join(databaseDir,ROUTE_TXT_FILENAME)) or state.get('url') != url:
+        return True
+    return time.time() - state.get('lastCheck',0) > UPDATE_INTERVAL
+
+
+## Returns True if one of the first lines of the file is a route.
+def isRouteFile(path):
+    with open(path,encoding='latin-1') as routeFile:
+        for _,line in zip(range(CHECK_LINES),routeFile):
+            if ROUTE_PATTERN.match(line):
+                return True
+    return False
+
+
+## Downloads the route database from url to databaseDir if it changed since the last download.
+# progress(stage,bytes,totalBytes) is called for every chunk (stage download, totalBytes is None if unknown)
+# and before the route index is updated (stage index).
+# Returns the number of changed city pairs, None if the database did not change.
+@Instrumentation.traced('routeDatabase.download')
+def downloadRouteDatabase(databaseDir,url=IVAO_ROUTES_URL,progress=None,timeout=TIMEOUT):
+    txtPath = os.path.join(databaseDir,ROUTE_TXT_FILENAME)
+    state = readState(databaseDir)
+    request = Request(url,headers={'Accept-Encoding':'gzip'})
+    if os.path.isfile(txtPath) and state.get('url') == url:
+        if state.get('etag'):
+            request.add_header('If-None-Match',state['etag'])
+        if state.get('lastModified'):
+            request.add_header('If-Modified-Since',state['lastModified'])
+    
+    tmpPath = '{}.download'.format(txtPath)
+    try:
+        with urlopen(request,timeout=timeout) as response:
+            total = response.headers.get('Content-Length')
+            total = int(total) if total and total.isdigit() else None
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if response.headers.get('Content-Encoding') == 'gzip' else None
+            nBytes = 0
+            with open(tmpPath,'wb') as tmpFile:
+                while True:
+                    chunk = response.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    nBytes += len(chunk)
+                    tmpFile.write(decompressor.decompress(chunk) if decompressor else chunk)
+                    if progress is not None:
+                        progress('download',nBytes,total)
+                if decompressor:
+                    tmpFile.write(decompressor.flush())
+            Instrumentation.count('routeDatabase.downloadBytes',nBytes)
+            etag = response.headers.get('ETag')
+            lastModified = response.headers.get('Last-Modified')
+    except HTTPError as e:
+        if e.code != 304:
+            raise
+        state['lastCheck'] = time.time()
+        writeState(databaseDir,state)
+        return None
+    except BaseException:
+        if os.path.exists(tmpPath):
+            os.remove(tmpPath)
+        raise
+    
+    if not isRouteFile(tmpPath):
+        os.remove(tmpPath)
+        raise ValueError('{} is no route database'.format(url))
+    os.replace(tmpPath,txtPath)
+    writeState(databaseDir,{'url':url,'etag':etag,'lastModified':lastModified,'lastCheck':time.time()})
+    if progress is not None:
+        progress('index',nBytes,total)
+    return RouteDatabase(databaseDir).updateIndex()
+
+
+class RouteDownloader(threading.Thread):
+    
+    def __init__(self,databaseDir,url=IVAO_ROUTES_URL,timeout=TIMEOUT):
+        threading.Thread.__init__(self,name='RouteDownloader',daemon=True)
+        self.databaseDir = databaseDir
+        self.url = url
+        self.timeout = timeout
+        
+        # Progress and result, written by the downloader thread only.
+        self.stage = 'connect'
+        self.bytesRead = 0
+        self.bytesTotal = None
+        self.changedCitypairs = None
+        self.error = None
+        
+        self.finished = threading.Event()
+    
+    def run(self):
+        try:
+            self.changedCitypairs = downloadRouteDatabase(self.databaseDir,self.url,self.progress,self.timeout)
+        except Exception as e:
+            # Any failure (network, HTTP, corrupt gzip, SQLite) is reported by getStatus.
+            self.error = e
+        finally:
+            self.stage = 'done'
+            self.finished.set()
+    
+    def progress(self,stage,nBytes,totalBytes):
+        self.stage = stage
+        self.bytesRead = nBytes
+        self.bytesTotal = totalBytes
+    
+    ## Returns a short description of the current progress or the result.
+    def getStatus(self):
+        if self.error is not None:
+            return 'Error updating route database: {}'.format(self.error)
+        if self.stage == 'connect':
+            return 'Connecting to {}'.format(self.url)
+        if self.stage == 'index':
+            return 'Updating route index'
+        if self.stage == 'download':
+            if self.bytesTotal:
+                return 'Downloading route database: {:.1f}/{:.1f} MB'.format(self.bytesRead/1e6,self.bytesTotal/1e6)
+            return 'Downloading route database: {:.1f} MB'.format(self.bytesRead/1e6)
+        if self.changedCitypairs is None:
+            return 'Route database is up to date'
+        return 'Route database updated, {} city pairs changed'.format(self.changedCitypairs)
+
+
+def main(argv=None):
+    srcDir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description='Update the IVAO route database.')
+    parser.add_argument('databaseDir',nargs='?',default=os.path.join(os.path.dirname(srcDir),'database'),
+                        help='directory of routeDatabase.txt')
+    parser.add_argument('--url',default=IVAO_ROUTES_URL,help='URL of the route database')
+    args = parser.parse_args(argv)
+    
+    Instrumentation.enableFromEnvironment()
+    if not os.path.isdir(args.databaseDir):
+        os.makedirs(args.databaseDir)
+    downloader = RouteDownloader(args.databaseDir,args.url)
+    downloader.run()
+    print(downloader.getStatus())
+    return 1 if downloader.error is not None else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
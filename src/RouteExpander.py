@@ -0,0 +1,190 @@
+#!/usr/bin/python
+# -*- coding: iso-8859-15 -*-
+#==============================================================================
+# RouteExpander - Expansion of ICAO route strings to legs
+# Copyright (C) 2019  Oliver Clemens
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <https://www.gnu.org/licenses/>.
+#==============================================================================
+# A route is a sequence "WPT AWY WPT DCT WPT ..." without departure and
+# destination. SID/STAR names and standalone speed/level groups (like the
+# initial N0450F340 of ICAO routes) are removed, see splitRoute. A waypoint may
+# carry a new level (WPT/N0450F340), it applies from that waypoint on. Every
+# waypoint of an airway between entry and exit is a leg. RouteValidator
+# follows the same rules.
+#==============================================================================
+
+import re
+from collections import namedtuple
+import avFormula
+import Instrumentation
+
+# One leg of the expanded route. wpType is the X-Plane type (1 airport,
+# 2 NDB, 3 VOR, 11 fix), via is ADEP, DRCT, the airway name or ADES.
+Leg = namedtuple('Leg',['ident','wpType','via','altitude','lat','lon'])
+
+# Number of memoized expansions.
+CACHE_SIZE = 64
+
+SID_STAR_PATTERN = re.compile(r'[A-Z]{5}\d[A-Z]')
+
+# Speed/level groups like N0450F340.
+SPEED_LEVEL_PATTERN = re.compile(r'[NKM]\d{3,4}([FAMS]\d{3,4}|VFR)')
+
+
+class RouteError(Exception):
+    pass
+
+
+class RouteExpander(object):
+    """
+    Expands route strings with the navdata of a Fpl. The expansions are
+    memoized by route, departure, destination, level and AIRAC cycle.
+    """
+    
+    def __init__(self,fpl):
+        self.fpl = fpl
+        self.cache = {}
+        
+        # Per airway: waypoint name -> [(part id,position),...], built on first use.
+        self.airwayIndexes = {}
+    
+    ## Returns the legs (tuple of Leg) of route from depicao to desticao. Raises RouteError.
+    def expand(self,route,depicao,desticao,level):
+        key = (route,depicao,desticao,level,getattr(self.fpl,'cycleNumber',None))
+        legs = self.cache.get(key)
+        if legs is None:
+            Instrumentation.count('routeExpander.cacheMisses')
+            legs = self.expandUncached(route,depicao,desticao,level)
+            if len(self.cache) >= CACHE_SIZE:
+                self.cache.pop(next(iter(self.cache)))
+            self.cache[key] = legs
+        else:
+            Instrumentation.count('routeExpander.cacheHits')
+        return legs
+    
+    def expandUncached(self,route,depicao,desticao,level):
+        depCoordinates = self.getAirport(depicao)
+        destCoordinates = self.getAirport(desticao)
+        legs = [Leg(depicao,1,'ADEP',0,depCoordinates[0],depCoordinates[1])]
+        
+        # Start altitude.
+        curAltitude = int(level)*100
+        newAltitude = curAltitude
+        
+        curAirway = None
+        lastWaypointName = None
+        for rpId,rp in enumerate(splitRoute(route)):
+            if not isWaypointPosition(rpId):
+                # Airway or DCT.
+                curAirway = None if rp == 'DCT' else rp
+                continue
+            
+            # Waypoint, split altitude from it.
+            curWaypointName,_,levelChange = rp.partition('/')
+            altMatch = re.search(r'F(\d+)',levelChange)
+            if altMatch is not None:
+                newAltitude = int(altMatch.group(1))*100
+            
+            if curAirway is None:
+                # After DCT, the waypoint nearest to the last one.
+                curAltitude = newAltitude
+                rows = self.fpl.waypoints.find(curWaypointName)
+                if rows is None:
+                    raise RouteError('Unknown waypoint {}!'.format(curWaypointName))
+                nearId,_ = avFormula.nearestPoint(legs[-1].lat,legs[-1].lon,
+                                                  self.fpl.waypoints.lats[rows[0]:rows[1]],
+                                                  self.fpl.waypoints.lons[rows[0]:rows[1]])
+                lat,lon,wpType = self.fpl.waypoints.getRow(rows[0] + nearId)
+                legs.append(Leg(curWaypointName,wpType,'DRCT',curAltitude,lat,lon))
+            else:
+                # After airway, all waypoints from entry to exit.
+                part,entryPos,exitPos = self.findAirwaySection(curAirway,lastWaypointName,curWaypointName)
+                step = 1 if exitPos > entryPos else -1
+                for pos in range(entryPos + step,exitPos + step,step):
+                    if pos == exitPos:
+                        curAltitude = newAltitude
+                    name,lat,lon,wpType = part[pos]
+                    legs.append(Leg(name,wpType,curAirway,curAltitude,lat,lon))
+            
+            lastWaypointName = curWaypointName
+        
+        if curAirway is not None and not isWaypointPosition(rpId):
+            raise RouteError('No exit waypoint of airway {}!'.format(curAirway))
+        legs.append(Leg(desticao,1,'ADES',0,destCoordinates[0],destCoordinates[1]))
+        return tuple(legs)
+    
+    def getAirport(self,icao):
+        try:
+            return self.fpl.airports[icao]
+        except KeyError:
+            raise RouteError('Unknown airport {}!'.format(icao))
+    
+    ## Returns the index of the waypoint names of airway, see airwayIndexes.
+    def getAirwayIndex(self,airway):
+        index = self.airwayIndexes.get(airway)
+        if index is None:
+            try:
+                aw = self.fpl.airways[airway]
+            except KeyError:
+                raise RouteError('Unknown airway {}!'.format(airway))
+            index = {}
+            for paId,pa in enumerate(aw.parts):
+                for pos,fix in enumerate(pa):
+                    if fix[0] not in index:
+                        index[fix[0]] = []
+                    index[fix[0]].append((paId,pos))
+            self.airwayIndexes[airway] = index
+        return index
+    
+    ## Returns the part of airway containing both waypoints and their positions in it.
+    def findAirwaySection(self,airway,entryName,exitName):
+        index = self.getAirwayIndex(airway)
+        for entryPart,entryPos in index.get(entryName,()):
+            for exitPart,exitPos in index.get(exitName,()):
+                if entryPart == exitPart:
+                    return self.fpl.airways[airway].parts[entryPart],entryPos,exitPos
+        raise RouteError('One or both waypoints are no part of airway {}!'.format(airway))
+
+
+## Returns True if token (upper case) is no route element: a SID/STAR name or a standalone speed/level group.
+def isSkippedToken(token):
+    return SID_STAR_PATTERN.fullmatch(token) is not None or SPEED_LEVEL_PATTERN.fullmatch(token) is not None
+
+
+## Returns the route elements of route (upper case), see isWaypointPosition.
+def splitRoute(route):
+    return [to for to in route.upper().split() if not isSkippedToken(to)]
+
+
+## Returns True if the route element at position is a waypoint (with optional /speed level), else it is an
+# airway or DCT.
+def isWaypointPosition(position):
+    return not position % 2
+
+
+## Returns the X-Plane 11 fms file content of legs.
+def formatFms(legs,cycleNumber):
+    lines = ['I',
+             '1100 Version',
+             'CYCLE {}'.format(cycleNumber),
+             'ADEP {}'.format(legs[0].ident),
+             'ADES {}'.format(legs[-1].ident),
+             'NUMENR {}'.format(len(legs))]
+    for leg in legs:
+        if leg.via in ('ADEP','ADES'):
+            lines.append('{} {} {} 0.000000 {} {}'.format(leg.wpType,leg.ident,leg.via,leg.lat,leg.lon))
+        else:
+            lines.append('{} {} {} {} {} {}'.format(leg.wpType,leg.ident,leg.via,leg.altitude,leg.lat,leg.lon))
+    return '\n'.join(lines)
@@ -0,0 +1,739 @@
+#!/usr/bin/python
+# -*- coding: iso-8859-15 -*-
+#==============================================================================
+# RouteFinder - Routes along the airways between two airports
+# Copyright (C) 2019  Oliver Clemens
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <https://www.gnu.org/licenses/>.
+#==============================================================================
+# The airways are converted once into a graph (AirwayGraph): the nodes are the
+# airway fixes (name and position), the edges the airway segments weighted by
+# their great circle distance, stored as flat arrays (edges of node n are
+# edgeStart[n] to edgeStart[n+1]). Departure and destination are connected
+# direct to the nearest airway fixes. The shortest route is found by A* with
+# the great circle distance to the destination as heuristic. Alternatives are
+# searched with the edges of the routes found so far made longer. The search
+# stops when the time budget is used up and returns the routes found so far.
+# No SIDs/STARs and no airway directions or level restrictions are considered.
+#
+# Optionally the graph is prepared with landmarks (ALT): the distances of all
+# fixes from a few fixes far apart are computed once. By the triangle
+# inequality they give a lower bound of the distance to the destination that
+# is much closer than the great circle distance, so A* expands far fewer
+# fixes. Per query the landmarks with the best bound at the departure are
+# used. Further the graph can be contracted (contraction hierarchy): the
+# fixes are ordered by importance and removed one by one, shortcuts keep the
+# distances between the remaining ones. The shortest route is then found by
+# two small searches only going up the order (from departure and destination),
+# alternatives still with A*. The graph (with landmarks and contraction if
+# prepared) is saved next to the navdata cache (routeGraph.cache) and used
+# until the navdata cache changes.
+# FPLGUI prepares the graph and searches in a RouteSearch thread.
+#
+# Usage: python RouteFinder.py navdataDir cacheDir [DEPI DEST ...] [--landmarks n] [--contract]
+#==============================================================================
+
+import os
+import sys
+import time
+import pickle
+import tempfile
+import argparse
+import threading
+from array import array
+from collections import namedtuple
+from heapq import heappush, heappop, heapify
+from math import sin, cos, acos, radians, pi
+import avFormula
+import Instrumentation
+from RouteExpander import RouteError
+from SpatialIndex import SpatialIndex
+
+NM_PER_RADIAN = (180*60)/pi
+
+# Airway fixes within this distance of an airport are connected to it, the
+# radius is doubled up to MAX_CONNECT_NM if there are none.
+CONNECT_RADIUS_NM = 50
+MAX_CONNECT_NM = 400
+# Airway fixes connected to an airport at most, nearest first.
+MAX_CONNECTIONS = 8
+
+MAX_ROUTES = 3
+# Time for all routes of a query in s, None for no limit.
+TIME_BUDGET = 0.1
+# The edges of found routes are this much longer when searching alternatives.
+ALTERNATIVE_PENALTY = 1.25
+# Node expansions between checks of the time budget.
+CHECK_INTERVAL = 256
+
+# Number of memoized queries.
+CACHE_SIZE = 64
+
+ROUTE_GRAPH_VERSION = 2
+ROUTE_GRAPH_FILENAME = 'routeGraph.cache'
+LANDMARKS = 16
+# Landmarks used per query.
+ACTIVE_LANDMARKS = 4
+# Nodes settled at most by a witness search of the contraction.
+WITNESS_LIMIT = 50
+# Same for estimating the priority of a node.
+ESTIMATE_LIMIT = 5
+
+INF = float('inf')
+
+# route: waypoints and airways without departure and destination (see RouteExpander).
+Route = namedtuple('Route',['route','distanceNm'])
+
+
+class AirwayGraph(object):
+    """
+    Graph of the airway network, see module header. Parallel segments of
+    several airways are one edge (of the airway first by name).
+    """
+    
+    def __init__(self,airways):
+        nodeIds = {}
+        self.names = []
+        self.lats = array('d')
+        self.lons = array('d')
+        self.airwayNames = sorted(airways)
+        adjacency = []
+        for awId,name in enumerate(self.airwayNames):
+            for paId,pa in enumerate(airways[name].parts):
+                lastNode = None
+                for fix in pa:
+                    key = fix[:3]
+                    node = nodeIds.get(key)
+                    if node is None:
+                        node = len(self.names)
+                        nodeIds[key] = node
+                        self.names.append(fix[0])
+                        self.lats.append(fix[1])
+                        self.lons.append(fix[2])
+                        adjacency.append({})
+                    if lastNode is not None and lastNode != node and node not in adjacency[lastNode]:
+                        weight = avFormula.gcDistanceNm(self.lats[lastNode],self.lats[node],self.lons[lastNode],self.lons[node])
+                        adjacency[lastNode][node] = (weight,awId,paId)
+                        adjacency[node][lastNode] = (weight,awId,paId)
+                    lastNode = node
+        
+        self.edgeStart = array('l',[0])
+        self.edgeTarget = array('l')
+        self.edgeWeight = array('d')
+        self.edgeAirway = array('l')
+        self.edgePart = array('l')
+        for adj in adjacency:
+            for target,(weight,awId,paId) in adj.items():
+                self.edgeTarget.append(target)
+                self.edgeWeight.append(weight)
+                self.edgeAirway.append(awId)
+                self.edgePart.append(paId)
+            self.edgeStart.append(len(self.edgeTarget))
+        
+        # Nodes and their distances (array per landmark) of the landmarks, see addLandmarks.
+        self.landmarkNodes = []
+        self.landmarks = []
+        # Contraction hierarchy, see contract.
+        self.ranks = None
+        self.prepareSearch()
+    
+    ## The lists of prepareSearch are not saved, they are made again on load.
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in ('neighbours','weights','xs','ys','zs','spatialIndex'):
+            del state[name]
+        return state
+    
+    def __setstate__(self,state):
+        self.__dict__.update(state)
+        self.prepareSearch()
+    
+    ## Makes the lists used by search (faster in the loop than arrays): edges per node ((target,edge),...),
+    # edge weights and unit vectors of the nodes for the heuristic.
+    def prepareSearch(self):
+        edgeStart = self.edgeStart
+        self.neighbours = [tuple(zip(self.edgeTarget[edgeStart[no]:edgeStart[no+1]],range(edgeStart[no],edgeStart[no+1])))
+                           for no in range(len(self.names))]
+        self.weights = self.edgeWeight.tolist()
+        self.xs = [cos(radians(la))*cos(radians(lo)) for la,lo in zip(self.lats,self.lons)]
+        self.ys = [cos(radians(la))*sin(radians(lo)) for la,lo in zip(self.lats,self.lons)]
+        self.zs = [sin(radians(la)) for la in self.lats]
+        self.spatialIndex = SpatialIndex(self.lats,self.lons)
+    
+    def __len__(self):
+        return len(self.names)
+    
+    ## Returns {node:distanceNm} of the airway fixes connected to the airport at lat/lon.
+    def getConnections(self,lat,lon):
+        radiusNm = CONNECT_RADIUS_NM
+        while True:
+            nodes = self.spatialIndex.radius(lat,lon,radiusNm)
+            if nodes or radiusNm >= MAX_CONNECT_NM:
+                return dict(nodes[:MAX_CONNECTIONS])
+            radiusNm = min(2*radiusNm,MAX_CONNECT_NM)
+    
+    ## Returns the index of the edge from node to target.
+    def getEdge(self,node,target):
+        for ed in range(self.edgeStart[node],self.edgeStart[node+1]):
+            if self.edgeTarget[ed] == target:
+                return ed
+        raise KeyError((node,target))
+    
+    ## Returns the distances (array, inf if not connected) of all nodes from node.
+    def getDistances(self,source):
+        neighbours = self.neighbours
+        weights = self.weights
+        distances = [INF]*len(self.names)
+        distances[source] = 0.0
+        heap = [(0.0,source)]
+        while heap:
+            cost,node = heappop(heap)
+            if cost > distances[node]:
+                continue
+            for target,ed in neighbours[node]:
+                targetCost = cost + weights[ed]
+                if targetCost < distances[target]:
+                    distances[target] = targetCost
+                    heappush(heap,(targetCost,target))
+        return array('d',distances)
+    
+    ## Adds count landmarks. Each one is the node of the largest network farthest from the nodes chosen before.
+    @Instrumentation.traced('routeFinder.addLandmarks')
+    def addLandmarks(self,count=LANDMARKS):
+        if not self.names:
+            return
+        # Start at the node of most edges, it is in the largest network.
+        start = max(range(len(self.names)),key=lambda no: self.edgeStart[no+1] - self.edgeStart[no])
+        minDistances = self.getDistances(start)
+        for _ in range(count):
+            node = max((di,no) for no,di in enumerate(minDistances) if di < INF)[1]
+            if node in self.landmarkNodes:
+                break
+            distances = self.getDistances(node)
+            self.landmarkNodes.append(node)
+            self.landmarks.append(distances)
+            minDistances = [min(di1,di2) for di1,di2 in zip(minDistances,distances)]
+    
+    ## Returns {node:distance} of the nodes reached from source until all targets are settled without passing
+    # excluded, at most limit nodes within maxCost are settled (witness search of contract).
+    @staticmethod
+    def searchWitnesses(adjacency,source,excluded,targets,maxCost,limit):
+        distances = {source:0.0}
+        heap = [(0.0,source)]
+        targets = set(targets)
+        nSettled = 0
+        while heap:
+            cost,node = heappop(heap)
+            if cost > distances[node]:
+                continue
+            targets.discard(node)
+            if not targets or cost > maxCost or nSettled >= limit:
+                break
+            nSettled += 1
+            for target,(weight,_) in adjacency[node].items():
+                if target == excluded:
+                    continue
+                targetCost = cost + weight
+                if targetCost < distances.get(target,INF):
+                    distances[target] = targetCost
+                    heappush(heap,(targetCost,target))
+        return distances
+    
+    ## Returns the priority of contracting node (shortcuts added - edges removed + contracted neighbours) and
+    # the shortcuts [(node1,node2,weight),...] it needs, witness searches settle at most limit nodes.
+    def getContraction(self,adjacency,node,nContracted,limit=WITNESS_LIMIT):
+        edges = adjacency[node]
+        others = list(edges)
+        shortcuts = []
+        for k,node1 in enumerate(others[:-1]):
+            weight1 = edges[node1][0]
+            maxCost = weight1 + max(edges[no][0] for no in others[k+1:])
+            distances = self.searchWitnesses(adjacency,node1,node,others[k+1:],maxCost,limit)
+            for node2 in others[k+1:]:
+                weight = weight1 + edges[node2][0]
+                if distances.get(node2,INF) > weight:
+                    shortcuts.append((node1,node2,weight))
+        return len(shortcuts) - len(edges) + nContracted[node],shortcuts
+    
+    ## Builds the contraction hierarchy: the nodes are removed one by one, least important first, and shortcuts
+    # keep the distances of the remaining ones. The upward edges (to nodes removed later) of every node are
+    # stored like the edges (upStart, upTarget, upWeight), upMiddle is the removed node of a shortcut or -1.
+    @Instrumentation.traced('routeFinder.contract')
+    def contract(self):
+        nNodes = len(self.names)
+        adjacency = [{target:(self.weights[ed],-1) for target,ed in self.neighbours[no]} for no in range(nNodes)]
+        nContracted = [0]*nNodes
+        heap = [(self.getContraction(adjacency,no,nContracted,ESTIMATE_LIMIT)[0],no) for no in range(nNodes)]
+        heapify(heap)
+        
+        upward = [None]*nNodes
+        ranks = array('l',[0]*nNodes)
+        rank = 0
+        while heap:
+            _,node = heappop(heap)
+            # Priorities change while contracting, they are updated lazily (and estimated with short witness
+            # searches, the shortcuts only with the full ones).
+            priority,_ = self.getContraction(adjacency,node,nContracted,ESTIMATE_LIMIT)
+            if heap and priority > heap[0][0]:
+                heappush(heap,(priority,node))
+                continue
+            _,shortcuts = self.getContraction(adjacency,node,nContracted)
+            
+            ranks[node] = rank
+            rank += 1
+            upward[node] = adjacency[node]
+            adjacency[node] = {}
+            for target in upward[node]:
+                del adjacency[target][node]
+                nContracted[target] += 1
+            for node1,node2,weight in shortcuts:
+                if weight < adjacency[node1].get(node2,(INF,))[0]:
+                    adjacency[node1][node2] = (weight,node)
+                    adjacency[node2][node1] = (weight,node)
+        
+        self.upStart = array('l',[0])
+        self.upTarget = array('l')
+        self.upWeight = array('d')
+        self.upMiddle = array('l')
+        for edges in upward:
+            for target,(weight,middle) in edges.items():
+                self.upTarget.append(target)
+                self.upWeight.append(weight)
+                self.upMiddle.append(middle)
+            self.upStart.append(len(self.upTarget))
+        self.ranks = ranks
+        Instrumentation.count('routeFinder.shortcuts',sum(1 for mi in self.upMiddle if mi >= 0))
+    
+    ## Returns {node:distance} and {node:(parent,middle)} of the upward search from starts {node:distance}.
+    # Not all distances are shortest ones, but those on the shortest path up to the highest node are. With the
+    # distances of the opposite search as meetings, nodes farther than the best meeting so far are not searched.
+    def searchUpward(self,starts,meetings=None):
+        upStart,upTarget,upWeight,upMiddle = self.upStart,self.upTarget,self.upWeight,self.upMiddle
+        distances = dict(starts)
+        parents = dict.fromkeys(starts)
+        heap = [(di,no) for no,di in starts.items()]
+        heapify(heap)
+        best = INF
+        while heap:
+            cost,node = heappop(heap)
+            if cost > distances[node]:
+                continue
+            if meetings is not None:
+                if cost >= best:
+                    break
+                if node in meetings:
+                    best = min(best,cost + meetings[node])
+            # Not searched further if a higher node reached so far is closer (stall on demand).
+            edgeRange = range(upStart[node],upStart[node+1])
+            if any(distances.get(upTarget[k],INF) + upWeight[k] < cost for k in edgeRange):
+                continue
+            for k in edgeRange:
+                target = upTarget[k]
+                targetCost = cost + upWeight[k]
+                if targetCost < distances.get(target,INF):
+                    distances[target] = targetCost
+                    parents[target] = (node,upMiddle[k])
+                    heappush(heap,(targetCost,target))
+        return distances,parents
+    
+    ## Returns the middle of the upward edge of node to target.
+    def getUpMiddle(self,node,target):
+        for k in range(self.upStart[node],self.upStart[node+1]):
+            if self.upTarget[k] == target:
+                return self.upMiddle[k]
+        raise KeyError((node,target))
+    
+    ## Returns the nodes after node1 up to node2 of an edge of the hierarchy (shortcuts resolved).
+    def unpackEdge(self,node1,node2,middle):
+        nodes = []
+        stack = [(node1,node2,middle)]
+        while stack:
+            fromNode,toNode,middle = stack.pop()
+            if middle < 0:
+                nodes.append(toNode)
+            else:
+                stack.append((middle,toNode,self.getUpMiddle(middle,toNode)))
+                stack.append((fromNode,middle,self.getUpMiddle(middle,fromNode)))
+        return nodes
+    
+    ## Like search with the contraction hierarchy (see contract), much faster but only with the edge weights.
+    def searchContracted(self,starts,goals):
+        backward,backwardParents = self.searchUpward(goals)
+        forward,forwardParents = self.searchUpward(starts,backward)
+        meeting = min(forward.keys() & backward.keys(),key=lambda no: forward[no] + backward[no],default=None)
+        if meeting is None:
+            return None
+        
+        # Upward edges from the start to the meeting node and down to the goal.
+        upEdges = []
+        node = meeting
+        while forwardParents[node] is not None:
+            parent,middle = forwardParents[node]
+            upEdges.append((parent,node,middle))
+            node = parent
+        nodes = [node]
+        for parent,node,middle in reversed(upEdges):
+            nodes.extend(self.unpackEdge(parent,node,middle))
+        node = meeting
+        while backwardParents[node] is not None:
+            parent,middle = backwardParents[node]
+            nodes.extend(self.unpackEdge(node,parent,middle))
+            node = parent
+        edges = [self.getEdge(no1,no2) for no1,no2 in zip(nodes[:-1],nodes[1:])]
+        return forward[meeting] + backward[meeting],nodes,edges
+    
+    ## Returns [(distances,low,high),...] of the ACTIVE_LANDMARKS landmarks giving the best lower bound at the
+    # starts. The distance from node to the goals is at least low - distances[node] and distances[node] - high.
+    def getActiveLandmarks(self,starts,goals):
+        candidates = []
+        for distances in self.landmarks:
+            # Only landmarks connected to all goals.
+            if any(distances[no] == INF for no in goals):
+                continue
+            low = min(distances[no] + di for no,di in goals.items())
+            high = max(distances[no] - di for no,di in goals.items())
+            bound = min(max(distances[no] - high,low - distances[no]) for no in starts)
+            candidates.append((bound,distances,low,high))
+        candidates.sort(key=lambda ca: ca[0],reverse=True)
+        return [ca[1:] for ca in candidates[:ACTIVE_LANDMARKS]]
+    
+    ## Returns the shortest path from starts {node:distance} to goals {node:distance} as (distance,nodes,edges),
+    # None if there is none. weights are the edge weights (default edgeWeight, weights may only be longer for the
+    # landmarks). Raises TimeoutError after deadline.
+    def search(self,starts,goals,destLat,destLon,weights=None,deadline=None,useLandmarks=True):
+        neighbours = self.neighbours
+        weights = weights or self.weights
+        xs,ys,zs = self.xs,self.ys,self.zs
+        destX = cos(radians(destLat))*cos(radians(destLon))
+        destY = cos(radians(destLat))*sin(radians(destLon))
+        destZ = sin(radians(destLat))
+        active = self.getActiveLandmarks(starts,goals) if useLandmarks else []
+        inf = INF
+        
+        # Node -1 is the destination.
+        best = {}
+        parents = {}
+        heap = []
+        for node,distance in starts.items():
+            if distance < best.get(node,inf):
+                best[node] = distance
+                parents[node] = (None,None)
+                heappush(heap,(distance + self.getHeuristic(node,destX,destY,destZ,active),distance,node))
+        
+        bestGet = best.get
+        nExpanded = 0
+        while heap:
+            _,cost,node = heappop(heap)
+            if node == -1:
+                break
+            if cost > best[node]:
+                continue
+            
+            nExpanded += 1
+            if deadline is not None and not nExpanded % CHECK_INTERVAL and time.perf_counter() > deadline:
+                Instrumentation.count('routeFinder.expanded',nExpanded)
+                raise TimeoutError('Time budget used up')
+            
+            if node in goals:
+                goalCost = cost + goals[node]
+                if goalCost < bestGet(-1,inf):
+                    best[-1] = goalCost
+                    parents[-1] = (node,None)
+                    heappush(heap,(goalCost,goalCost,-1))
+            
+            for target,ed in neighbours[node]:
+                targetCost = cost + weights[ed]
+                if targetCost < bestGet(target,inf):
+                    best[target] = targetCost
+                    parents[target] = (node,ed)
+                    cosine = xs[target]*destX + ys[target]*destY + zs[target]*destZ
+                    bound = NM_PER_RADIAN*acos(-1.0 if cosine < -1.0 else 1.0 if cosine > 1.0 else cosine)
+                    for distances,low,high in active:
+                        distance = distances[target]
+                        if distance - high > bound:
+                            bound = distance - high
+                        if low - distance > bound:
+                            bound = low - distance
+                    heappush(heap,(targetCost + bound,targetCost,target))
+        Instrumentation.count('routeFinder.expanded',nExpanded)
+        
+        if -1 not in best:
+            return None
+        nodes = []
+        edges = []
+        node = parents[-1][0]
+        while node is not None:
+            nodes.append(node)
+            node,ed = parents[node]
+            if ed is not None:
+                edges.append(ed)
+        nodes.reverse()
+        edges.reverse()
+        return best[-1],nodes,edges
+    
+    ## Returns the lower bound of the distance of node to the destination: the great circle distance (nm) to the
+    # unit vector destX/destY/destZ or the bound of the active landmarks (see getActiveLandmarks).
+    def getHeuristic(self,node,destX,destY,destZ,active=()):
+        cosine = self.xs[node]*destX + self.ys[node]*destY + self.zs[node]*destZ
+        bound = NM_PER_RADIAN*acos(max(-1.0,min(1.0,cosine)))
+        for distances,low,high in active:
+            bound = max(bound,distances[node] - high,low - distances[node])
+        return bound
+    
+    ## Writes the graph to path, key identifies the navdata.
+    def save(self,path,key):
+        # The name of the temporary file is unique, the RouteSearch of the GUI and a command line run may save at
+        # the same time.
+        fd,tmpPath = tempfile.mkstemp(suffix='.tmp',prefix='{}.'.format(os.path.basename(path)),dir=os.path.dirname(path))
+        try:
+            with open(fd,'wb') as graphFile:
+                pickle.dump({'version':ROUTE_GRAPH_VERSION,'key':key},graphFile,pickle.HIGHEST_PROTOCOL)
+                pickle.dump(self,graphFile,pickle.HIGHEST_PROTOCOL)
+            os.replace(tmpPath,path)
+        except BaseException:
+            if os.path.exists(tmpPath):
+                os.remove(tmpPath)
+            raise
+    
+    ## Returns the graph saved in path for the navdata key or None.
+    @classmethod
+    def load(cls,path,key):
+        try:
+            with open(path,'rb') as graphFile:
+                if pickle.load(graphFile) != {'version':ROUTE_GRAPH_VERSION,'key':key}:
+                    return None
+                return pickle.load(graphFile)
+        except (OSError,pickle.UnpicklingError,EOFError,AttributeError):
+            return None
+    
+    ## Returns the route string of a path: entry, airway, exit, airway, ...
+    def getRouteString(self,nodes,edges):
+        tokens = [self.names[nodes[0]]]
+        for k,ed in enumerate(edges):
+            # Edges of one airway part are one element, at the change to another part (a branch of the airway)
+            # the junction fix is written (RouteExpander expands within one part only).
+            if (k + 1 < len(edges) and self.edgeAirway[edges[k+1]] == self.edgeAirway[ed]
+                    and self.edgePart[edges[k+1]] == self.edgePart[ed]):
+                continue
+            tokens.append(self.airwayNames[self.edgeAirway[ed]])
+            tokens.append(self.names[nodes[k+1]])
+        return ' '.join(tokens)
+
+
+class RouteFinder(object):
+    """
+    Finds routes with the navdata of a Fpl. The graph is loaded from the
+    navdata cache directory or built on first use, the results are memoized
+    by departure, destination and AIRAC cycle.
+    """
+    
+    def __init__(self,fpl):
+        self.fpl = fpl
+        self.graph = None
+        self.cache = {}
+    
+    ## Returns the path of the saved graph and the key of the navdata or None,None without navdata cache.
+    def getGraphFile(self):
+        navdataCache = getattr(self.fpl,'navdataCache',None)
+        if navdataCache is None or navdataCache.path is None:
+            return None,None
+        key = navdataCache.readHeader()
+        if key is None:
+            return None,None
+        return os.path.join(navdataCache.cacheDir,ROUTE_GRAPH_FILENAME),key
+    
+    def getGraph(self):
+        if self.graph is None:
+            path,key = self.getGraphFile()
+            if path is not None:
+                with Instrumentation.span('routeFinder.loadGraph'):
+                    self.graph = AirwayGraph.load(path,key)
+            if self.graph is None:
+                with Instrumentation.span('routeFinder.buildGraph'):
+                    self.graph = AirwayGraph(self.fpl.airways)
+                if path is not None:
+                    self.graph.save(path,key)
+        return self.graph
+    
+    ## Adds count landmarks to the graph (if it has less) and saves it. Takes a while, queries get much faster.
+    def prepareLandmarks(self,count=LANDMARKS):
+        graph = self.getGraph()
+        if len(graph.landmarks) >= count:
+            return
+        graph.landmarkNodes = []
+        graph.landmarks = []
+        graph.addLandmarks(count)
+        self.saveGraph()
+    
+    ## Builds the contraction hierarchy of the graph (if missing) and saves it. The first route is found with it.
+    def prepareContraction(self):
+        graph = self.getGraph()
+        if graph.ranks is None:
+            graph.contract()
+            self.saveGraph()
+    
+    def saveGraph(self):
+        path,key = self.getGraphFile()
+        if path is not None:
+            self.graph.save(path,key)
+    
+    def getAirport(self,icao):
+        try:
+            return self.fpl.airports[icao]
+        except KeyError:
+            raise RouteError('Unknown airport {}!'.format(icao))
+    
+    ## Returns up to maxRoutes routes (list of Route) from depicao to desticao, shortest first. Only the routes
+    # found within timeBudget (s, None: no limit) are returned, the graph is built before. Raises RouteError.
+    @Instrumentation.traced('routeFinder.findRoutes')
+    def findRoutes(self,depicao,desticao,maxRoutes=MAX_ROUTES,timeBudget=TIME_BUDGET):
+        key = (depicao,desticao,maxRoutes,getattr(self.fpl,'cycleNumber',None))
+        routes = self.cache.get(key)
+        if routes is not None:
+            return routes
+        
+        depLat,depLon = self.getAirport(depicao)
+        destLat,destLon = self.getAirport(desticao)
+        graph = self.getGraph()
+        deadline = None if timeBudget is None else time.perf_counter() + timeBudget
+        starts = graph.getConnections(depLat,depLon)
+        goals = graph.getConnections(destLat,destLon)
+        
+        routes = []
+        weights = None
+        complete = True
+        for _ in range(maxRoutes):
+            try:
+                if weights is None and graph.ranks is not None:
+                    path = graph.searchContracted(starts,goals)
+                else:
+                    path = graph.search(starts,goals,destLat,destLon,weights,deadline)
+            except TimeoutError:
+                complete = False
+                break
+            if path is None:
+                break
+            _,nodes,edges = path
+            route = Route(graph.getRouteString(nodes,edges),self.getDistance(graph,depLat,depLon,destLat,destLon,nodes,edges))
+            if route not in routes:
+                routes.append(route)
+            
+            # Make the route longer for the next search.
+            if weights is None:
+                weights = list(graph.weights)
+            for node,ed in zip(nodes,edges):
+                weights[ed] *= ALTERNATIVE_PENALTY
+                weights[graph.getEdge(graph.edgeTarget[ed],node)] *= ALTERNATIVE_PENALTY
+        
+        routes.sort(key=lambda ro: ro.distanceNm)
+        if complete:
+            if len(self.cache) >= CACHE_SIZE:
+                self.cache.pop(next(iter(self.cache)))
+            self.cache[key] = routes
+        return routes
+    
+    ## Returns the length of a path including the direct legs from and to the airports.
+    @staticmethod
+    def getDistance(graph,depLat,depLon,destLat,destLon,nodes,edges):
+        distance = sum(graph.edgeWeight[ed] for ed in edges)
+        distance += avFormula.gcDistanceNm(depLat,graph.lats[nodes[0]],depLon,graph.lons[nodes[0]])
+        distance += avFormula.gcDistanceNm(graph.lats[nodes[-1]],destLat,graph.lons[nodes[-1]],destLon)
+        return round(distance,1)
+
+
+class RouteSearch(threading.Thread):
+    """
+    Loads or builds the graph of a RouteFinder and, with departure and
+    destination, finds the routes between them in background. Like
+    NavdataLoader the Tk main thread only reads the attributes and polls
+    finished via after(). Only one RouteSearch may use a RouteFinder at a time.
+    """
+    
+    def __init__(self,routeFinder,depicao=None,desticao=None,maxRoutes=MAX_ROUTES,timeBudget=TIME_BUDGET):
+        threading.Thread.__init__(self,name='RouteSearch',daemon=True)
+        self.routeFinder = routeFinder
+        self.depicao = depicao
+        self.desticao = desticao
+        self.maxRoutes = maxRoutes
+        self.timeBudget = timeBudget
+        
+        # Result, written by the search thread only.
+        self.stage = 'graph'
+        self.routes = None
+        self.error = None
+        self.finished = threading.Event()
+    
+    def run(self):
+        try:
+            self.routeFinder.getGraph()
+            if self.depicao is not None:
+                self.stage = 'search'
+                self.routes = self.routeFinder.findRoutes(self.depicao,self.desticao,self.maxRoutes,self.timeBudget)
+        except RouteError as e:
+            self.error = e
+        except Exception as e:
+            self.error = e
+            raise
+        finally:
+            self.stage = 'done'
+            self.finished.set()
+    
+    ## Returns a short description of the current progress.
+    def getStatus(self):
+        if self.error is not None:
+            return 'Error finding routes: {}'.format(self.error)
+        if self.stage == 'graph':
+            return 'Preparing airway graph'
+        if self.stage == 'search':
+            return 'Finding routes {} - {}'.format(self.depicao,self.desticao)
+        return 'Routes found'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Find routes along the airways.')
+    parser.add_argument('navdataDir',help='navdata directory')
+    parser.add_argument('cacheDir',help='directory of the navdata cache')
+    parser.add_argument('cityPairs',nargs='*',help='departure and destination: DEPI DEST [DEPI DEST ...]')
+    parser.add_argument('--landmarks',type=int,default=0,help='prepare the graph with this many landmarks')
+    parser.add_argument('--contract',action='store_true',help='prepare the contraction hierarchy of the graph')
+    args = parser.parse_args(argv)
+    if len(args.cityPairs) % 2:
+        parser.error('destination missing')
+    
+    from Fpl import Fpl
+    fpl = Fpl(args.cacheDir)
+    fpl.loadNavdata(args.navdataDir,args.cacheDir)
+    finder = RouteFinder(fpl)
+    t0 = time.perf_counter()
+    finder.getGraph()
+    print('Graph of {} fixes ready in {:.2f} s'.format(len(finder.graph),time.perf_counter() - t0))
+    if args.landmarks:
+        t0 = time.perf_counter()
+        finder.prepareLandmarks(args.landmarks)
+        print('{} landmarks ready in {:.2f} s'.format(len(finder.graph.landmarks),time.perf_counter() - t0))
+    if args.contract:
+        t0 = time.perf_counter()
+        finder.prepareContraction()
+        print('Contraction hierarchy ready in {:.2f} s'.format(time.perf_counter() - t0))
+    for depicao,desticao in zip(args.cityPairs[::2],args.cityPairs[1::2]):
+        t0 = time.perf_counter()
+        routes = finder.findRoutes(depicao.upper(),desticao.upper())
+        print('{} {}: {} routes in {:.0f} ms'.format(depicao,desticao,len(routes),(time.perf_counter() - t0)*1000))
+        for ro in routes:
+            print('  {:8.1f} nm  {}'.format(ro.distanceNm,ro.route))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,102 @@
+#!/usr/bin/python
+# -*- coding: iso-8859-15 -*-
+#==============================================================================
+# RouteTimes - Distances and flight times of expanded routes
+# Copyright (C) 2019  Oliver Clemens
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <https://www.gnu.org/licenses/>.
+#==============================================================================
+# Leg k goes from legs[k] to legs[k+1] of the expanded route (see
+# RouteExpander). All legs are computed at once with the array functions of
+# avFormula: great circle distances, the true airspeed at the altitude of the
+# leg (a mach number is converted with the ISA temperature), the leg times and
+# their sums. With a WindField the wind is sampled at the middle of each leg,
+# heading and ground speed follow from the wind triangle with the course
+# there. Climb and descent are not considered, the EET is the cruise time of
+# the whole route.
+#==============================================================================
+
+from collections import namedtuple
+from itertools import accumulate
+import avFormula
+import Instrumentation
+from RouteExpander import RouteError
+
+# Per leg: distances (nm), true courses and headings (deg), ground speeds (kt) and times (h), cumulative from the
+# departure. distance (nm) and eet (h) of the route.
+RouteTimes = namedtuple('RouteTimes',['distances','cumulativeDistances','courses','headings','groundSpeeds','times',
+                                      'cumulativeTimes','distance','eet'])
+
+
+## Returns the altitudes (ft) of the legs: the one of the waypoint the leg goes to, the last leg (to the
+# destination) stays at the altitude before. Without waypoints level is used.
+def getLegAltitudes(legs,level):
+    altitudes = [leg.altitude for leg in legs[1:-1]]
+    if not altitudes:
+        return [int(level)*100]
+    altitudes.append(altitudes[-1])
+    return altitudes
+
+
+## Returns the true airspeeds (kt) of the legs at altitudes for speed and speedtype of the flightplan
+# (N: knots, M: mach in hundredths). Raises RouteError.
+def getTrueAirspeeds(speed,speedtype,altitudes):
+    if not speed.isdigit() or not int(speed):
+        raise RouteError('No speed!')
+    if speedtype == 'N':
+        return [float(speed)]*len(altitudes)
+    if speedtype == 'M':
+        return avFormula.machToTasArray(int(speed)/100,altitudes)
+    raise RouteError('Unknown speed type {}!'.format(speedtype))
+
+
+## Returns the RouteTimes of legs (tuple of Leg) at speed, speedtype and level of the flightplan, with the wind of
+# windField if given. Raises RouteError.
+@Instrumentation.traced('routeTimes.compute')
+def computeRouteTimes(legs,speed,speedtype,level,windField=None):
+    if len(legs) < 2:
+        raise RouteError('No route!')
+    lats = [leg.lat for leg in legs]
+    lons = [leg.lon for leg in legs]
+    altitudes = getLegAltitudes(legs,level)
+    distances = avFormula.gcDistanceNmArray(lats[:-1],lats[1:],lons[:-1],lons[1:])
+    speeds = getTrueAirspeeds(speed,speedtype,altitudes)
+    
+    if windField is None:
+        courses = avFormula.gcCourseArray(lats[:-1],lats[1:],lons[:-1],lons[1:])
+        headings = courses
+    else:
+        midLats,midLons = avFormula.gcIntermediatePointArray(lats[:-1],lats[1:],lons[:-1],lons[1:])
+        courses = avFormula.gcCourseArray(midLats,lats[1:],midLons,lons[1:])
+        windDirections,windSpeeds = windField.getWinds(midLats,midLons,altitudes)
+        headings,speeds = avFormula.windTriangleArray(courses,speeds,windDirections,windSpeeds)
+        for k,sp in enumerate(speeds):
+            if sp is None or sp != sp:
+                raise RouteError('Wind too strong on the leg to {}!'.format(legs[k+1].ident))
+    
+    if avFormula.numpy is None:
+        times = [di/sp for di,sp in zip(distances,speeds)]
+        cumulativeDistances = list(accumulate(distances))
+        cumulativeTimes = list(accumulate(times))
+    else:
+        times = distances/avFormula.numpy.asarray(speeds,dtype=float)
+        cumulativeDistances = avFormula.numpy.cumsum(distances)
+        cumulativeTimes = avFormula.numpy.cumsum(times)
+    return RouteTimes(distances,cumulativeDistances,courses,headings,speeds,times,cumulativeTimes,
+                      float(cumulativeDistances[-1]),float(cumulativeTimes[-1]))
+
+
+## Returns the EET field (HHMM) of hours.
+def formatEet(hours):
+    return '{:02}{:02}'.format(*divmod(int(round(hours*60)),60))
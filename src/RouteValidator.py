@@ -0,0 +1,338 @@
+#!/usr/bin/python
+# -*- coding: iso-8859-15 -*-
+#==============================================================================
+# RouteValidator - Checks stored routes against the current navdata
+# Copyright (C) 2019  Oliver Clemens
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <https://www.gnu.org/licenses/>.
+#==============================================================================
+# Every route is resolved like RouteExpander does (same route elements, see
+# splitRoute, and the same lookups), but all problems are collected instead of
+# stopping at the first one:
+#   unknownAirport   departure or destination not in the navdata
+#   unknownWaypoint  waypoint not in the navdata
+#   unknownAirway    airway not in the navdata
+#   airwayGap        entry and exit waypoint not connected by the airway
+#   airwayEnd        route ends with an airway (no exit waypoint)
+# The routes are checked in chunks by a process pool. The workers attach to
+# the navdata cache file of the main process (see Fpl.loadWorkerFpl).
+# The route entry of FPLGUI is checked while typing by an IncrementalValidator
+# in a ValidationWorker thread, only the tokens from the first changed one on
+# are checked again.
+#
+# Usage: python RouteValidator.py report.json [routes...] [options]
+#   routes: .fpl files, corte.in, routeDatabase.txt or directories of them
+#           (default: route database and the Flight Factor A320 corte.in)
+#==============================================================================
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from Fpl import loadWorkerFpl
+import Instrumentation
+from FplBatch import getConfiguredXPlaneDir
+from NavdataCache import getNavdataDir
+from RouteDatabase import iterStoredRoutes, CORTE_FILENAME
+from RouteExpander import RouteExpander, RouteError, splitRoute, isSkippedToken
+
+# Routes per job of the worker pool.
+CHUNK_SIZE = 500
+
+TOKEN_PATTERN = re.compile(r'\S+')
+
+# State of RouteValidator.step at the start of a route.
+START_STATE = (None,None,True)
+
+ISSUE_NAMES = {'unknownAirport':'Unknown airport',
+               'unknownWaypoint':'Unknown waypoint',
+               'unknownAirway':'Unknown airway'}
+
+# Validator of the process, see initWorker.
+workerValidator = None
+
+
+class RouteValidator(object):
+    """
+    Checks routes against the navdata of a Fpl. Lookups of idents are
+    memoized, stored routes share most of their waypoints and airways.
+    """
+    
+    def __init__(self,fpl):
+        self.fpl = fpl
+        self.expander = RouteExpander(fpl)
+        self.known = {}
+    
+    ## Returns True if name is a waypoint (airports are no route elements for RouteExpander).
+    def isWaypoint(self,name):
+        known = self.known.get(name)
+        if known is None:
+            known = name in self.fpl.waypoints
+            self.known[name] = known
+        return known
+    
+    ## Returns the issues of the route from depicao to desticao as list of dicts (see module header).
+    def validate(self,depicao,route,desticao):
+        issues = []
+        for icao in (depicao,desticao):
+            if icao not in self.fpl.airports:
+                issues.append({'kind':'unknownAirport','ident':icao})
+        
+        state = START_STATE
+        for to in splitRoute(route):
+            state,issue = self.step(state,to)
+            if issue is not None:
+                issues.append(issue)
+        issue = self.finish(state)
+        if issue is not None:
+            issues.append(issue)
+        return issues
+    
+    ## Checks the next token (upper case) after state (entry,airway,expectWaypoint). Like RouteExpander route
+    # elements alternate between waypoint and airway or DCT. Returns the new state and the issue of token or None.
+    def step(self,state,token):
+        if isSkippedToken(token):
+            return state,None
+        entry,airway,expectWaypoint = state
+        name = token.partition('/')[0]
+        if not expectWaypoint:
+            if name == 'DCT' or name in self.fpl.airways:
+                return (entry,None if name == 'DCT' else name,True),None
+            return (entry,None,True),{'kind':'unknownAirway','ident':name}
+        
+        if not self.isWaypoint(name):
+            return (None,None,False),{'kind':'unknownWaypoint','ident':name}
+        issue = None
+        if airway is not None and entry is not None and not self.isConnected(airway,entry,name):
+            issue = {'kind':'airwayGap','ident':airway,'from':entry,'to':name}
+        return (name,None,False),issue
+    
+    ## Returns the issue of a route ending in state or None.
+    def finish(self,state):
+        airway = state[1]
+        if airway is not None:
+            return {'kind':'airwayEnd','ident':airway}
+        return None
+    
+    ## Returns True if airway connects the waypoints entryName and exitName.
+    def isConnected(self,airway,entryName,exitName):
+        try:
+            self.expander.findAirwaySection(airway,entryName,exitName)
+        except RouteError:
+            return False
+        return True
+
+
+class IncrementalValidator(RouteValidator):
+    """
+    Validates the route of the route entry while it is typed. The state after
+    every token of the last route is kept, only the tokens from the first
+    changed one on are checked again (with memoized lookups).
+    """
+    
+    def __init__(self,fpl):
+        RouteValidator.__init__(self,fpl)
+        # Of the last route: [(token,state after it,issue),...].
+        self.checked = []
+        self.connections = {}
+    
+    def isConnected(self,airway,entryName,exitName):
+        key = (airway,entryName,exitName)
+        connected = self.connections.get(key)
+        if connected is None:
+            connected = RouteValidator.isConnected(self,airway,entryName,exitName)
+            self.connections[key] = connected
+        return connected
+    
+    ## Returns the issues of route (without departure and destination) with the position of their token in route
+    # (start,end). While typing the last token is not checked if it may be incomplete (no space after it).
+    @Instrumentation.traced('validator.incremental')
+    def validateRoute(self,route,typing=False):
+        tokens = [(ma.group().upper(),ma.start(),ma.end()) for ma in TOKEN_PATTERN.finditer(route)]
+        if typing and tokens and tokens[-1][2] == len(route):
+            tokens.pop()
+        
+        # Keep the tokens before the first changed one.
+        nKept = 0
+        for (token,_,_),(checkedToken,_,_) in zip(tokens,self.checked):
+            if token != checkedToken:
+                break
+            nKept += 1
+        del self.checked[nKept:]
+        Instrumentation.count('validator.incrementalTokens',len(tokens) - nKept)
+        
+        state = self.checked[-1][1] if self.checked else START_STATE
+        for token,_,_ in tokens[nKept:]:
+            state,issue = self.step(state,token)
+            self.checked.append((token,state,issue))
+        
+        issues = []
+        for (_,start,end),(_,_,issue) in zip(tokens,self.checked):
+            if issue is not None:
+                issues.append(dict(issue,start=start,end=end))
+        
+        # The end is only checked when the route is complete.
+        if not typing and self.checked:
+            issue = self.finish(self.checked[-1][1])
+            if issue is not None:
+                issues.append(dict(issue,start=tokens[-1][1],end=tokens[-1][2]))
+        return issues
+
+
+class ValidationWorker(threading.Thread):
+    """
+    Validates the routes given to submit in background, only the latest one
+    if several are waiting. Like NavdataLoader the Tk main thread only reads
+    result (and error) and polls it via after() while the worker is alive.
+    """
+    
+    def __init__(self,fpl):
+        threading.Thread.__init__(self,name='ValidationWorker',daemon=True)
+        self.validator = IncrementalValidator(fpl)
+        self.condition = threading.Condition()
+        self.request = None
+        
+        # ((route,typing),issues) of the last validated request, written by the worker thread only. If validating
+        # raises, the exception is kept in error and the worker ends.
+        self.result = None
+        self.error = None
+    
+    def submit(self,route,typing=False):
+        with self.condition:
+            self.request = (route,typing)
+            self.condition.notify()
+    
+    def run(self):
+        try:
+            while True:
+                with self.condition:
+                    while self.request is None:
+                        self.condition.wait()
+                    request = self.request
+                    self.request = None
+                self.result = (request,self.validator.validateRoute(*request))
+        except Exception as e:
+            self.error = e
+            raise
+
+
+## Returns a short description of an issue.
+def describeIssue(issue):
+    if issue['kind'] == 'airwayGap':
+        return '{} does not connect {} and {}'.format(issue['ident'],issue['from'],issue['to'])
+    if issue['kind'] == 'airwayEnd':
+        return 'No exit waypoint of {}'.format(issue['ident'])
+    return '{} {}'.format(ISSUE_NAMES[issue['kind']],issue['ident'])
+
+
+## Loads the navdata of the process. Workers attach to the cache file cachePath written by the main process.
+def initWorker(navdataDir,cacheDir,cachePath=None):
+    global workerValidator
+    workerValidator = RouteValidator(loadWorkerFpl(navdataDir,cacheDir,cachePath))
+
+
+## Returns the results {source,depicao,route,desticao,issues} of the broken routes of a chunk.
+def validateChunk(routes):
+    results = []
+    for source,depicao,route,desticao in routes:
+        issues = workerValidator.validate(depicao,route,desticao)
+        if issues:
+            results.append({'source':source,'depicao':depicao,'route':route,'desticao':desticao,'issues':issues})
+    return results
+
+
+## Checks all stored routes in paths and writes the report to reportPath. Returns the report.
+@Instrumentation.traced('validator.run')
+def validateRoutes(paths,reportPath,navdataDir,cacheDir,workers=None):
+    workers = workers or os.cpu_count() or 1
+    if not os.path.isdir(cacheDir):
+        os.makedirs(cacheDir)
+    
+    t0 = time.perf_counter()
+    initWorker(navdataDir,cacheDir)
+    cachePath = workerValidator.fpl.navdataCache.path
+    with Instrumentation.span('validator.readRoutes'):
+        routes = list(iterStoredRoutes(paths))
+    Instrumentation.count('validator.routes',len(routes))
+    chunks = [routes[k:k+CHUNK_SIZE] for k in range(0,len(routes),CHUNK_SIZE)]
+    if workers > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(min(workers,len(chunks)),initializer=initWorker,initargs=(navdataDir,cacheDir,cachePath)) as pool:
+            results = [result for chunkResults in pool.map(validateChunk,chunks) for result in chunkResults]
+    else:
+        results = [result for chunk in chunks for result in validateChunk(chunk)]
+    
+    Instrumentation.count('validator.broken',len(results))
+    issueCounts = {}
+    for result in results:
+        for issue in result['issues']:
+            issueCounts[issue['kind']] = issueCounts.get(issue['kind'],0) + 1
+    report = {'cycleNumber':getattr(workerValidator.fpl,'cycleNumber',None),
+              'routes':len(routes),
+              'broken':len(results),
+              'issues':issueCounts,
+              'duration':round(time.perf_counter() - t0,3),
+              'brokenRoutes':results}
+    with open(reportPath,'w') as reportFile:
+        json.dump(report,reportFile,indent=1)
+    return report
+
+
+def main(argv=None):
+    srcDir = os.path.dirname(os.path.abspath(__file__))
+    databaseDir = os.path.join(os.path.dirname(srcDir),'database')
+    
+    parser = argparse.ArgumentParser(description='Check stored routes against the current navdata.')
+    parser.add_argument('report',help='JSON report to write')
+    parser.add_argument('routes',nargs='*',help='.fpl files, corte.in, routeDatabase.txt or directories of them')
+    parser.add_argument('--xplane',help='X-Plane directory (default: from FPLGUI.cfg)')
+    parser.add_argument('--navdata',help='navdata directory (default: from the X-Plane directory)')
+    parser.add_argument('--cache',default=databaseDir,help='directory of the navdata cache')
+    parser.add_argument('--workers',type=int,default=0,help='worker processes (0: all cores)')
+    parser.add_argument('--trace',help='write timing spans and counters to this file (see Instrumentation)')
+    parser.add_argument('--trace-format',default='chrome',choices=Instrumentation.TRACE_FORMATS,help='format of the trace file')
+    args = parser.parse_args(argv)
+    
+    if args.trace:
+        Instrumentation.enable(args.trace,args.trace_format)
+    else:
+        Instrumentation.enableFromEnvironment()
+    
+    xPlaneDir = args.xplane or getConfiguredXPlaneDir(databaseDir)
+    navdataDir = args.navdata
+    if navdataDir is None:
+        if xPlaneDir is None:
+            parser.error('either --navdata or --xplane is required (no X-Plane directory in FPLGUI.cfg)')
+        navdataDir = getNavdataDir(xPlaneDir)
+    
+    paths = args.routes
+    if not paths:
+        paths = [databaseDir]
+        if xPlaneDir is not None:
+            corteFilePath = os.path.join(xPlaneDir,'Aircraft','FlightFactorA320','data',CORTE_FILENAME)
+            if os.path.isfile(corteFilePath):
+                paths.append(corteFilePath)
+    
+    report = validateRoutes(paths,args.report,navdataDir,args.cache,args.workers)
+    print('{} routes checked in {:.2f} s, {} broken'.format(report['routes'],report['duration'],report['broken']))
+    for kind,count in sorted(report['issues'].items()):
+        print('  {}: {}'.format(kind,count))
+    return 1 if report['broken'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
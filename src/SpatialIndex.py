@@ -0,0 +1,139 @@
+#!/usr/bin/python
+# -*- coding: iso-8859-15 -*-
+#==============================================================================
+# SpatialIndex - Grid index of points on the sphere for proximity queries
+# Copyright (C) 2019  Oliver Clemens
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <https://www.gnu.org/licenses/>.
+#==============================================================================
+# The points are sorted into cells of cellSize x cellSize degrees. A radius
+# query only checks the cells overlapping the bounding box of the circle. The
+# nearest point is found by radius queries with doubling radius.
+#==============================================================================
+
+from array import array
+from math import sin, cos, asin, radians, degrees, floor, ceil, pi
+import avFormula
+
+NM_PER_RADIAN = (180*60)/pi
+MAX_DISTANCE_NM = pi*NM_PER_RADIAN
+
+
+class SpatialIndex(object):
+    
+    ## refs are returned for the points, None returns the index of the point.
+    def __init__(self,lats,lons,refs=None,cellSize=1.0):
+        self.lats = array('d',lats)
+        self.lons = array('d',lons)
+        self.refs = refs
+        self.cellSize = cellSize
+        self.nLat = int(ceil(180/cellSize))
+        self.nLon = int(ceil(360/cellSize))
+        
+        # Counting sort of the points by cell.
+        cells = [self.getCell(la,lo) for la,lo in zip(self.lats,self.lons)]
+        self.cellStart = array('l',[0]*(self.nLat*self.nLon + 1))
+        for ce in cells:
+            self.cellStart[ce+1] += 1
+        for ce in range(len(self.cellStart) - 1):
+            self.cellStart[ce+1] += self.cellStart[ce]
+        self.order = array('l',[0]*len(cells))
+        fill = array('l',self.cellStart)
+        for ptId,ce in enumerate(cells):
+            self.order[fill[ce]] = ptId
+            fill[ce] += 1
+    
+    ## Returns the grid as dict of bytes for the cache, the points and refs are not included.
+    def toBuffers(self):
+        return {'cellStart':bytes(self.cellStart),'order':bytes(self.order)}
+    
+    ## Creates an index of the points lats/lons from buffers of toBuffers. Nothing is copied (e.g. memoryviews of a mmap).
+    @classmethod
+    def fromBuffers(cls,lats,lons,buffers,cellSize=1.0):
+        index = cls.__new__(cls)
+        index.lats = lats
+        index.lons = lons
+        index.refs = None
+        index.cellSize = cellSize
+        index.nLat = int(ceil(180/cellSize))
+        index.nLon = int(ceil(360/cellSize))
+        index.cellStart = memoryview(buffers['cellStart']).cast('B').cast('l')
+        index.order = memoryview(buffers['order']).cast('B').cast('l')
+        return index
+    
+    ## Creates the index of Fpl.waypoints (WaypointStore). The refs are the rows of the store.
+    @classmethod
+    def fromWaypoints(cls,waypoints,cellSize=1.0):
+        waypoints.finalize()
+        return cls(waypoints.lats,waypoints.lons,None,cellSize)
+    
+    ## Creates the index of Fpl.airports. The refs are the idents.
+    @classmethod
+    def fromAirports(cls,airports,cellSize=1.0):
+        idents = list(airports)
+        return cls([airports[ap][0] for ap in idents],[airports[ap][1] for ap in idents],idents,cellSize)
+    
+    def __len__(self):
+        return len(self.lats)
+    
+    def getCell(self,lat,lon):
+        latId = min(int((lat + 90)/self.cellSize),self.nLat - 1)
+        lonId = int((lon + 180)/self.cellSize) % self.nLon
+        return latId*self.nLon + lonId
+    
+    ## Returns [(ref,distanceNm),...] of all points within radiusNm of lat/lon, nearest first.
+    def radius(self,lat,lon,radiusNm):
+        # Latitude band of the circle.
+        radiusDeg = radiusNm/60
+        latMin = lat - radiusDeg
+        latMax = lat + radiusDeg
+        
+        # Longitude span of the circle, all longitudes if it contains a pole.
+        radiusRad = radiusNm/NM_PER_RADIAN
+        if latMin <= -90 or latMax >= 90 or sin(radiusRad) >= cos(radians(lat)):
+            lonIds = range(self.nLon)
+        else:
+            lonSpan = degrees(asin(sin(radiusRad)/cos(radians(lat))))
+            first = int(floor((lon - lonSpan + 180)/self.cellSize))
+            last = int(floor((lon + lonSpan + 180)/self.cellSize))
+            if last - first + 1 >= self.nLon:
+                lonIds = range(self.nLon)
+            else:
+                lonIds = [lo % self.nLon for lo in range(first,last + 1)]
+        
+        firstLat = max(int(floor((latMin + 90)/self.cellSize)),0)
+        lastLat = min(int(floor((latMax + 90)/self.cellSize)),self.nLat - 1)
+        
+        result = []
+        for latId in range(firstLat,lastLat + 1):
+            for lonId in lonIds:
+                ce = latId*self.nLon + lonId
+                for ptId in self.order[self.cellStart[ce]:self.cellStart[ce+1]]:
+                    distance = avFormula.gcDistance(lat,self.lats[ptId],lon,self.lons[ptId])
+                    if distance <= radiusRad:
+                        result.append((ptId if self.refs is None else self.refs[ptId],distance*NM_PER_RADIAN))
+        
+        result.sort(key=lambda res: res[1])
+        return result
+    
+    ## Returns (ref,distanceNm) of the nearest point accepted by accept(ref) or None if there is none.
+    def nearest(self,lat,lon,accept=None,maxDistanceNm=MAX_DISTANCE_NM):
+        radiusNm = min(self.cellSize*60,maxDistanceNm)
+        while True:
+            for ref,distance in self.radius(lat,lon,radiusNm):
+                if accept is None or accept(ref):
+                    return ref,distance
+            if radiusNm >= maxDistanceNm:
+                return None
+            radiusNm = min(2*radiusNm,maxDistanceNm)
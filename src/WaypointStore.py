@@ -0,0 +1,217 @@
+#!/usr/bin/python
+# -*- coding: iso-8859-15 -*-
+#==============================================================================
+# WaypointStore - Compact column store of fixes and navaids
+# Copyright (C) 2019  Oliver Clemens
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <https://www.gnu.org/licenses/>.
+#==============================================================================
+# Instead of a dict of lists of [lat,lon,type] lists the waypoints are stored
+# in parallel arrays sorted by ident. The rows of ident self.idents[k] are
+# self.starts[k] to self.starts[k+1]. The idents are packed in one blob (see
+# IdentList). Looking up an ident returns the list of [lat,lon,type] lists as
+# before, created on demand.
+#==============================================================================
+
+from array import array
+from bisect import bisect_right
+from collections.abc import Mapping, Sequence
+
+# Names and array typecodes of the columns.
+COLUMNS = [('lats','d'),('lons','d'),('types','b')]
+
+# Typecode of row and byte offsets.
+OFFSET_TYPE = 'i'
+
+# Sorts after every ident with a given prefix.
+PREFIX_END = '\U0010ffff'
+
+
+class IdentList(Sequence):
+    """
+    Sorted list of idents stored as one utf-8 blob and the offsets of the idents.
+    Avoids one str object per ident.
+    """
+    
+    ## blob has to return bytes when sliced (bytes or mmap, not memoryview) for the
+    # comparisons of bisect. The idents start at position base of blob.
+    def __init__(self,blob=b'',offsets=None,base=0):
+        self.blob = blob
+        self.base = base
+        self.offsets = array(OFFSET_TYPE,[0]) if offsets is None else offsets
+    
+    @classmethod
+    def fromList(cls,idents):
+        offsets = array(OFFSET_TYPE,[0])
+        blobs = []
+        for ident in idents:
+            blob = ident.encode('utf-8')
+            blobs.append(blob)
+            offsets.append(offsets[-1] + len(blob))
+        return cls(b''.join(blobs),offsets)
+    
+    def __getitem__(self,k):
+        if k < 0:
+            k += len(self)
+        if not 0 <= k < len(self):
+            raise IndexError(k)
+        return str(self.blob[self.base+self.offsets[k]:self.base+self.offsets[k+1]],'utf-8')
+    
+    def __len__(self):
+        return len(self.offsets) - 1
+    
+    ## Returns the position of the first ident >= ident. Binary search on the encoded idents.
+    def bisect(self,ident):
+        key = ident.encode('utf-8')
+        blob = self.blob
+        base = self.base
+        offsets = self.offsets
+        lo = 0
+        hi = len(offsets) - 1
+        while lo < hi:
+            mid = (lo + hi)//2
+            if blob[base+offsets[mid]:base+offsets[mid+1]] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+    
+    ## Returns the position of ident or None.
+    def find(self,ident):
+        k = self.bisect(ident)
+        if k < len(self) and self[k] == ident:
+            return k
+        return None
+    
+    def getBlob(self):
+        return self.blob[self.base:self.base+self.offsets[-1]]
+    
+    ## Returns the positions (start,stop) of the idents starting with prefix.
+    def findPrefix(self,prefix):
+        return self.bisect(prefix),self.bisect(prefix + PREFIX_END)
+
+
+class WaypointStore(Mapping):
+    
+    def __init__(self):
+        self.idents = IdentList()
+        self.starts = array(OFFSET_TYPE,[0])
+        self.lats = array('d')
+        self.lons = array('d')
+        self.types = array('b')
+        
+        # Idents of rows appended since the last finalize (unsorted rows).
+        self.newIdents = []
+    
+    ## Appends columns (idents,lats,lons,types) as returned by the navdata parsers.
+    def extend(self,columns):
+        idents,lats,lons,types = columns
+        if not self.newIdents and self.idents:
+            # Reopen a finalized store, its rows are unsorted again.
+            self.newIdents = [ident for k,ident in enumerate(self.idents) for _ in range(self.starts[k+1] - self.starts[k])]
+            for name,typecode in COLUMNS:
+                setattr(self,name,array(typecode,getattr(self,name)))
+        self.newIdents.extend(idents)
+        self.lats.extend(lats)
+        self.lons.extend(lons)
+        self.types.extend(types)
+    
+    def append(self,ident,lat,lon,wpType):
+        self.extend(([ident],[lat],[lon],[wpType]))
+    
+    ## Sorts the rows by ident (stable, so duplicates keep their order) and builds the index.
+    def finalize(self):
+        if not self.newIdents:
+            return
+        order = sorted(range(len(self.newIdents)),key=self.newIdents.__getitem__)
+        self.lats = array('d',[self.lats[ro] for ro in order])
+        self.lons = array('d',[self.lons[ro] for ro in order])
+        self.types = array('b',[self.types[ro] for ro in order])
+        
+        idents = []
+        self.starts = array(OFFSET_TYPE)
+        for row,ro in enumerate(order):
+            ident = self.newIdents[ro]
+            if not idents or idents[-1] != ident:
+                idents.append(ident)
+                self.starts.append(row)
+        self.starts.append(len(order))
+        self.idents = IdentList.fromList(idents)
+        self.newIdents = []
+    
+    ## Returns the rows (start,stop) of ident or None if it is unknown.
+    def find(self,ident):
+        if self.newIdents:
+            self.finalize()
+        k = self.idents.find(ident)
+        if k is None:
+            return None
+        return self.starts[k],self.starts[k+1]
+    
+    ## Returns the rows (start,stop) of all idents starting with prefix.
+    def findPrefix(self,prefix):
+        if self.newIdents:
+            self.finalize()
+        k0,k1 = self.idents.findPrefix(prefix)
+        return self.starts[k0],self.starts[k1]
+    
+    def getRow(self,row):
+        return [self.lats[row],self.lons[row],self.types[row]]
+    
+    def getIdent(self,row):
+        return self.idents[bisect_right(self.starts,row) - 1]
+    
+    def __getitem__(self,ident):
+        rows = self.find(ident)
+        if rows is None:
+            raise KeyError(ident)
+        return [self.getRow(row) for row in range(*rows)]
+    
+    def __contains__(self,ident):
+        return self.find(ident) is not None
+    
+    def __iter__(self):
+        if self.newIdents:
+            self.finalize()
+        return iter(self.idents)
+    
+    def __len__(self):
+        if self.newIdents:
+            self.finalize()
+        return len(self.idents)
+    
+    ## Returns the store as dict of bytes-like objects for the cache.
+    def toBuffers(self):
+        self.finalize()
+        buffers = {'idents':bytes(self.idents.getBlob()),
+                   'identOffsets':bytes(self.idents.offsets),
+                   'starts':bytes(self.starts)}
+        for name,_ in COLUMNS:
+            buffers[name] = bytes(getattr(self,name))
+        return buffers
+    
+    ## Creates a store from buffers of toBuffers. The columns are used without copy (e.g. memoryviews of a mmap).
+    # buffers['idents'] may also be (blob,base) to use the idents in place, see IdentList.
+    @classmethod
+    def fromBuffers(cls,buffers):
+        store = cls()
+        identOffsets = memoryview(buffers['identOffsets']).cast('B').cast(OFFSET_TYPE)
+        if isinstance(buffers['idents'],tuple):
+            store.idents = IdentList(buffers['idents'][0],identOffsets,buffers['idents'][1])
+        else:
+            store.idents = IdentList(bytes(buffers['idents']),identOffsets)
+        store.starts = memoryview(buffers['starts']).cast('B').cast(OFFSET_TYPE)
+        for name,typecode in COLUMNS:
+            setattr(store,name,memoryview(buffers[name]).cast('B').cast(typecode))
+        return store
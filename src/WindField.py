@@ -0,0 +1,240 @@
+#!/usr/bin/python
+# -*- coding: iso-8859-15 -*-
+#==============================================================================
+# WindField - Gridded wind read from a memory-mapped file
+# Copyright (C) 2019  Oliver Clemens
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <https://www.gnu.org/licenses/>.
+#==============================================================================
+# File layout:
+#   MAGIC | header length (uint32) | header (JSON) | padding
+#         | components (float32, little endian, 8 byte aligned)
+# The header holds the grid: first latitude and longitude, their steps and
+# counts, and the flight levels (ascending). The components are the east
+# (u) and north (v) wind in kt, indexed [component][level][lat][lon]. A grid
+# of 360 degrees longitude wraps around. The file is mapped and read directly
+# (with NumPy as array), so even a global grid of many levels costs no
+# loading time and only the sampled pages are read.
+# Winds are sampled by bilinear interpolation of the components between the
+# four grid points around a position and linear between the two levels around
+# its altitude. Outside the grid the nearest edge is used. Wind files of other
+# sources (e.g. converted from GRIB) are written with WindField(...).save.
+#==============================================================================
+
+import os
+import sys
+import json
+import mmap
+import struct
+from array import array
+from bisect import bisect_right
+from math import atan2, degrees, hypot
+import avFormula
+import Instrumentation
+from NavdataCache import align
+
+WIND_VERSION = 1
+WIND_FILENAME = 'windField.bin'
+MAGIC = b'FPLGUIWND'
+HEADER_LENGTH = struct.Struct('<I')
+
+# Components per grid point (east, north).
+COMPONENTS = 2
+
+
+class WindField(object):
+    """
+    Wind components on a regular lat/lon grid at several flight levels.
+    components is a flat sequence of floats (array, memoryview or NumPy
+    array) in the order of the file.
+    """
+    
+    def __init__(self,lat0,latStep,nLats,lon0,lonStep,nLons,levels,components):
+        if len(components) != COMPONENTS*len(levels)*nLats*nLons:
+            raise ValueError('Wind field has {} components instead of {}'.format(len(components),COMPONENTS*len(levels)*nLats*nLons))
+        if nLats < 2 or nLons < 2 or not levels:
+            raise ValueError('Wind field needs at least 2x2 grid points and one level')
+        self.lat0 = lat0
+        self.latStep = latStep
+        self.nLats = nLats
+        self.lon0 = lon0
+        self.lonStep = lonStep
+        self.nLons = nLons
+        self.levels = list(levels)
+        self.components = components
+        self.wrap = abs(nLons*lonStep - 360) < 1e-9
+        self.mapping = None
+    
+    def getHeader(self):
+        return {'version':WIND_VERSION,
+                'lat0':self.lat0,'latStep':self.latStep,'nLats':self.nLats,
+                'lon0':self.lon0,'lonStep':self.lonStep,'nLons':self.nLons,
+                'levels':self.levels}
+    
+    ## Maps the wind file path. Raises ValueError if it is no wind file.
+    @classmethod
+    @Instrumentation.traced('windField.load')
+    def load(cls,path):
+        with open(path,'rb') as windFile:
+            mm = mmap.mmap(windFile.fileno(),0,access=mmap.ACCESS_READ)
+        components = None
+        try:
+            if mm[:len(MAGIC)] != MAGIC:
+                raise ValueError('{} is no wind file'.format(path))
+            offset = len(MAGIC)
+            headerLength = HEADER_LENGTH.unpack_from(mm,offset)[0]
+            offset += HEADER_LENGTH.size
+            header = json.loads(mm[offset:offset+headerLength].decode('ascii'))
+            if header.get('version') != WIND_VERSION:
+                raise ValueError('{} has wind file version {}'.format(path,header.get('version')))
+            offset = align(offset + headerLength)
+            
+            if avFormula.numpy is not None:
+                components = avFormula.numpy.frombuffer(mm,dtype='<f4',offset=offset)
+            elif sys.byteorder == 'little':
+                components = memoryview(mm)[offset:].cast('f')
+            else:
+                components = array('f',mm[offset:])
+                components.byteswap()
+            windField = cls(header['lat0'],header['latStep'],header['nLats'],header['lon0'],header['lonStep'],
+                            header['nLons'],header['levels'],components)
+        except (KeyError,TypeError,struct.error) as e:
+            del components
+            mm.close()
+            raise ValueError('{} is no wind file: {}'.format(path,e))
+        except BaseException:
+            del components
+            mm.close()
+            raise
+        windField.mapping = mm
+        return windField
+    
+    ## Writes the wind field to path.
+    def save(self,path):
+        header = json.dumps(self.getHeader()).encode('ascii')
+        components = array('f',self.components)
+        if sys.byteorder != 'little':
+            components.byteswap()
+        tmpPath = '{}.tmp'.format(path)
+        with open(tmpPath,'wb') as windFile:
+            windFile.write(MAGIC)
+            windFile.write(HEADER_LENGTH.pack(len(header)))
+            windFile.write(header)
+            offset = len(MAGIC) + HEADER_LENGTH.size + len(header)
+            windFile.write(bytes(align(offset) - offset))
+            windFile.write(components.tobytes())
+        os.replace(tmpPath,path)
+    
+    ## Releases the mapping of a loaded wind field.
+    def close(self):
+        if self.mapping is not None:
+            self.components = None
+            self.mapping.close()
+            self.mapping = None
+    
+    ## Returns the east and north components (kt) at lat/lon and altitude (ft).
+    def getComponents(self,lat,lon,altitude):
+        components = self.components
+        nLats,nLons = self.nLats,self.nLons
+        plane = nLats*nLons
+        
+        # Grid cell and position in it.
+        latPos = min(max((lat - self.lat0)/self.latStep,0),nLats - 1)
+        row = min(int(latPos),nLats - 2)
+        latFraction = latPos - row
+        lonPos = (lon - self.lon0)/self.lonStep
+        if self.wrap:
+            lonPos %= nLons
+            column = int(lonPos) % nLons
+            nextColumn = (column + 1) % nLons
+        else:
+            lonPos = min(max(lonPos,0),nLons - 1)
+            column = min(int(lonPos),nLons - 2)
+            nextColumn = column + 1
+        lonFraction = lonPos - column
+        weights = ((1 - latFraction)*(1 - lonFraction),(1 - latFraction)*lonFraction,
+                   latFraction*(1 - lonFraction),latFraction*lonFraction)
+        corners = (row*nLons + column,row*nLons + nextColumn,(row + 1)*nLons + column,(row + 1)*nLons + nextColumn)
+        
+        # Levels around the altitude.
+        levels = self.levels
+        level = altitude/100
+        upper = bisect_right(levels,level)
+        if upper == 0 or upper == len(levels):
+            levelWeights = ((min(upper,len(levels) - 1),1.0),)
+        else:
+            levelFraction = (level - levels[upper-1])/(levels[upper] - levels[upper-1])
+            levelWeights = ((upper - 1,1 - levelFraction),(upper,levelFraction))
+        
+        u = 0.0
+        v = 0.0
+        vOffset = len(levels)*plane
+        for levelIndex,levelWeight in levelWeights:
+            base = levelIndex*plane
+            for corner,weight in zip(corners,weights):
+                weight *= levelWeight
+                u += weight*components[base + corner]
+                v += weight*components[vOffset + base + corner]
+        return u,v
+    
+    ## Returns [directions,speeds] of the wind (from, deg and kt) at arrays lats, lons and altitudes (ft).
+    @Instrumentation.traced('windField.sample')
+    def getWinds(self,lats,lons,altitudes):
+        if avFormula.numpy is None:
+            winds = [self.getComponents(*pt) for pt in zip(lats,lons,altitudes)]
+            return [[degrees(atan2(-u,-v)) % 360 for u,v in winds],[hypot(u,v) for u,v in winds]]
+        
+        u,v = self.getComponentsArray(lats,lons,altitudes)
+        numpy = avFormula.numpy
+        return [numpy.degrees(numpy.arctan2(-u,-v)) % 360,numpy.hypot(u,v)]
+    
+    ## Like getComponents for arrays (NumPy).
+    def getComponentsArray(self,lats,lons,altitudes):
+        numpy = avFormula.numpy
+        nLats,nLons = self.nLats,self.nLons
+        plane = nLats*nLons
+        components = numpy.asarray(self.components).reshape(COMPONENTS,len(self.levels)*plane)
+        
+        latPos = numpy.clip((numpy.asarray(lats,dtype=float) - self.lat0)/self.latStep,0,nLats - 1)
+        row = numpy.minimum(latPos.astype(int),nLats - 2)
+        latFraction = latPos - row
+        lonPos = (numpy.asarray(lons,dtype=float) - self.lon0)/self.lonStep
+        if self.wrap:
+            lonPos %= nLons
+            column = lonPos.astype(int) % nLons
+            nextColumn = (column + 1) % nLons
+        else:
+            lonPos = numpy.clip(lonPos,0,nLons - 1)
+            column = numpy.minimum(lonPos.astype(int),nLons - 2)
+            nextColumn = column + 1
+        lonFraction = lonPos - column
+        
+        levels = numpy.asarray(self.levels,dtype=float)
+        level = numpy.clip(numpy.asarray(altitudes,dtype=float)/100,levels[0],levels[-1])
+        upper = numpy.clip(numpy.searchsorted(levels,level,side='right'),1,max(len(levels) - 1,1))
+        lower = upper - 1
+        if len(levels) > 1:
+            levelFraction = (level - levels[lower])/(levels[upper] - levels[lower])
+        else:
+            upper = lower
+            levelFraction = numpy.zeros_like(level)
+        
+        result = numpy.zeros((COMPONENTS,len(latPos)))
+        for levelIndex,levelWeight in ((lower,1 - levelFraction),(upper,levelFraction)):
+            base = levelIndex*plane
+            for rowIndex,rowWeight in ((row,1 - latFraction),(row + 1,latFraction)):
+                for columnIndex,columnWeight in ((column,1 - lonFraction),(nextColumn,lonFraction)):
+                    result += levelWeight*rowWeight*columnWeight*components[:,base + rowIndex*nLons + columnIndex]
+        return result[0],result[1]
+
@@ -22,6 +22,22 @@
 #==============================================================================
 
 from math import sin,asin,cos,acos,tan,atan2,sqrt,radians,degrees,pi #@UnusedImport
+import heapq
+
+# NumPy is optional. Without it the *Array functions fall back to plain Python.
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Below this number of points plain Python is faster than NumPy.
+VECTOR_MIN = 16
+
+# ISA: sea level temperature (K), lapse rate (K/ft), tropopause (ft) and speed of sound at sea level (kt).
+ISA_T0 = 288.15
+ISA_LAPSE = 0.0019812
+ISA_TROPOPAUSE = 36089
+SPEED_OF_SOUND_KT = 661.47
 
 ## Calculates the great circle distance in arc angle.
 def gcDistance(lat1,lat2,lon1,lon2):
@@ -49,7 +65,9 @@ def gcIntermediatePoint(lat1,lat2,lon1,lon2,*args):
         f = 0.5
     
     # Calc gc distance between points.
-    d = gcDistance(lat1,lat2,lon1,lon2)
+    d = gcDistance(degrees(lat1),degrees(lat2),degrees(lon1),degrees(lon2))
+    if d == 0:
+        return [degrees(lat1),degrees(lon1)]
 
     # Calc intermediate point.
     A=sin((1-f)*d)/sin(d)
@@ -60,4 +78,155 @@ def gcIntermediatePoint(lat1,lat2,lon1,lon2,*args):
     lat=atan2(z,sqrt(x**2+y**2))
     lon=atan2(y,x)
     
-    return [degrees(lat),degrees(lon)]
\ No newline at end of file
+    return [degrees(lat),degrees(lon)]
+
+## Calculates the great circle distance in arc angle of arrays of points.
+# Any argument may be an array or a scalar, scalars are broadcast (e.g. one point against many).
+def gcDistanceArray(lat1,lat2,lon1,lon2):
+    if numpy is None:
+        return [gcDistance(*pt) for pt in broadcastPoints(lat1,lat2,lon1,lon2)]
+    
+    lat1 = numpy.radians(lat1)
+    lat2 = numpy.radians(lat2)
+    lon1 = numpy.radians(lon1)
+    lon2 = numpy.radians(lon2)
+    a = numpy.sin((lat1-lat2)/2)**2 + numpy.cos(lat1)*numpy.cos(lat2)*numpy.sin((lon1-lon2)/2)**2
+    return 2*numpy.arcsin(numpy.sqrt(numpy.minimum(a,1.0)))
+
+## Calculates the great circle distance in nautical miles of arrays of points.
+def gcDistanceNmArray(lat1,lat2,lon1,lon2):
+    distance = gcDistanceArray(lat1,lat2,lon1,lon2)
+    if numpy is None:
+        return [((180*60)/pi)*di for di in distance]
+    return ((180*60)/pi)*distance
+
+## Calculates the intermediate coordinates of arrays of point pairs. Returns [lats,lons].
+def gcIntermediatePointArray(lat1,lat2,lon1,lon2,f=0.5):
+    if numpy is None:
+        points = [gcIntermediatePoint(*pt,f) for pt in broadcastPoints(lat1,lat2,lon1,lon2)]
+        return [[pt[0] for pt in points],[pt[1] for pt in points]]
+    
+    # Avoids 0/0 for same points.
+    d = numpy.maximum(gcDistanceArray(lat1,lat2,lon1,lon2),1e-12)
+    lat1 = numpy.radians(lat1)
+    lat2 = numpy.radians(lat2)
+    lon1 = numpy.radians(lon1)
+    lon2 = numpy.radians(lon2)
+    
+    A = numpy.sin((1-f)*d)/numpy.sin(d)
+    B = numpy.sin(f*d)/numpy.sin(d)
+    x = A*numpy.cos(lat1)*numpy.cos(lon1) + B*numpy.cos(lat2)*numpy.cos(lon2)
+    y = A*numpy.cos(lat1)*numpy.sin(lon1) + B*numpy.cos(lat2)*numpy.sin(lon2)
+    z = A*numpy.sin(lat1)                 + B*numpy.sin(lat2)
+    lat = numpy.arctan2(z,numpy.sqrt(x**2+y**2))
+    lon = numpy.arctan2(y,x)
+    
+    return [numpy.degrees(lat),numpy.degrees(lon)]
+
+## Calculates the initial true course (deg, 0-360) from point 1 to point 2.
+def gcCourse(lat1,lat2,lon1,lon2):
+    lat1 = radians(lat1)
+    lat2 = radians(lat2)
+    dLon = radians(lon2-lon1)
+    return degrees(atan2(sin(dLon)*cos(lat2),cos(lat1)*sin(lat2) - sin(lat1)*cos(lat2)*cos(dLon))) % 360
+
+## Calculates the initial true courses (deg, 0-360) of arrays of point pairs, scalars are broadcast.
+def gcCourseArray(lat1,lat2,lon1,lon2):
+    if numpy is None:
+        return [gcCourse(*pt) for pt in broadcastPoints(lat1,lat2,lon1,lon2)]
+    
+    lat1 = numpy.radians(lat1)
+    lat2 = numpy.radians(lat2)
+    dLon = numpy.radians(numpy.subtract(lon2,lon1))
+    course = numpy.arctan2(numpy.sin(dLon)*numpy.cos(lat2),
+                           numpy.cos(lat1)*numpy.sin(lat2) - numpy.sin(lat1)*numpy.cos(lat2)*numpy.cos(dLon))
+    return numpy.degrees(course) % 360
+
+## Calculates true heading (deg) and ground speed of a true course (deg) and true airspeed with the wind
+# from windDirection (deg) at windSpeed. Returns None,None if the course can not be flown in that wind.
+def windTriangle(course,tas,windDirection,windSpeed):
+    angle = radians(windDirection - course)
+    swc = windSpeed/tas*sin(angle)
+    if abs(swc) > 1:
+        return None,None
+    groundSpeed = tas*sqrt(1 - swc**2) - windSpeed*cos(angle)
+    if groundSpeed <= 0:
+        return None,None
+    return (course + degrees(asin(swc))) % 360,groundSpeed
+
+## Calculates the wind triangle of arrays, scalars are broadcast. Returns [headings,groundSpeeds], None
+# (NumPy: nan) where the course can not be flown.
+def windTriangleArray(course,tas,windDirection,windSpeed):
+    if numpy is None:
+        results = [windTriangle(*pt) for pt in broadcastPoints(course,tas,windDirection,windSpeed)]
+        return [[re[0] for re in results],[re[1] for re in results]]
+    
+    angle = numpy.radians(numpy.subtract(windDirection,course))
+    swc = numpy.divide(windSpeed,tas)*numpy.sin(angle)
+    possible = numpy.abs(swc) <= 1
+    swc = numpy.where(possible,swc,numpy.nan)
+    groundSpeed = tas*numpy.sqrt(1 - swc**2) - windSpeed*numpy.cos(angle)
+    groundSpeed = numpy.where(groundSpeed > 0,groundSpeed,numpy.nan)
+    heading = (course + numpy.degrees(numpy.arcsin(swc))) % 360
+    return [numpy.where(numpy.isnan(groundSpeed),numpy.nan,heading),groundSpeed]
+
+## Calculates the true airspeed (kt) of a mach number at an altitude (ft) in the ISA.
+def machToTas(mach,altitude):
+    temperature = ISA_T0 - ISA_LAPSE*min(altitude,ISA_TROPOPAUSE)
+    return mach*SPEED_OF_SOUND_KT*sqrt(temperature/ISA_T0)
+
+## Calculates the true airspeeds (kt) of arrays of mach numbers and altitudes (ft), scalars are broadcast.
+def machToTasArray(mach,altitude):
+    if numpy is None:
+        return [machToTas(*pt) for pt in broadcastPoints(mach,altitude)]
+    
+    temperature = ISA_T0 - ISA_LAPSE*numpy.minimum(altitude,ISA_TROPOPAUSE)
+    return mach*SPEED_OF_SOUND_KT*numpy.sqrt(temperature/ISA_T0)
+
+## Returns index and arc angle distance of the point of lats/lons nearest to lat/lon.
+def nearestPoint(lat,lon,lats,lons):
+    if numpy is None or len(lats) < VECTOR_MIN:
+        distances = [gcDistance(lat,la,lon,lo) for la,lo in zip(lats,lons)]
+        index = min(range(len(distances)),key=distances.__getitem__)
+        return index,distances[index]
+    
+    distances = gcDistanceArray(lat,numpy.asarray(lats,dtype=float),lon,numpy.asarray(lons,dtype=float))
+    index = int(numpy.argmin(distances))
+    return index,float(distances[index])
+
+## Returns [(index,arc angle distance),...] of the n points of lats/lons nearest to lat/lon, nearest first.
+def nearestPoints(lat,lon,lats,lons,n):
+    if numpy is None or len(lats) < VECTOR_MIN:
+        distances = [gcDistance(lat,la,lon,lo) for la,lo in zip(lats,lons)]
+        indexes = heapq.nsmallest(n,range(len(distances)),key=distances.__getitem__)
+        return [(ind,distances[ind]) for ind in indexes]
+    
+    distances = gcDistanceArray(lat,numpy.asarray(lats,dtype=float),lon,numpy.asarray(lons,dtype=float))
+    if n < len(distances):
+        indexes = numpy.argpartition(distances,n)[:n]
+    else:
+        indexes = numpy.arange(len(distances))
+    indexes = indexes[numpy.argsort(distances[indexes],kind='stable')]
+    return [(int(ind),float(distances[ind])) for ind in indexes]
+
+## Returns indices i,j and arc angle distance of the nearest pair of points (lats1[i],lons1[i]) and (lats2[j],lons2[j]).
+def nearestPair(lats1,lons1,lats2,lons2):
+    if numpy is None or len(lats1)*len(lats2) < VECTOR_MIN:
+        nearest = (None,None,3.2) # slightly greater than pi
+        for i,(la1,lo1) in enumerate(zip(lats1,lons1)):
+            for j,(la2,lo2) in enumerate(zip(lats2,lons2)):
+                distance = gcDistance(la1,la2,lo1,lo2)
+                if distance < nearest[2]:
+                    nearest = (i,j,distance)
+        return nearest
+    
+    distances = gcDistanceArray(numpy.asarray(lats1,dtype=float)[:,None],numpy.asarray(lats2,dtype=float)[None,:],
+                                numpy.asarray(lons1,dtype=float)[:,None],numpy.asarray(lons2,dtype=float)[None,:])
+    i,j = numpy.unravel_index(numpy.argmin(distances),distances.shape)
+    return int(i),int(j),float(distances[i,j])
+
+## Broadcasts scalars and sequences of equal length to tuples of points (plain Python fallback).
+def broadcastPoints(*args):
+    n = max(len(ar) if hasattr(ar,'__len__') else 1 for ar in args)
+    args = [ar if hasattr(ar,'__len__') else [ar]*n for ar in args]
+    return zip(*args)
@@ -0,0 +1,638 @@
+#!/usr/bin/python
+# -*- coding: iso-8859-15 -*-
+#==============================================================================
+# benchmark - Performance benchmarks of FPLGUI on synthetic navdata
+# Copyright (C) 2019  Oliver Clemens
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <https://www.gnu.org/licenses/>.
+#==============================================================================
+# Synthetic navdata (earth_fix.dat, earth_nav.dat, apt.csv, earth_awy.dat) and
+# routeDatabase.txt are generated at a scale (see SCALES) with a fixed seed,
+# so runs are comparable without X-Plane data. Every benchmark is repeated and
+# the best time counts. Results can be saved as JSON and compared with an
+# earlier run, slower benchmarks are reported as regressions.
+#
+# Usage: python benchmark.py [--scale regional|global|global10x] [--repeat n]
+#                            [--only name,...] [--data dir] [--save file]
+#                            [--compare file] [--legacy-airways]
+#==============================================================================
+
+import os
+import re
+import sys
+import json
+import math
+import time
+import random
+import string
+import argparse
+import shutil
+import platform
+import tempfile
+from array import array
+from copy import deepcopy
+import avFormula
+from Fpl import Fpl, Airway
+from RouteDatabase import RouteDatabase, ROUTE_TXT_FILENAME, ROUTE_DB_FILENAME
+from RouteExpander import RouteExpander, RouteError, formatFms
+from RouteFinder import RouteFinder
+from RouteTimes import computeRouteTimes
+from RouteValidator import IncrementalValidator
+from WindField import WindField, WIND_FILENAME
+
+# Counts of the generated data. global is about the size of the X-Plane 11 navdata.
+SCALES = {'regional':{'fixes':20000,'navaids':1500,'airports':1500,'airways':600,'airwayLength':25,'routes':5000,
+                      'lats':(35,60),'lons':(-10,30)},
+          'global':{'fixes':250000,'navaids':20000,'airports':35000,'airways':6000,'airwayLength':40,'routes':50000,
+                    'lats':(-80,80),'lons':(-180,180)},
+          'global10x':{'fixes':2500000,'navaids':200000,'airports':350000,'airways':60000,'airwayLength':40,'routes':500000,
+                       'lats':(-80,80),'lons':(-180,180)}}
+
+# Increment if the generated data changes, saved data is generated again then.
+GENERATOR_VERSION = 3
+DATA_INFO_FILENAME = 'benchmarkData.json'
+CACHE_DIRNAME = 'cache'
+
+# Share of fixes reusing the ident of another fix (like the real data).
+DUPLICATE_SHARE = 0.05
+
+# Routes looked up by routeImport and expanded by fmsExport.
+ROUTE_SAMPLES = 1000
+
+# Grid (deg) and levels of the generated wind field.
+WIND_GRID = 1
+WIND_LEVELS = [100,180,240,300,340,390,450]
+
+# City pairs (of the route samples) searched by the routeSearch benchmarks.
+ROUTE_SEARCH_SAMPLES = 100
+
+# Slowdown (relative) reported as regression by compare.
+REGRESSION_LIMIT = 0.1
+
+
+## Writes earth_fix.dat, earth_nav.dat, apt.csv, earth_awy.dat and routeDatabase.txt of scale (see SCALES) to directory.
+def generateNavdata(directory,scale,seed=1):
+    rand = random.Random(seed)
+    latMin,latMax = scale['lats']
+    lonMin,lonMax = scale['lons']
+    
+    def position():
+        return rand.uniform(latMin,latMax),rand.uniform(lonMin,lonMax)
+    
+    def uniqueNames(count,length,taken=()):
+        names = set()
+        while len(names) < count:
+            name = ''.join(rand.choice(string.ascii_uppercase) for _ in range(length))
+            if name not in taken:
+                names.add(name)
+        return sorted(names)
+    
+    # Fixes with five letter names, some names are used twice.
+    names = uniqueNames(scale['fixes'] - int(scale['fixes']*scale.get('duplicateShare',DUPLICATE_SHARE)),5)
+    names += [rand.choice(names) for _ in range(scale['fixes'] - len(names))]
+    fixes = [(na,11) + position() for na in names]
+    with open(os.path.join(directory,'earth_fix.dat'),'w') as fixFile:
+        fixFile.write('I\n1101 Version - data cycle 1901, build 20190103, metadata FixXP1101. Synthetic data.\n\n')
+        fixFile.writelines(' {:12.9f} {:13.9f} {} ENRT ZZ 2115159\n'.format(fi[2],fi[3],fi[0]) for fi in fixes)
+        fixFile.write('99\n')
+    
+    # NDB (2), VOR (3) and DME (13) with three letter names.
+    navaids = [(''.join(rand.choice(string.ascii_uppercase) for _ in range(3)),rand.choice((2,3,13))) + position()
+               for _ in range(scale['navaids'])]
+    with open(os.path.join(directory,'earth_nav.dat'),'w') as navFile:
+        navFile.write('I\n1100 Version - data cycle 1901, build 20190103, metadata NavXP1100. Synthetic data.\n\n')
+        for ident,navType,lat,lon in navaids:
+            navFile.write('{:<2} {:12.8f} {:13.8f} {:6} {:5} {:3} {:10.3f} {} ENRT ZZ SYNTHETIC {}\n'.format(
+                navType,lat,lon,500,11680,130,0.0,ident,'NDB' if navType == 2 else 'VOR' if navType == 3 else 'DME'))
+        navFile.write('99\n')
+    
+    # Airports with unique four letter idents.
+    airports = uniqueNames(scale['airports'],4)
+    with open(os.path.join(directory,'apt.csv'),'w') as aptFile:
+        for apId,icao in enumerate(airports):
+            lat,lon = position()
+            aptFile.write('{},Airport {},LAT {:.6f},LON {:.6f},{}\n'.format(icao,apId,lat,lon,rand.randint(0,8000)))
+    
+    # Airways as chains of neighbouring fixes and VOR/NDB (random walks on a grid of about 4 points per
+    # cell). The segments are sorted by the first name like the real file, so the segments of one airway
+    # are spread over the file, some are written reversed.
+    points = fixes + [na for na in navaids if na[1] != 13]
+    cellSize = ((latMax - latMin)*(lonMax - lonMin)*4/len(points))**0.5
+    grid = {}
+    for pt in points:
+        grid.setdefault((int((pt[2] - latMin)//cellSize),int((pt[3] - lonMin)//cellSize)),[]).append(pt)
+    airways = []
+    lines = []
+    for awId in range(scale['airways']):
+        name = '{}{}'.format(rand.choice('ABGJLMNQRUVWY'),awId)
+        chain = [rand.choice(points)]
+        chainNames = {chain[0][0]}
+        while len(chain) < scale['airwayLength']:
+            cell = (int((chain[-1][2] - latMin)//cellSize),int((chain[-1][3] - lonMin)//cellSize))
+            neighbours = [pt for dLat in (-1,0,1) for dLon in (-1,0,1) for pt in grid.get((cell[0]+dLat,cell[1]+dLon),())
+                          if pt[0] not in chainNames]
+            if not neighbours:
+                break
+            chain.append(rand.choice(neighbours))
+            chainNames.add(chain[-1][0])
+        if len(chain) < 2:
+            continue
+        airways.append((name,chain))
+        for wp1,wp2 in zip(chain[:-1],chain[1:]):
+            if rand.random() < 0.5:
+                wp1,wp2 = wp2,wp1
+            lines.append('{} ZZ {} {} ZZ {} N 2 180 450 {}\n'.format(wp1[0],wp1[1],wp2[0],wp2[1],name))
+    lines.sort()
+    with open(os.path.join(directory,'earth_awy.dat'),'w') as awyFile:
+        awyFile.write('I\n1100 Version - data cycle 1901, build 20190103, metadata AwyXP1100. Synthetic data.\n\n')
+        awyFile.writelines(lines)
+        awyFile.write('99\n')
+    
+    # Routes of one or two airway sections.
+    cityPairs = {}
+    with open(os.path.join(directory,ROUTE_TXT_FILENAME),'w') as routeFile:
+        for _ in range(scale['routes']):
+            elements = []
+            for _ in range(rand.randint(1,2)):
+                name,chain = rand.choice(airways)
+                entryPos,exitPos = rand.sample(range(len(chain)),2)
+                if elements:
+                    elements.append('DCT')
+                elements += [chain[entryPos][0],name,chain[exitPos][0]]
+            dep,dest = rand.sample(airports,2)
+            number = cityPairs.get(dep + dest,0) + 1
+            cityPairs[dep + dest] = number
+            routeFile.write('{}{}{:02};{} {} {};FL{}, synthetic\n'.format(dep,dest,number % 100,dep,' '.join(elements),dest,
+                                                                           rand.randint(10,41)*10))
+
+
+## Generates the data of scale into directory unless it is there already.
+def prepareData(directory,scaleName,seed):
+    info = {'scale':scaleName,'seed':seed,'generatorVersion':GENERATOR_VERSION}
+    infoPath = os.path.join(directory,DATA_INFO_FILENAME)
+    try:
+        with open(infoPath) as infoFile:
+            if json.load(infoFile) == info:
+                return
+    except (OSError,ValueError):
+        pass
+    
+    t0 = time.perf_counter()
+    generateNavdata(directory,SCALES[scaleName],seed)
+    if os.path.exists(os.path.join(directory,ROUTE_DB_FILENAME)):
+        os.remove(os.path.join(directory,ROUTE_DB_FILENAME))
+    if os.path.isdir(os.path.join(directory,CACHE_DIRNAME)):
+        shutil.rmtree(os.path.join(directory,CACHE_DIRNAME))
+    with open(infoPath,'w') as infoFile:
+        json.dump(info,infoFile)
+    print('Generated {} data in {:.1f} s'.format(scaleName,time.perf_counter() - t0))
+
+
+#==============================================================================
+# Implementation of getAirways and Airway of FPLGUI 0.3.4 as reference.
+#==============================================================================
+class LegacyAirway(object):
+    
+    def __init__(self,name):
+        self.name = name
+        self.parts = []
+    
+    def update(self,fix1,fix2):
+        fix1Part = None
+        fix2Part = None
+        
+        for paId,pa in enumerate(self.parts):
+            if fix1 in pa:
+                fix1Part = paId
+            if fix2 in pa:
+                fix2Part = paId
+        
+        if fix1Part is None and fix2Part is None:
+            self.parts.append([fix1,fix2])
+        elif fix1Part is None:
+            fix2Ind = self.parts[fix2Part].index(fix2)
+            if not fix2Ind:
+                self.parts[fix2Part].insert(0, fix1)
+            elif fix2Ind == (len(self.parts[fix2Part]) - 1):
+                self.parts[fix2Part].append(fix1)
+        elif fix2Part is None:
+            fix1Ind = self.parts[fix1Part].index(fix1)
+            if not fix1Ind:
+                self.parts[fix1Part].insert(0, fix2)
+            elif fix1Ind == (len(self.parts[fix1Part]) - 1):
+                self.parts[fix1Part].append(fix2)
+        elif fix1Part != fix2Part:
+            fix1Ind = self.parts[fix1Part].index(fix1)
+            fix2Ind = self.parts[fix2Part].index(fix2)
+            if not fix1Ind:
+                self.parts[fix1Part] = self.parts[fix1Part][::-1]
+            if fix2Ind == (len(self.parts[fix2Part]) - 1):
+                self.parts[fix2Part] = self.parts[fix2Part][::-1]
+            self.parts.append(self.parts[fix1Part] + self.parts[fix2Part])
+            self.parts.pop(fix1Part)
+            if fix2Part > fix1Part:
+                fix2Part -= 1
+            self.parts.pop(fix2Part)
+
+
+def legacyGetAirways(waypoints,airwaysFilePath):
+    airways = {}
+    with open(airwaysFilePath) as airwaysFile:
+        for line in airwaysFile:
+            lineSplit = re.split(' +',line.strip())
+            if len(lineSplit) == 11:
+                fixes1 = deepcopy(waypoints[lineSplit[0]])
+                fixes2 = deepcopy(waypoints[lineSplit[3]])
+                nearest = [None,None]
+                distanceMin = 3.2
+                if len(fixes1) > 1 or len(fixes2) > 1:
+                    for fi1id,fi1 in enumerate(fixes1):
+                        if int(lineSplit[2]) != fi1[2]:
+                            continue
+                        for fi2id,fi2 in enumerate(fixes2):
+                            if int(lineSplit[5]) != fi2[2]:
+                                continue
+                            distance = avFormula.gcDistance(fi1[0],fi1[1],fi2[0],fi2[1])
+                            if distance < distanceMin:
+                                nearest = [fi1id,fi2id]
+                                distanceMin = distance
+                else:
+                    nearest = [0,0]
+                fix1 = fixes1[nearest[0]]
+                fix2 = fixes2[nearest[1]]
+                fix1.insert(0,lineSplit[0])
+                fix2.insert(0,lineSplit[3])
+                for aw in lineSplit[10].split('-'):
+                    if aw not in airways:
+                        airways[aw] = LegacyAirway(aw)
+                    airways[aw].update(fix1,fix2)
+    return airways
+
+
+## Returns the parts of all airways as comparable set (orientation independent).
+def airwayParts(airways):
+    parts = set()
+    for aw in airways.values():
+        for pa in aw.parts:
+            pa = tuple(tuple(wp) for wp in pa)
+            parts.add((aw.name,min(pa,pa[::-1])))
+    return parts
+
+
+def benchmarkAirways(nFixes,nAirways,airwayLength):
+    scale = {'fixes':nFixes,'navaids':0,'airports':0,'airways':nAirways,'airwayLength':airwayLength,'routes':0,
+             'lats':(-80,80),'lons':(-180,180),'duplicateShare':0}
+    with tempfile.TemporaryDirectory() as directory:
+        generateNavdata(directory,scale)
+        fpl = Fpl(directory)
+        fpl.getFixes(os.path.join(directory,'earth_fix.dat'))
+        
+        t0 = time.perf_counter()
+        legacyAirways = legacyGetAirways(fpl.waypoints,os.path.join(directory,'earth_awy.dat'))
+        tLegacy = time.perf_counter() - t0
+        
+        t0 = time.perf_counter()
+        fpl.getAirways(os.path.join(directory,'earth_awy.dat'))
+        tIndexed = time.perf_counter() - t0
+    
+    print('getAirways: {} airways x {} fixes'.format(nAirways,airwayLength))
+    print('  legacy:  {:8.3f} s'.format(tLegacy))
+    print('  indexed: {:8.3f} s ({:.1f}x)'.format(tIndexed,tLegacy/tIndexed))
+    print('  same parts: {}'.format(airwayParts(legacyAirways) == airwayParts(fpl.airways)))
+
+
+#==============================================================================
+# Benchmarks. Each one returns (setup,run,items): setup() prepares a state
+# that is passed to run(state), only run is timed. items is the number of
+# processed items (lines, segments, routes) for the throughput.
+#==============================================================================
+class BenchmarkContext(object):
+    """
+    Data shared by the benchmarks of one run: the data directory and the
+    navdata loaded once (from the navdata cache in a separate directory).
+    """
+    
+    def __init__(self,directory,scale):
+        self.directory = directory
+        self.scale = scale
+        self.cacheDir = os.path.join(directory,CACHE_DIRNAME)
+        self.fpl = None
+        self.routes = None
+        self.routeFinder = None
+        self.windField = None
+    
+    def getPath(self,filename):
+        return os.path.join(self.directory,filename)
+    
+    def getFpl(self):
+        if self.fpl is None:
+            if not os.path.isdir(self.cacheDir):
+                os.makedirs(self.cacheDir)
+            self.fpl = Fpl(self.cacheDir)
+            self.fpl.loadNavdata(self.directory,self.cacheDir)
+        return self.fpl
+    
+    ## Returns ROUTE_SAMPLES routes (depicao,route,desticao) of the route database.
+    def getRoutes(self):
+        if self.routes is None:
+            with open(self.getPath(ROUTE_TXT_FILENAME)) as routeFile:
+                lines = [line for _,line in zip(range(ROUTE_SAMPLES),routeFile)]
+            self.routes = []
+            for line in lines:
+                tokens = line.split(';')[1].split()
+                self.routes.append((tokens[0],' '.join(tokens[1:-1]),tokens[-1]))
+        return self.routes
+    
+    ## Returns a global WindField of WIND_GRID (jet streams at 45N/S), generated and mapped on first use.
+    def getWindField(self):
+        if self.windField is None:
+            nLats = 180//WIND_GRID + 1
+            nLons = 360//WIND_GRID
+            components = array('f')
+            for northern in (False,True):
+                for level in WIND_LEVELS:
+                    for row in range(nLats):
+                        lat = -90 + row*WIND_GRID
+                        for column in range(nLons):
+                            lon = -180 + column*WIND_GRID
+                            jet = level/3*math.exp(-((abs(lat) - 45)/10)**2)
+                            components.append(10*math.sin(math.radians(2*lon + lat)) if northern else jet + 5*math.cos(math.radians(lon)))
+            WindField(-90,WIND_GRID,nLats,-180,WIND_GRID,nLons,WIND_LEVELS,components).save(self.getPath(WIND_FILENAME))
+            self.windField = WindField.load(self.getPath(WIND_FILENAME))
+        return self.windField
+    
+    ## Returns a RouteFinder with landmarks and contraction hierarchy (prepared once, saved in the cache directory).
+    def getRouteFinder(self):
+        if self.routeFinder is None:
+            self.routeFinder = RouteFinder(self.getFpl())
+            self.routeFinder.prepareLandmarks()
+            self.routeFinder.prepareContraction()
+        return self.routeFinder
+
+
+def benchmarkLoader(method,filename,items):
+    def benchmark(context):
+        return (lambda: Fpl(context.cacheDir),
+                lambda fpl: getattr(fpl,method)(context.getPath(filename)),
+                context.scale[items])
+    return benchmark
+
+
+def benchmarkGetAirways(context):
+    def setup():
+        fpl = Fpl(context.cacheDir)
+        fpl.getFixes(context.getPath('earth_fix.dat'))
+        fpl.getNavaids(context.getPath('earth_nav.dat'))
+        return fpl
+    return setup,lambda fpl: fpl.getAirways(context.getPath('earth_awy.dat')),context.scale['airways']*(context.scale['airwayLength'] - 1)
+
+
+## Airway.update only, the fix pairs are looked up before.
+def benchmarkAirwayUpdate(context):
+    fpl = context.getFpl()
+    segments = []
+    with open(context.getPath('earth_awy.dat')) as awyFile:
+        for line in awyFile:
+            lineSplit = line.split()
+            if len(lineSplit) == 11:
+                pair = fpl.getNearestFixPair(lineSplit[0],int(lineSplit[2]),lineSplit[3],int(lineSplit[5]))
+                if pair is not None:
+                    segments.append((pair[0],pair[1],lineSplit[10].split('-')))
+    
+    def run(_):
+        airways = {}
+        for fix1,fix2,airwayNames in segments:
+            for aw in airwayNames:
+                if aw not in airways:
+                    airways[aw] = Airway(aw)
+                airways[aw].update(fix1,fix2)
+    return lambda: None,run,len(segments)
+
+
+def benchmarkLoadNavdata(context):
+    def setup():
+        cacheDir = os.path.join(context.directory,'coldCache')
+        if os.path.isdir(cacheDir):
+            shutil.rmtree(cacheDir)
+        os.makedirs(cacheDir)
+        return Fpl(cacheDir),cacheDir
+    def run(state):
+        fpl,cacheDir = state
+        fpl.loadNavdata(context.directory,cacheDir)
+    return setup,run,context.scale['fixes'] + context.scale['navaids'] + context.scale['airports']
+
+
+def benchmarkCacheLoad(context):
+    context.getFpl()
+    return (lambda: Fpl(context.cacheDir),
+            lambda fpl: fpl.loadNavdata(context.directory,context.cacheDir),
+            context.scale['fixes'] + context.scale['navaids'] + context.scale['airports'])
+
+
+def benchmarkRouteDatabaseBuild(context):
+    return lambda: RouteDatabase(context.directory),lambda db: db.build(),context.scale['routes']
+
+
+## Route import of ROUTE_SAMPLES city pairs.
+def benchmarkRouteImport(context):
+    routeDatabase = RouteDatabase(context.directory)
+    routeDatabase.update()
+    cityPairs = [(dep,dest) for dep,_,dest in context.getRoutes()]
+    def run(db):
+        for dep,dest in cityPairs:
+            db.getRoutes(dep,dest)
+    return lambda: routeDatabase,run,len(cityPairs)
+
+
+## Route expansion and fms file of ROUTE_SAMPLES routes, without memoization.
+def benchmarkFmsExport(context):
+    fpl = context.getFpl()
+    routes = context.getRoutes()
+    def run(expander):
+        for dep,route,dest in routes:
+            try:
+                formatFms(expander.expandUncached(route,dep,dest,'330'),fpl.cycleNumber)
+            except RouteError:
+                pass
+    return lambda: RouteExpander(fpl),run,len(routes)
+
+
+## Distances and times of ROUTE_SAMPLES expanded routes at mach (the legs are expanded before), with or without wind.
+def benchmarkRouteTimes(wind):
+    def benchmark(context):
+        expander = RouteExpander(context.getFpl())
+        windField = context.getWindField() if wind else None
+        expansions = []
+        for dep,route,dest in context.getRoutes():
+            try:
+                expansions.append(expander.expandUncached(route,dep,dest,'330'))
+            except RouteError:
+                pass
+        def run(_):
+            for legs in expansions:
+                computeRouteTimes(legs,'082','M','330',windField)
+        return lambda: None,run,len(expansions)
+    return benchmark
+
+
+## Validation of ROUTE_SAMPLES routes typed character by character (like the route entry of FPLGUI).
+def benchmarkRouteTyping(context):
+    fpl = context.getFpl()
+    routes = [route for _,route,_ in context.getRoutes()]
+    def run(_):
+        validator = IncrementalValidator(fpl)
+        for route in routes:
+            for end in range(1,len(route) + 1):
+                validator.validateRoute(route[:end],typing=True)
+    return lambda: None,run,sum(len(ro) for ro in routes)
+
+
+## Shortest route of ROUTE_SEARCH_SAMPLES city pairs, method plain (A*), landmarks (A* with ALT) or contracted.
+def benchmarkRouteSearch(method):
+    def benchmark(context):
+        fpl = context.getFpl()
+        graph = context.getRouteFinder().getGraph()
+        searches = []
+        for dep,_,dest in context.getRoutes()[:ROUTE_SEARCH_SAMPLES]:
+            if dep in fpl.airports and dest in fpl.airports:
+                destLat,destLon = fpl.airports[dest]
+                searches.append((graph.getConnections(*fpl.airports[dep]),graph.getConnections(destLat,destLon),destLat,destLon))
+        def run(_):
+            for starts,goals,destLat,destLon in searches:
+                if method == 'contracted':
+                    graph.searchContracted(starts,goals)
+                else:
+                    graph.search(starts,goals,destLat,destLon,useLandmarks=method == 'landmarks')
+        return lambda: None,run,len(searches)
+    return benchmark
+
+
+BENCHMARKS = [('getFixes',benchmarkLoader('getFixes','earth_fix.dat','fixes')),
+              ('getNavaids',benchmarkLoader('getNavaids','earth_nav.dat','navaids')),
+              ('getAirports',benchmarkLoader('getAirports','apt.csv','airports')),
+              ('getAirways',benchmarkGetAirways),
+              ('airwayUpdate',benchmarkAirwayUpdate),
+              ('loadNavdata',benchmarkLoadNavdata),
+              ('cacheLoad',benchmarkCacheLoad),
+              ('routeDatabaseBuild',benchmarkRouteDatabaseBuild),
+              ('routeImport',benchmarkRouteImport),
+              ('fmsExport',benchmarkFmsExport),
+              ('routeTimes',benchmarkRouteTimes(False)),
+              ('routeTimesWind',benchmarkRouteTimes(True)),
+              ('routeTyping',benchmarkRouteTyping),
+              ('routeSearch',benchmarkRouteSearch('plain')),
+              ('routeSearchLandmarks',benchmarkRouteSearch('landmarks')),
+              ('routeSearchContracted',benchmarkRouteSearch('contracted'))]
+
+
+## Runs the benchmarks (all if names is None) repeat times. Returns the results dict.
+def runBenchmarks(directory,scaleName,repeat=3,names=None,seed=1):
+    prepareData(directory,scaleName,seed)
+    context = BenchmarkContext(directory,SCALES[scaleName])
+    results = {}
+    for name,benchmark in BENCHMARKS:
+        if names is not None and name not in names:
+            continue
+        setup,run,items = benchmark(context)
+        runs = []
+        for _ in range(repeat):
+            state = setup()
+            t0 = time.perf_counter()
+            run(state)
+            runs.append(time.perf_counter() - t0)
+        best = min(runs)
+        results[name] = {'best':round(best,6),'mean':round(sum(runs)/len(runs),6),'runs':[round(ru,6) for ru in runs],'items':items}
+        print('{:<24}{:10.4f} s{:14.0f} items/s'.format(name,best,items/best if best else 0))
+    
+    return {'version':getVersion(),
+            'date':time.strftime('%Y-%m-%d %H:%M:%S'),
+            'python':platform.python_version(),
+            'platform':platform.platform(),
+            'numpy':avFormula.numpy is not None,
+            'scale':scaleName,
+            'seed':seed,
+            'repeat':repeat,
+            'results':results}
+
+
+## Returns the FPLGUI version of the changelog.
+def getVersion():
+    try:
+        with open(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),'Changelog.md')) as changelogFile:
+            for line in changelogFile:
+                reMatch = re.match(r'version (\S+)',line)
+                if reMatch:
+                    return reMatch.group(1)
+    except OSError:
+        pass
+    return None
+
+
+## Prints the results next to earlier ones. Returns the names of the benchmarks that are slower by more than limit.
+def compareResults(old,new,limit=REGRESSION_LIMIT):
+    print('Compared with version {} of {} ({} scale):'.format(old.get('version'),old.get('date'),old.get('scale')))
+    if old.get('scale') != new['scale']:
+        print('  Warning: different scales')
+    regressions = []
+    for name,result in new['results'].items():
+        if name not in old['results']:
+            continue
+        ratio = result['best']/old['results'][name]['best'] if old['results'][name]['best'] else float('inf')
+        flag = ''
+        if ratio > 1 + limit:
+            regressions.append(name)
+            flag = 'REGRESSION'
+        print('  {:<24}{:10.4f} s ->{:10.4f} s {:6.2f}x {}'.format(name,old['results'][name]['best'],result['best'],ratio,flag))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks of the navdata parsers and the route engine on synthetic data.')
+    parser.add_argument('--scale',default='regional',choices=sorted(SCALES),help='size of the generated data')
+    parser.add_argument('--repeat',type=int,default=3,help='runs per benchmark, the best counts')
+    parser.add_argument('--only',help='comma separated benchmarks ({})'.format(', '.join(na for na,_ in BENCHMARKS)))
+    parser.add_argument('--data',help='directory of the generated data, reused by later runs (default: temporary)')
+    parser.add_argument('--seed',type=int,default=1,help='seed of the generated data')
+    parser.add_argument('--save',help='write the results to this JSON file')
+    parser.add_argument('--compare',help='compare with the results of an earlier run (JSON file of --save)')
+    parser.add_argument('--limit',type=float,default=REGRESSION_LIMIT,help='relative slowdown reported as regression')
+    parser.add_argument('--legacy-airways',nargs=3,type=int,metavar=('FIXES','AIRWAYS','LENGTH'),
+                        help='only compare getAirways with the implementation of FPLGUI 0.3.4')
+    args = parser.parse_args(argv)
+    
+    if args.legacy_airways:
+        benchmarkAirways(*args.legacy_airways)
+        return 0
+    
+    names = None if args.only is None else args.only.split(',')
+    if args.data is None:
+        with tempfile.TemporaryDirectory() as directory:
+            report = runBenchmarks(directory,args.scale,args.repeat,names,args.seed)
+    else:
+        if not os.path.isdir(args.data):
+            os.makedirs(args.data)
+        report = runBenchmarks(args.data,args.scale,args.repeat,names,args.seed)
+    
+    if args.save:
+        with open(args.save,'w') as saveFile:
+            json.dump(report,saveFile,indent=1)
+    if args.compare:
+        with open(args.compare) as compareFile:
+            if compareResults(json.load(compareFile),report,args.limit):
+                return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
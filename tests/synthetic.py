@@ -0,0 +1,58 @@
+#!/usr/bin/python
+# -*- coding: iso-8859-15 -*-
+#==============================================================================
+# synthetic - Small synthetic navdata for the unit tests
+# Copyright (C) 2019  Oliver Clemens
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <https://www.gnu.org/licenses/>.
+#==============================================================================
+# The navdata is written by the generator of benchmark.py at SCALE, which is
+# small enough to be parsed in well under a second.
+#==============================================================================
+
+import os
+import shutil
+import tempfile
+from benchmark import generateNavdata
+from Fpl import Fpl
+
+SCALE = {'fixes':3000,'navaids':200,'airports':100,'airways':60,'airwayLength':12,'routes':300,
+         'lats':(40,50),'lons':(0,15)}
+
+
+class SyntheticNavdata(object):
+    """
+    Navdata of SCALE in a temporary directory (navdataDir) with a separate
+    cache directory (cacheDir). remove deletes both.
+    """
+    
+    def __init__(self,seed=1,scale=SCALE):
+        self.directory = tempfile.mkdtemp(prefix='fplguiTest')
+        self.navdataDir = os.path.join(self.directory,'navdata')
+        self.cacheDir = os.path.join(self.directory,'cache')
+        os.makedirs(self.navdataDir)
+        os.makedirs(self.cacheDir)
+        generateNavdata(self.navdataDir,scale,seed)
+    
+    def getPath(self,filename):
+        return os.path.join(self.navdataDir,filename)
+    
+    ## Returns a Fpl with the navdata loaded (parsed or from the cache).
+    def loadFpl(self,workers=1):
+        fpl = Fpl(self.cacheDir)
+        fpl.loadNavdata(self.navdataDir,self.cacheDir,workers=workers)
+        return fpl
+    
+    def remove(self):
+        shutil.rmtree(self.directory,ignore_errors=True)
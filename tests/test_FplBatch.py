@@ -0,0 +1,75 @@
+#!/usr/bin/python
+# -*- coding: iso-8859-15 -*-
+#==============================================================================
+# test_FplBatch - Files of the batch generation
+# Copyright (C) 2019  Oliver Clemens
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <https://www.gnu.org/licenses/>.
+#==============================================================================
+
+import os
+import csv
+import random
+import unittest
+from tests.synthetic import SyntheticNavdata
+from FplBatch import runBatch
+
+
+class FplBatchTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.navdata = SyntheticNavdata()
+        self.outDir = os.path.join(self.navdata.directory,'out')
+        
+        # A route of the route finder between two airports.
+        fpl = self.navdata.loadFpl()
+        rand = random.Random(1)
+        airports = sorted(fpl.airports)
+        while True:
+            depicao,desticao = rand.sample(airports,2)
+            routes = fpl.getRouteFinder().findRoutes(depicao,desticao,timeBudget=None)
+            if routes:
+                break
+        self.flight = {'dep':depicao,'dest':desticao,'route':routes[0].route,'type':'A320','level':'350'}
+    
+    def tearDown(self):
+        self.navdata.remove()
+    
+    ## Writes the flights to flights.csv and runs the batch. Returns the errors.
+    def runFlights(self,flights,workers=1):
+        flightsPath = os.path.join(self.navdata.directory,'flights.csv')
+        with open(flightsPath,'w',newline='') as flightsFile:
+            writer = csv.DictWriter(flightsFile,['dep','dest','route','type','level','speed'])
+            writer.writeheader()
+            writer.writerows(flights)
+        return runBatch(flightsPath,self.outDir,self.navdata.navdataDir,self.navdata.cacheDir,workers)
+    
+    def testFiles(self):
+        errors = self.runFlights([dict(self.flight,speed='450')]*3,workers=2)
+        self.assertEqual(errors,[])
+        self.assertEqual(len(os.listdir(self.outDir)),9)
+        name = '0001_{}{}'.format(self.flight['dep'],self.flight['dest'])
+        with open(os.path.join(self.outDir,'{}.txt'.format(name))) as txtFile:
+            self.assertIn('-N0450F350 {}\n'.format(self.flight['route']),txtFile.read())
+    
+    ## A flight without speed is reported, no files are written for it.
+    def testMissingSpeed(self):
+        errors = self.runFlights([self.flight,dict(self.flight,speed='45O')])
+        self.assertEqual(len(errors),2)
+        self.assertIn('missing speed',errors[0])
+        self.assertEqual(os.listdir(self.outDir),[])
+
+
+if __name__ == '__main__':
+    unittest.main()
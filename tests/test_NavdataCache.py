@@ -0,0 +1,132 @@
+#!/usr/bin/python
+# -*- coding: iso-8859-15 -*-
+#==============================================================================
+# test_NavdataCache - Round trip and files of the navdata cache
+# Copyright (C) 2019  Oliver Clemens
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <https://www.gnu.org/licenses/>.
+#==============================================================================
+
+import os
+import unittest
+from unittest import mock
+from tests.synthetic import SyntheticNavdata
+from tests.test_NavdataUpdate import waypointRows
+from benchmark import airwayParts
+from Fpl import Fpl, loadWorkerFpl
+from NavdataCache import NavdataCache, listCacheFiles, MAGIC, HEADER_LENGTH
+
+
+class NavdataCacheTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.navdata = SyntheticNavdata()
+    
+    def tearDown(self):
+        self.navdata.remove()
+    
+    def testRoundTrip(self):
+        parsed = Fpl(self.navdata.cacheDir)
+        self.assertFalse(parsed.loadNavdata(self.navdata.navdataDir,self.navdata.cacheDir))
+        loaded = Fpl(self.navdata.cacheDir)
+        self.assertTrue(loaded.loadNavdata(self.navdata.navdataDir,self.navdata.cacheDir))
+        attached = Fpl(self.navdata.cacheDir)
+        self.assertTrue(attached.attachNavdata(loaded.navdataCache.path,self.navdata.navdataDir))
+        
+        for fpl in (loaded,attached):
+            self.assertEqual(fpl.cycleNumber,parsed.cycleNumber)
+            self.assertEqual(dict(fpl.airports),parsed.airports)
+            self.assertEqual(waypointRows(fpl),waypointRows(parsed))
+            self.assertEqual(airwayParts(fpl.airways),airwayParts(parsed.airways))
+            for lat,lon in ((42,3),(47.5,11.2)):
+                self.assertEqual(sorted(fpl.getWaypointsNear(lat,lon,60)),sorted(parsed.getWaypointsNear(lat,lon,60)))
+                self.assertEqual(fpl.getNearestAirport(lat,lon),parsed.getNearestAirport(lat,lon))
+    
+    ## Every key has its own file, the files of older keys are removed on save.
+    def testVersionedFiles(self):
+        self.navdata.loadFpl()
+        oldPaths = listCacheFiles(self.navdata.cacheDir)
+        self.assertEqual(len(oldPaths),1)
+        
+        path = self.navdata.getPath('earth_nav.dat')
+        with open(path,'a') as navFile:
+            navFile.write('\n')
+        mapped = Fpl(self.navdata.cacheDir)
+        self.assertTrue(NavdataCache(self.navdata.cacheDir,self.navdata.navdataDir).load(mapped,checkKey=False))
+        self.navdata.loadFpl()
+        newPaths = listCacheFiles(self.navdata.cacheDir)
+        self.assertEqual(len(newPaths),1)
+        self.assertNotEqual(newPaths,oldPaths)
+        self.assertTrue(NavdataCache(self.navdata.cacheDir,self.navdata.navdataDir).isValid())
+        
+        # The old mapping stays usable.
+        self.assertGreater(len(mapped.waypoints),0)
+    
+    ## The caches of two navdata directories (Custom Data and default data) share the cache directory. Workers
+    # use the one of their navdata, not the newest.
+    def testOtherNavdataDir(self):
+        other = SyntheticNavdata(seed=2)
+        self.addCleanup(other.remove)
+        own = self.navdata.loadFpl()
+        ownPath = own.navdataCache.path
+        otherFpl = Fpl(self.navdata.cacheDir)
+        otherFpl.loadNavdata(other.navdataDir,self.navdata.cacheDir)
+        otherPath = otherFpl.navdataCache.path
+        os.utime(ownPath,(1,1))
+        self.assertEqual(listCacheFiles(self.navdata.cacheDir),[otherPath,ownPath])
+        self.assertNotEqual(dict(otherFpl.airports),own.airports)
+        
+        self.assertIsNone(NavdataCache.fromPath(otherPath,self.navdata.navdataDir))
+        self.assertFalse(Fpl(self.navdata.cacheDir).attachNavdata(otherPath,self.navdata.navdataDir))
+        for cachePath in (ownPath,otherPath):
+            worker = loadWorkerFpl(self.navdata.navdataDir,self.navdata.cacheDir,cachePath)
+            self.assertEqual(worker.navdataCache.path,ownPath)
+            self.assertEqual(dict(worker.airports),own.airports)
+        
+        cached = Fpl(self.navdata.cacheDir)
+        self.assertTrue(NavdataCache(self.navdata.cacheDir,self.navdata.navdataDir).load(cached,checkKey=False))
+        self.assertEqual(dict(cached.airports),own.airports)
+    
+    ## Cache files with a corrupt header are skipped and removed by the next save.
+    def testCorruptHeader(self):
+        self.navdata.loadFpl()
+        cache = NavdataCache(self.navdata.cacheDir,self.navdata.navdataDir)
+        for nr,header in enumerate((b'\x80\x09',b'I1x\n.',b'cos\nnothere\n.')):
+            path = os.path.join(self.navdata.cacheDir,'navdata.{:016x}.cache'.format(nr))
+            with open(path,'wb') as cacheFile:
+                cacheFile.write(MAGIC + HEADER_LENGTH.pack(len(header)) + header)
+            self.assertIsNone(cache.readHeader(path))
+        self.assertEqual(len(listCacheFiles(self.navdata.cacheDir)),4)
+        self.assertTrue(cache.load(Fpl(self.navdata.cacheDir),checkKey=False))
+        
+        with open(self.navdata.getPath('earth_nav.dat'),'a') as navFile:
+            navFile.write('\n')
+        updated = Fpl(self.navdata.cacheDir)
+        self.assertFalse(updated.loadNavdata(self.navdata.navdataDir,self.navdata.cacheDir))
+        self.assertIsNotNone(updated.navdataUpdate)
+        self.assertEqual(len(listCacheFiles(self.navdata.cacheDir)),1)
+    
+    ## If the cache cannot be written, the parsed navdata is used anyway.
+    def testSaveFailure(self):
+        with mock.patch('os.replace',side_effect=PermissionError('mapped by another process')):
+            with self.assertWarns(UserWarning):
+                fpl = self.navdata.loadFpl()
+        self.assertGreater(len(fpl.airports),0)
+        self.assertGreater(len(fpl.waypoints),0)
+        self.assertEqual(listCacheFiles(self.navdata.cacheDir),[])
+        self.assertEqual(os.listdir(self.navdata.cacheDir),[])
+
+
+if __name__ == '__main__':
+    unittest.main()
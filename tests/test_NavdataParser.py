@@ -0,0 +1,81 @@
+#!/usr/bin/python
+# -*- coding: iso-8859-15 -*-
+#==============================================================================
+# test_NavdataParser - Serial and parallel parse give the same navdata
+# Copyright (C) 2019  Oliver Clemens
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <https://www.gnu.org/licenses/>.
+#==============================================================================
+
+import unittest
+from tests.synthetic import SyntheticNavdata
+from NavdataParser import parseNavdata, getChunks, readChunk, readLines
+
+
+## Returns the results of parseNavdata {stage:[result,...]} with all chunks of a stage joined.
+def parseResults(navdataDir,workers):
+    results = {}
+    
+    def merge(stage,result):
+        results.setdefault(stage,[]).append(result)
+    
+    parseNavdata(navdataDir,merge,workers)
+    joined = {'airports':{},'airways':[]}
+    for airports in results['airports']:
+        joined['airports'].update(airports)
+    for segments in results['airways']:
+        joined['airways'].extend(segments)
+    for stage in ('fixes','navaids'):
+        columns = [[],[],[],[]]
+        for result in results[stage]:
+            for column,values in zip(columns,result[0] if stage == 'fixes' else result):
+                column.extend(values)
+        joined[stage] = columns
+    joined['cycleNumber'] = [result[1] for result in results['fixes'] if result[1] is not None]
+    return joined
+
+
+class NavdataParserTest(unittest.TestCase):
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.navdata = SyntheticNavdata()
+        
+        # Airport names with bytes that are no valid UTF-8 (latin-1 umlauts, \x85 is a line end for
+        # str.splitlines) and a Windows line end.
+        with open(cls.navdata.getPath('apt.csv'),'ab') as aptFile:
+            aptFile.write('ZZZZ,Z\xfcrich \xc9cole\x85Kloten,LAT 47.464722,LON 8.549167,1416\n'.encode('latin-1'))
+            aptFile.write('ZZZY,Z\xfcrich Nord,LAT 47.5,LON 8.6,1400\r\n'.encode('latin-1'))
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.navdata.remove()
+    
+    def testSerialParallel(self):
+        serial = parseResults(self.navdata.navdataDir,1)
+        self.assertEqual(serial['airports']['ZZZZ'],[47.464722,8.549167])
+        self.assertEqual(serial['airports']['ZZZY'],[47.5,8.6])
+        self.assertEqual(serial['cycleNumber'],['1901'])
+        self.assertEqual(parseResults(self.navdata.navdataDir,3),serial)
+    
+    def testChunks(self):
+        path = self.navdata.getPath('apt.csv')
+        lines = [line.rstrip('\n') for line in readLines(path)]
+        chunks = getChunks(path,7)
+        self.assertEqual(chunks[0][0],0)
+        self.assertEqual([line for start,end in chunks for line in readChunk(path,start,end)],lines)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+#!/usr/bin/python
+# -*- coding: iso-8859-15 -*-
+#==============================================================================
+# test_NavdataUpdate - Incremental update of the navdata cache
+# Copyright (C) 2019  Oliver Clemens
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <https://www.gnu.org/licenses/>.
+#==============================================================================
+
+import os
+import shutil
+import unittest
+from tests.synthetic import SyntheticNavdata
+from benchmark import airwayParts
+from Fpl import Fpl
+import NavdataUpdate
+
+
+## Returns the waypoint rows (ident,type,lat,lon) of fpl.
+def waypointRows(fpl):
+    rows = set()
+    for ident in fpl.waypoints:
+        for row in range(*fpl.waypoints.find(ident)):
+            lat,lon,wpType = fpl.waypoints.getRow(row)
+            rows.add((ident,wpType,lat,lon))
+    return rows
+
+
+class NavdataUpdateTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.navdata = SyntheticNavdata()
+        
+        # A circular airway, unchanged by the new cycle.
+        with open(self.navdata.getPath('earth_fix.dat')) as fixFile:
+            circle = [line.split()[2] for line in fixFile.readlines()[4:8]]
+        self.circularAirway = 'Z99'
+        path = self.navdata.getPath('earth_awy.dat')
+        with open(path) as awyFile:
+            lines = awyFile.readlines()
+        lines[-1:-1] = ['{} ZZ 11 {} ZZ 11 N 2 180 450 {}\n'.format(wp1,wp2,self.circularAirway)
+                        for wp1,wp2 in zip(circle,circle[1:] + circle[:1])]
+        with open(path,'w') as awyFile:
+            awyFile.writelines(lines)
+        self.navdata.loadFpl()
+        
+        # New cycle: a fix moved, an airway segment removed.
+        path = self.navdata.getPath('earth_fix.dat')
+        with open(path) as fixFile:
+            lines = fixFile.readlines()
+        lines[1] = lines[1].replace('data cycle 1901','data cycle 1902')
+        lineSplit = lines[3].split()
+        self.movedFix = lineSplit[2]
+        lineSplit[0] = '{:.9f}'.format(float(lineSplit[0]) + 0.5)
+        lines[3] = ' {}\n'.format(' '.join(lineSplit))
+        with open(path,'w') as fixFile:
+            fixFile.writelines(lines)
+        path = self.navdata.getPath('earth_awy.dat')
+        with open(path) as awyFile:
+            lines = awyFile.readlines()
+        self.changedAirway = lines[3].split()[10]
+        with open(path,'w') as awyFile:
+            awyFile.writelines(lines[:3] + lines[4:])
+    
+    def tearDown(self):
+        self.navdata.remove()
+    
+    ## Returns a Fpl of the navdata parsed from scratch.
+    def parseFpl(self):
+        cacheDir = os.path.join(self.navdata.directory,'fullParse')
+        os.makedirs(cacheDir)
+        fpl = Fpl(cacheDir)
+        fpl.loadNavdata(self.navdata.navdataDir,cacheDir)
+        shutil.rmtree(cacheDir)
+        return fpl
+    
+    def assertUpdated(self,workers):
+        stages = []
+        fpl = Fpl(self.navdata.cacheDir)
+        fpl.loadNavdata(self.navdata.navdataDir,self.navdata.cacheDir,
+                        lambda stage,nBytes,nLines: stages.append((stage,len(fpl.airports))),workers)
+        report = fpl.navdataUpdate
+        self.assertIsNotNone(report)
+        self.assertEqual((report['oldCycle'],report['newCycle']),('1901','1902'))
+        self.assertEqual([re['ident'] for re in report['waypoints']['moved']],[self.movedFix])
+        self.assertIn(self.changedAirway,report['airwaysRebuilt'] + report['airwaysRemoved'])
+        self.assertNotIn(self.circularAirway,report['airwaysRebuilt'])
+        self.assertEqual([se for se in report['airwaySegments']['added'] if se[0] == self.circularAirway],[])
+        
+        # The airports are complete when the next stage starts (the main window opens then).
+        nextStage = next(st for st in stages if st[0] != 'airports')
+        self.assertEqual(nextStage[1],len(fpl.airports))
+        self.assertGreater(nextStage[1],0)
+        
+        parsed = self.parseFpl()
+        self.assertEqual(dict(fpl.airports),dict(parsed.airports))
+        self.assertEqual(waypointRows(fpl),waypointRows(parsed))
+        self.assertEqual(airwayParts(fpl.airways),airwayParts(parsed.airways))
+        
+        # The cache is up to date afterwards.
+        loaded = Fpl(self.navdata.cacheDir)
+        self.assertTrue(loaded.loadNavdata(self.navdata.navdataDir,self.navdata.cacheDir))
+        self.assertEqual(airwayParts(loaded.airways),airwayParts(parsed.airways))
+    
+    def testSerial(self):
+        self.assertUpdated(1)
+    
+    def testParallel(self):
+        self.assertUpdated(2)
+    
+    def testMainUpToDate(self):
+        NavdataUpdate.main([self.navdata.navdataDir,self.navdata.cacheDir])
+        mtime = os.path.getmtime(os.path.join(self.navdata.cacheDir,NavdataUpdate.REPORT_FILENAME))
+        self.assertEqual(NavdataUpdate.main([self.navdata.navdataDir,self.navdata.cacheDir]),0)
+        self.assertEqual(os.path.getmtime(os.path.join(self.navdata.cacheDir,NavdataUpdate.REPORT_FILENAME)),mtime)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+#!/usr/bin/python
+# -*- coding: iso-8859-15 -*-
+#==============================================================================
+# test_RouteDatabase - Incremental update of the route table
+# Copyright (C) 2019  Oliver Clemens
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <https://www.gnu.org/licenses/>.
+#==============================================================================
+
+import unittest
+from tests.synthetic import SyntheticNavdata
+from RouteDatabase import RouteDatabase, ROUTE_TXT_FILENAME
+
+
+class RouteDatabaseTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.navdata = SyntheticNavdata()
+        self.database = RouteDatabase(self.navdata.navdataDir)
+    
+    def tearDown(self):
+        self.navdata.remove()
+    
+    def assertRoutes(self):
+        self.assertTrue(self.database.isValid())
+        for citypair,lines in self.database.readRoutes().items():
+            self.assertEqual(self.database.getRoutes(citypair[:4],citypair[4:]),lines)
+    
+    ## Only the city pairs with added, removed, changed or reordered routes are replaced.
+    def testIncrementalUpdate(self):
+        nCitypairs = self.database.build()
+        self.assertEqual(nCitypairs,len(self.database.readRoutes()))
+        self.assertRoutes()
+        self.assertEqual(self.database.updateIndex(),0)
+        
+        with open(self.navdata.getPath(ROUTE_TXT_FILENAME)) as routeFile:
+            lines = routeFile.readlines()
+        routes = self.database.readRoutes()
+        twice = next(li for li in routes.values() if len(li) > 1)
+        removed = lines[-1]
+        lines.remove(twice[0])
+        lines.insert(lines.index(twice[1]) + 1,twice[0])
+        lines[0] = lines[0].replace(';',';DCT ',1)
+        lines[-1] = 'ZZZZYYYY01;ZZZZ DCT YYYY;FL350\n'
+        with open(self.navdata.getPath(ROUTE_TXT_FILENAME),'w') as routeFile:
+            routeFile.writelines(lines)
+        
+        changed = {twice[0][:8],lines[0][:8],removed[:8],'ZZZZYYYY'}
+        self.assertEqual(self.database.updateIndex(),len(changed))
+        self.assertRoutes()
+        self.assertEqual(self.database.getRoutes('ZZZZ','YYYY'),[lines[-1]])
+        if removed[:8] not in self.database.readRoutes():
+            self.assertEqual(self.database.getRoutes(removed[:4],removed[4:8]),[])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+#!/usr/bin/python
+# -*- coding: iso-8859-15 -*-
+#==============================================================================
+# test_RouteDownloader - Route database download and index
+# Copyright (C) 2019  Oliver Clemens
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <https://www.gnu.org/licenses/>.
+#==============================================================================
+
+import os
+import gzip
+import zlib
+import unittest
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from tests.synthetic import SyntheticNavdata
+from RouteDatabase import RouteDatabase, ROUTE_TXT_FILENAME, ROUTE_DB_FILENAME
+from RouteDownloader import RouteDownloader
+
+
+class RouteHandler(BaseHTTPRequestHandler):
+    
+    def do_GET(self):
+        body = self.server.body
+        self.send_response(200)
+        self.send_header('Content-Encoding','gzip')
+        self.send_header('Content-Length',str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self,*args):
+        pass
+
+
+class RouteDownloaderTest(unittest.TestCase):
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.navdata = SyntheticNavdata()
+        with open(cls.navdata.getPath(ROUTE_TXT_FILENAME),'rb') as routeFile:
+            cls.routes = routeFile.read()
+        cls.server = HTTPServer(('127.0.0.1',0),RouteHandler)
+        threading.Thread(target=cls.server.serve_forever,daemon=True).start()
+        cls.url = 'http://127.0.0.1:{}/routes'.format(cls.server.server_address[1])
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.navdata.remove()
+    
+    def setUp(self):
+        self.databaseDir = os.path.join(self.navdata.directory,self.id().rpartition('.')[2])
+        os.makedirs(self.databaseDir)
+    
+    def download(self):
+        downloader = RouteDownloader(self.databaseDir,self.url,timeout=5)
+        downloader.run()
+        return downloader
+    
+    def testDownload(self):
+        self.server.body = gzip.compress(self.routes)
+        downloader = self.download()
+        self.assertIsNone(downloader.error)
+        self.assertEqual(downloader.changedCitypairs,len(RouteDatabase(self.databaseDir).readRoutes()))
+        self.assertTrue(RouteDatabase(self.databaseDir).isValid())
+    
+    def testCorruptDownload(self):
+        self.server.body = b'\x1f\x8b\x08\x00 no gzip data'
+        downloader = self.download()
+        self.assertIsInstance(downloader.error,zlib.error)
+        self.assertTrue(downloader.getStatus().startswith('Error'))
+        self.assertFalse(os.path.exists(os.path.join(self.databaseDir,ROUTE_TXT_FILENAME)))
+    
+    ## Builds running at the same time do not remove the temporary database of each other.
+    def testConcurrentBuilds(self):
+        with open(os.path.join(self.databaseDir,ROUTE_TXT_FILENAME),'wb') as routeFile:
+            routeFile.write(self.routes)
+        errors = []
+        
+        def build():
+            try:
+                RouteDatabase(self.databaseDir).build()
+            except Exception as e:
+                errors.append(e)
+        
+        threads = [threading.Thread(target=build) for _ in range(4)]
+        for th in threads:
+            th.start()
+        for th in threads:
+            th.join()
+        self.assertEqual(errors,[])
+        self.assertTrue(RouteDatabase(self.databaseDir).isValid())
+        self.assertEqual(sorted(os.listdir(self.databaseDir)),[ROUTE_DB_FILENAME,ROUTE_TXT_FILENAME])
+
+
+if __name__ == '__main__':
+    unittest.main()
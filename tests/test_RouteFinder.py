@@ -0,0 +1,112 @@
+#!/usr/bin/python
+# -*- coding: iso-8859-15 -*-
+#==============================================================================
+# test_RouteFinder - Routes found along the airways can be expanded
+# Copyright (C) 2019  Oliver Clemens
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <https://www.gnu.org/licenses/>.
+#==============================================================================
+
+import random
+import tempfile
+import unittest
+from types import SimpleNamespace
+from tests.synthetic import SyntheticNavdata
+from Fpl import Fpl
+from RouteExpander import RouteExpander
+from RouteFinder import RouteFinder, RouteSearch
+
+
+class RouteFinderTest(unittest.TestCase):
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.navdata = SyntheticNavdata()
+        cls.fpl = cls.navdata.loadFpl()
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.navdata.remove()
+    
+    ## Returns the legs of the route strings of routes, fails if one cannot be expanded.
+    def assertExpanded(self,fpl,routes,depicao,desticao):
+        expander = RouteExpander(fpl)
+        for ro in routes:
+            legs = expander.expand(ro.route,depicao,desticao,'350')
+            self.assertEqual((legs[0].ident,legs[-1].ident),(depicao,desticao))
+    
+    def testSyntheticRoutes(self):
+        rand = random.Random(1)
+        airports = sorted(self.fpl.airports)
+        routeFinder = RouteFinder(self.fpl)
+        nRoutes = 0
+        for _ in range(20):
+            depicao,desticao = rand.sample(airports,2)
+            routes = routeFinder.findRoutes(depicao,desticao,timeBudget=None)
+            self.assertExpanded(self.fpl,routes,depicao,desticao)
+            nRoutes += len(routes)
+        self.assertGreater(nRoutes,0)
+    
+    ## A route along two parts of a branching airway names the junction fix.
+    def testBranchingAirway(self):
+        fpl = Fpl(tempfile.gettempdir())
+        fixes = {'AAAAA':(0,0),'JJJJJ':(0,3),'BBBBB':(0,6),'CCCCC':(3,3)}
+        for name,(lat,lon) in fixes.items():
+            fpl.waypoints.append(name,lat,lon,11)
+        fpl.waypoints.finalize()
+        part = lambda *names: [(na,) + fixes[na] + (11,) for na in names]
+        fpl.airways = {'Z1':SimpleNamespace(name='Z1',parts=[part('AAAAA','JJJJJ','BBBBB'),part('JJJJJ','CCCCC')])}
+        fpl.airports = {'DDDD':[0,-0.1],'EEEE':[3.1,3]}
+        
+        routes = RouteFinder(fpl).findRoutes('DDDD','EEEE',timeBudget=None)
+        self.assertEqual(routes[0].route,'AAAAA Z1 JJJJJ Z1 CCCCC')
+        self.assertExpanded(fpl,routes,'DDDD','EEEE')
+    
+    ## A fix at the antipode of the destination: rounding gives a cosine below -1 for the heuristic.
+    def testAntipode(self):
+        fpl = Fpl(tempfile.gettempdir())
+        fixes = {'AAAAA':(-82,-178),'BBBBB':(-82,-179),'CCCCC':(-81,-179)}
+        for name,(lat,lon) in fixes.items():
+            fpl.waypoints.append(name,lat,lon,11)
+        fpl.waypoints.finalize()
+        fpl.airways = {'Z1':SimpleNamespace(name='Z1',parts=[[(na,) + fixes[na] + (11,) for na in fixes]])}
+        fpl.airports = {}
+        
+        graph = RouteFinder(fpl).getGraph()
+        nodes = {name:no for no,name in enumerate(graph.names)}
+        _,path,_ = graph.search({nodes['AAAAA']:0},{nodes['CCCCC']:0},82,1,useLandmarks=False)
+        self.assertEqual([graph.names[no] for no in path],['AAAAA','BBBBB','CCCCC'])
+    
+    def testRouteSearch(self):
+        depicao,desticao = sorted(self.fpl.airports)[:2]
+        routeFinder = RouteFinder(self.fpl)
+        search = RouteSearch(routeFinder)
+        search.start()
+        self.assertTrue(search.finished.wait(30))
+        self.assertIsNone(search.error)
+        self.assertIsNotNone(routeFinder.graph)
+        
+        search = RouteSearch(routeFinder,depicao,desticao,timeBudget=None)
+        search.start()
+        self.assertTrue(search.finished.wait(30))
+        self.assertEqual(search.routes,routeFinder.findRoutes(depicao,desticao,timeBudget=None))
+        
+        search = RouteSearch(routeFinder,'QQQQ',desticao)
+        search.start()
+        self.assertTrue(search.finished.wait(30))
+        self.assertTrue(search.getStatus().startswith('Error'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+#!/usr/bin/python
+# -*- coding: iso-8859-15 -*-
+#==============================================================================
+# test_RouteTimes - Distances and times of expanded routes
+# Copyright (C) 2019  Oliver Clemens
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <https://www.gnu.org/licenses/>.
+#==============================================================================
+
+import unittest
+from array import array
+from math import asin, degrees
+from RouteExpander import Leg, RouteError
+from RouteTimes import computeRouteTimes, formatEet, getLegAltitudes
+from WindField import WindField
+
+# Along the equator, 60 nm per degree.
+NM_PER_DEGREE = 60.0
+
+
+## Returns the legs departure, waypoints (at altitude) and destination along the equator at lons.
+def equatorLegs(lons,altitude=35000):
+    legs = [Leg('DDDD',1,'ADEP',0,0.0,lons[0])]
+    legs += [Leg('WP{}'.format(k),11,'DRCT',altitude,0.0,lon) for k,lon in enumerate(lons[1:-1])]
+    legs.append(Leg('EEEE',1,'ADES',0,0.0,lons[-1]))
+    return legs
+
+
+## Returns a WindField of the same wind (components u,v in kt) everywhere.
+def uniformWind(u,v):
+    levels = [100,300,450]
+    plane = 3*3
+    return WindField(-90,90,3,-180,120,3,levels,array('f',[u]*len(levels)*plane + [v]*len(levels)*plane))
+
+
+class RouteTimesTest(unittest.TestCase):
+    
+    def testKnots(self):
+        routeTimes = computeRouteTimes(equatorLegs([0,1,3,4]),'0480','N','350')
+        self.assertEqual(len(routeTimes.distances),3)
+        self.assertAlmostEqual(routeTimes.distance,4*NM_PER_DEGREE,delta=0.1)
+        self.assertAlmostEqual(routeTimes.eet,routeTimes.distance/480,places=6)
+        self.assertAlmostEqual(routeTimes.cumulativeTimes[1],3*NM_PER_DEGREE/480,delta=1e-3)
+        for course in routeTimes.courses:
+            self.assertAlmostEqual(course,90,places=6)
+    
+    def testMach(self):
+        routeTimes = computeRouteTimes(equatorLegs([0,2,4]),'078','M','350')
+        # ISA at FL350: -54.3 C, speed of sound 576.4 kt.
+        for speed in routeTimes.groundSpeeds:
+            self.assertAlmostEqual(speed,0.78*576.4,delta=1)
+    
+    def testLegAltitudes(self):
+        self.assertEqual(getLegAltitudes(equatorLegs([0,1,2],31000),'350'),[31000,31000])
+        self.assertEqual(getLegAltitudes(equatorLegs([0,2]),'240'),[24000])
+    
+    def testWind(self):
+        legs = equatorLegs([0,2,4])
+        tailwind = computeRouteTimes(legs,'0400','N','350',uniformWind(50,0))
+        for speed,heading in zip(tailwind.groundSpeeds,tailwind.headings):
+            self.assertAlmostEqual(speed,450,delta=0.01)
+            self.assertAlmostEqual(heading,90,delta=0.01)
+        
+        # Wind from the north: heading into the wind, less ground speed.
+        crosswind = computeRouteTimes(legs,'0300','N','350',uniformWind(0,-30))
+        for speed,heading in zip(crosswind.groundSpeeds,crosswind.headings):
+            self.assertAlmostEqual(speed,(300**2 - 30**2)**0.5,delta=0.01)
+            self.assertAlmostEqual(heading,90 - degrees(asin(30/300)),delta=0.01)
+        self.assertGreater(crosswind.eet,computeRouteTimes(legs,'0300','N','350').eet)
+        
+        with self.assertRaises(RouteError):
+            computeRouteTimes(legs,'0100','N','350',uniformWind(-200,0))
+    
+    def testErrors(self):
+        for legs,speed,speedtype in ((equatorLegs([0,1])[:1],'0400','N'),(equatorLegs([0,1]),'','N'),
+                                     (equatorLegs([0,1]),'0400','X')):
+            with self.assertRaises(RouteError):
+                computeRouteTimes(legs,speed,speedtype,'350')
+    
+    def testFormatEet(self):
+        self.assertEqual(formatEet(1.5),'0130')
+        self.assertEqual(formatEet(0.999),'0100')
+        self.assertEqual(formatEet(12.25),'1215')
+
+
+if __name__ == '__main__':
+    unittest.main()
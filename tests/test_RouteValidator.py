@@ -0,0 +1,147 @@
+#!/usr/bin/python
+# -*- coding: iso-8859-15 -*-
+#==============================================================================
+# test_RouteValidator - RouteValidator gives the verdict of RouteExpander
+# Copyright (C) 2019  Oliver Clemens
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <https://www.gnu.org/licenses/>.
+#==============================================================================
+
+import time
+import random
+import unittest
+import threading
+from tests.synthetic import SyntheticNavdata
+from RouteExpander import RouteExpander, RouteError
+from RouteValidator import RouteValidator, IncrementalValidator, ValidationWorker
+
+
+class RouteValidatorTest(unittest.TestCase):
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.navdata = SyntheticNavdata()
+        cls.fpl = cls.navdata.loadFpl()
+        cls.depicao,cls.desticao = sorted(cls.fpl.airports)[:2]
+        
+        # An airway with a part of at least three waypoints and a waypoint that is no part of it.
+        for name,aw in sorted(cls.fpl.airways.items()):
+            names = [fix[0] for fix in aw.parts[0]]
+            if len(names) >= 3 and len(set(names)) == len(names):
+                cls.airway = name
+                cls.entry,cls.middle,cls.exit = names[0],names[1],names[2]
+                break
+        airwayNames = {fix[0] for pa in cls.fpl.airways[cls.airway].parts for fix in pa}
+        cls.outside = next(wp for wp in cls.fpl.waypoints if wp not in airwayNames)
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.navdata.remove()
+    
+    ## Returns True if RouteExpander expands route.
+    def isExpanded(self,route):
+        try:
+            RouteExpander(self.fpl).expand(route,self.depicao,self.desticao,'350')
+        except RouteError:
+            return False
+        return True
+    
+    def assertSameVerdict(self,route):
+        issues = RouteValidator(self.fpl).validate(self.depicao,route,self.desticao)
+        self.assertEqual(not issues,self.isExpanded(route),'{}: {}'.format(route,issues))
+        incrementalIssues = IncrementalValidator(self.fpl).validateRoute(route)
+        self.assertEqual(not incrementalIssues,not issues,route)
+        return issues
+    
+    def testValidRoutes(self):
+        for route in ('{e} {a} {x}','{e} {a} {m} DCT {x}','N0450F350 {e} {a} {x}','{e} {a} {x}/N0450F370',
+                      'ABCDE1F {e} {a} {x} GHIJK2L','{e} N0450F350 {a} {x}','{el} {al} {xl}',''):
+            route = route.format(e=self.entry,m=self.middle,x=self.exit,a=self.airway,
+                                 el=self.entry.lower(),al=self.airway.lower(),xl=self.exit.lower())
+            self.assertEqual(self.assertSameVerdict(route),[],route)
+    
+    def testInvalidRoutes(self):
+        for route in ('{e} {a} {a} {x}','{e} {a} N0450F350 {a} {x}','{a} {x}','{e} {a} {o}','{e} QQQQQ {x}',
+                      '{e} DCT QQQQQ','{e} DCT {dep}','{e} {x}','{e} {a}'):
+            route = route.format(e=self.entry,x=self.exit,a=self.airway,o=self.outside,dep=self.depicao)
+            self.assertNotEqual(self.assertSameVerdict(route),[],route)
+    
+    ## Stored routes with random changes (tokens dropped, doubled, swapped or replaced).
+    def testMutatedRoutes(self):
+        rand = random.Random(1)
+        with open(self.navdata.getPath('routeDatabase.txt')) as routeFile:
+            routes = [line.split(';')[1].split()[1:-1] for line in routeFile]
+        idents = [self.airway,self.entry,self.exit,self.outside,'DCT','N0450F350','QQQQQ']
+        for tokens in routes[:200]:
+            tokens = list(tokens)
+            for _ in range(rand.randint(0,2)):
+                k = rand.randrange(len(tokens))
+                change = rand.randrange(4)
+                if change == 0 and len(tokens) > 1:
+                    del tokens[k]
+                elif change == 1:
+                    tokens.insert(k,tokens[k])
+                elif change == 2:
+                    tokens[k],tokens[-1] = tokens[-1],tokens[k]
+                else:
+                    tokens[k] = rand.choice(idents)
+            self.assertSameVerdict(' '.join(tokens))
+    
+    
+    ## Typing routes character by character (with corrections) gives the issues of a full validation.
+    def testIncremental(self):
+        rand = random.Random(2)
+        with open(self.navdata.getPath('routeDatabase.txt')) as routeFile:
+            routes = [line.split(';')[1].split(None,1)[1].rsplit(None,1)[0] for line in routeFile][:20]
+        validator = IncrementalValidator(self.fpl)
+        for route in routes:
+            typed = ''
+            for char in route + ' QQQQQ ' + self.airway:
+                if rand.random() < 0.05 and typed:
+                    typed = typed[:-1]
+                typed += char
+                validator.validateRoute(typed,typing=True)
+            issues = validator.validateRoute(typed)
+            fullIssues = RouteValidator(self.fpl).validate(self.depicao,typed,self.desticao)
+            self.assertEqual([{na:va for na,va in issue.items() if na not in ('start','end')} for issue in issues],fullIssues)
+            for issue in issues:
+                if issue['kind'] != 'airwayGap':
+                    self.assertEqual(typed[issue['start']:issue['end']].partition('/')[0],issue['ident'])
+    
+    def testValidationWorker(self):
+        worker = ValidationWorker(self.fpl)
+        worker.start()
+        route = '{} {} {}'.format(self.entry,self.airway,self.exit)
+        worker.submit(route)
+        deadline = time.monotonic() + 5
+        while worker.result is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(worker.result,((route,False),[]))
+        
+        # An exception ends the worker and is kept (not printed here).
+        excepthook = threading.excepthook
+        threading.excepthook = lambda args: None
+        try:
+            worker.validator.fpl = None
+            worker.submit('{} DCT QQQQQ'.format(self.entry))
+            worker.join(5)
+        finally:
+            threading.excepthook = excepthook
+        self.assertFalse(worker.is_alive())
+        self.assertIsInstance(worker.error,AttributeError)
+        self.assertEqual(worker.result[0],(route,False))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+#!/usr/bin/python
+# -*- coding: iso-8859-15 -*-
+#==============================================================================
+# test_WindField - Interpolation and file of the gridded wind
+# Copyright (C) 2019  Oliver Clemens
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <https://www.gnu.org/licenses/>.
+#==============================================================================
+
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from array import array
+from math import atan2, degrees
+import avFormula
+from WindField import WindField
+
+LEVELS = [100,240,340,450]
+
+
+## Wind components (kt) linear in lat, lon and level, interpolated exactly.
+def linearWind(lat,lon,level):
+    return 0.5*lat - 0.2*lon + 0.1*level,-0.3*lat + 0.25*lon + 0.05*level
+
+
+## Returns a WindField of linearWind on a 2 deg grid over 40..60N, 0..30E.
+def linearField():
+    nLats,nLons = 11,16
+    components = array('f')
+    for component in (0,1):
+        for level in LEVELS:
+            for row in range(nLats):
+                for column in range(nLons):
+                    components.append(linearWind(40 + 2*row,2*column,level)[component])
+    return WindField(40,2,nLats,0,2,nLons,LEVELS,components)
+
+
+class WindFieldTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='fplguiTest')
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory,ignore_errors=True)
+    
+    def assertComponents(self,windField,points):
+        for lat,lon,altitude in points:
+            u,v = windField.getComponents(lat,lon,altitude)
+            expected = linearWind(lat,lon,altitude/100)
+            self.assertAlmostEqual(u,expected[0],delta=1e-3)
+            self.assertAlmostEqual(v,expected[1],delta=1e-3)
+    
+    def testInterpolation(self):
+        rand = random.Random(1)
+        points = [(rand.uniform(40,60),rand.uniform(0,30),rand.uniform(10000,45000)) for _ in range(200)]
+        self.assertComponents(linearField(),points)
+    
+    def testEdges(self):
+        windField = linearField()
+        # Outside the grid and the levels the nearest edge is used.
+        self.assertEqual(windField.getComponents(70,40,50000),windField.getComponents(60,30,45000))
+        self.assertEqual(windField.getComponents(30,-10,5000),windField.getComponents(40,0,10000))
+    
+    def testWrap(self):
+        components = array('f',[float(column) for _ in range(2) for column in range(4)]*2)
+        windField = WindField(0,10,2,-180,90,4,[300],components)
+        self.assertTrue(windField.wrap)
+        # Between the last column (90 deg, 3 kt) and the first one again (-180 deg, 0 kt).
+        self.assertAlmostEqual(windField.getComponents(5,135,30000)[0],1.5,places=6)
+        self.assertAlmostEqual(windField.getComponents(5,-225,30000)[0],1.5,places=6)
+    
+    def testFile(self):
+        path = os.path.join(self.directory,'windField.bin')
+        linearField().save(path)
+        windField = WindField.load(path)
+        try:
+            self.assertEqual(windField.getHeader(),linearField().getHeader())
+            self.assertComponents(windField,[(41,1,12000),(59.5,29.5,44000),(50,15,30000)])
+            
+            # Direction (from) and speed.
+            directions,speeds = windField.getWinds([50],[15],[30000])
+            u,v = linearWind(50,15,300)
+            self.assertAlmostEqual(float(speeds[0]),(u*u + v*v)**0.5,delta=1e-3)
+            self.assertAlmostEqual(float(directions[0]),degrees(atan2(-u,-v)) % 360,delta=1e-3)
+        finally:
+            windField.close()
+        
+        with open(path,'r+b') as windFile:
+            windFile.write(b'NOWIND')
+        with self.assertRaises(ValueError):
+            WindField.load(path)
+    
+    @unittest.skipIf(avFormula.numpy is None,'NumPy not installed')
+    def testArray(self):
+        windField = linearField()
+        rand = random.Random(2)
+        points = [(rand.uniform(35,65),rand.uniform(-5,35),rand.uniform(5000,50000)) for _ in range(100)]
+        u,v = windField.getComponentsArray(*zip(*points))
+        for k,pt in enumerate(points):
+            self.assertAlmostEqual(u[k],windField.getComponents(*pt)[0],delta=1e-4)
+            self.assertAlmostEqual(v[k],windField.getComponents(*pt)[1],delta=1e-4)
+
+
+if __name__ == '__main__':
+    unittest.main()